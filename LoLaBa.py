@@ -1,17 +1,2661 @@
 import customtkinter as ctk
 from tkinter import messagebox, filedialog, colorchooser, Canvas
 import os
-from PIL import Image, ImageDraw, ImageTk, ImageFont, ImageEnhance, ImageFilter
+from PIL import Image, ImageDraw, ImageTk, ImageFont, ImageFilter, ImageColor
 import traceback
 import json
+import io
+import hashlib
 import copy 
 import random 
-import math 
-import re 
+import math
+import re
+import struct
+import zlib
+import threading
+import queue
+import itertools
+import concurrent.futures
+import multiprocessing
+import functools
+import bisect
+import time
+from collections import OrderedDict, deque
 
 # --- Alapbeállítások ---
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
+# A LOLABA_PROFILE környezeti változóval a szerkesztő kiírja a frissítések és renderelések mérési adatait
+PROFILE_RENDERING = bool(os.environ.get("LOLABA_PROFILE"))
+
+
+# --- KÉPGYORSÍTÓTÁRAK ---
+class ImageLRUCache:
+    """Memóriakorlátos, szálbiztos LRU gyorsítótár PIL képekhez.
+
+    A méretkorlátot bájtban adjuk meg; ha túllépjük, a legrégebben használt
+    bejegyzések törlődnek. A találatokat és tévesztéseket számoljuk, hogy a
+    gyorsítótár hatékonysága mérhető legyen.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _image_bytes(image):
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, image):
+        size = self._image_bytes(image)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            # A teljes keretnél nagyobb képet nem tároljuk, különben mindent kiszorítana
+            if size > self.max_bytes:
+                return image
+            self._entries[key] = (image, size)
+            self.current_bytes += size
+            self._evict()
+        return image
+
+    def get_or_create(self, key, factory):
+        """Visszaadja a kulcshoz tartozó képet, vagy a `factory()` hívással létrehozza és eltárolja."""
+        image = self.get(key)
+        if image is None:
+            image = factory()
+            if image is not None:
+                self.put(key, image)
+        return image
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.current_bytes, 'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+
+
+class DecodedImageCache(ImageLRUCache):
+    """Folyamatszintű gyorsítótár a lemezről dekódolt, RGBA módú forrásképekhez.
+
+    A kulcs (útvonal, módosítási idő, fájlméret, dekódolási lépték), így egy
+    lemezen megváltozott fájl régi példánya soha nem kerül vissza. A visszaadott
+    képek megosztottak, ezért a hívók nem módosíthatják őket helyben.
+
+    A `scale` egy kettő-hatvány kicsinyítési tényező: JPEG esetén a dekóder
+    draft módja már eleve kisebb képet bont ki, a maradékot pedig az olcsó
+    `Image.reduce` végzi. A végső, minőségi (LANCZOS) átméretezés a hívó dolga.
+    """
+
+    MAX_DECODE_SCALE = 32
+
+    def __init__(self, max_bytes):
+        super().__init__(max_bytes)
+        self._source_sizes = {}
+
+    def _key(self, path, scale):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, scale)
+
+    def load(self, path, scale=1):
+        key = self._key(path, scale)
+        return self.get_or_create(key, lambda: decode_image_scaled(path, scale))
+
+    def load_for_size(self, path, target_size, use_proxy=False):
+        """A legkisebb olyan léptékben dekódolja a képet, ami még legalább `target_size` méretű.
+
+        `use_proxy=True` esetén (szerkesztő, előnézetek) a lemezen tárolt proxy
+        piramis legközelebbi szintjét használja; nyomtatási exportnál ez kikapcsolva marad.
+        """
+        source_size = self.source_size(path)
+        if use_proxy:
+            level = PROXY_STORE.level_for(source_size, target_size)
+            if level is not None:
+                key = self._key(path, ('proxy', level))
+                proxy = self.get_or_create(key, lambda: PROXY_STORE.load(path, level))
+                if proxy is not None:
+                    return proxy
+        return self.load(path, self.pick_scale(source_size, target_size))
+
+    def source_size(self, path):
+        """Az eredeti kép mérete, csak a fájlfejléc beolvasásával (a pixelek dekódolása nélkül)."""
+        key = self._key(path, 1)
+        with self._lock:
+            size = self._source_sizes.get(key)
+        if size is None:
+            with Image.open(path) as source:
+                size = source.size
+            with self._lock:
+                self._source_sizes[key] = size
+        return size
+
+    @classmethod
+    def pick_scale(cls, source_size, target_size):
+        src_w, src_h = source_size
+        target_w, target_h = max(1, int(target_size[0])), max(1, int(target_size[1]))
+        scale = 1
+        while (scale * 2 <= cls.MAX_DECODE_SCALE
+               and src_w // (scale * 2) >= target_w and src_h // (scale * 2) >= target_h):
+            scale *= 2
+        return scale
+
+
+def decode_image_scaled(path, scale=1):
+    """RGBA módban dekódolja a képet, `scale`-szeres (kettő-hatvány) kicsinyítéssel."""
+    with Image.open(path) as source:
+        if scale > 1:
+            src_w, src_h = source.size
+            # JPEG-nél a draft mód 1/2, 1/4 vagy 1/8 léptékben már dekódoláskor kicsinyít
+            if source.format == 'JPEG':
+                source.draft(None, (max(1, src_w // scale), max(1, src_h // scale)))
+            image = source.convert("RGBA")
+            remaining = max(1, min(image.width * scale // src_w, image.height * scale // src_h))
+            if remaining > 1:
+                image = image.reduce(remaining)
+            return image
+        return source.convert("RGBA")
+
+
+class ProxyStore:
+    """Lemezen tárolt, többszintű (256/1024/2048 px) proxy piramis a forrásfotókhoz.
+
+    A bejegyzéseket a fájl tartalmából számolt ujjlenyomat azonosítja, így egy
+    átnevezett vagy másolt fotó proxyjai is újrahasznosulnak. A szerkesztő és az
+    előnézetek a legközelebbi elegendő szintet olvassák, az eredetit csak a
+    nyomtatási exportálás dekódolja. Első használatkor minden szint elkészül.
+    """
+
+    LEVELS = (256, 1024, 2048)
+    # Az ujjlenyomat a teljes fájltartalomból készül, ekkora darabokban olvasva
+    FINGERPRINT_CHUNK = 1024 * 1024
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.enabled = True
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, path):
+        """A fájl teljes tartalmának ujjlenyomata; (útvonal, módosítási idő, méret) szerint megjegyezve,
+        így egy fájlt csak a változása után olvasunk be újra."""
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._fingerprints.get(memo_key)
+        if cached:
+            return cached
+        digest = hashlib.sha1(str(stat.st_size).encode('ascii'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.FINGERPRINT_CHUNK), b''):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()
+        with self._lock:
+            self._fingerprints[memo_key] = fingerprint
+        return fingerprint
+
+    def level_for(self, source_size, target_size):
+        """A legkisebb szint, ami még lefedi a célméretet; None, ha az eredeti kell."""
+        if not self.enabled:
+            return None
+        src_long = max(source_size)
+        needed = max(target_size[0] * src_long / source_size[0], target_size[1] * src_long / source_size[1])
+        for level in self.LEVELS:
+            if level >= needed and level < src_long:
+                return level
+        return None
+
+    def _level_paths(self, fingerprint, level):
+        folder = os.path.join(self.cache_dir, fingerprint[:2])
+        base = os.path.join(folder, f"{fingerprint}_{level}")
+        return folder, base + ".jpg", base + ".png"
+
+    def load(self, path, level):
+        try:
+            fingerprint = self.fingerprint(path)
+            _, jpg_path, png_path = self._level_paths(fingerprint, level)
+            for proxy_path in (jpg_path, png_path):
+                if os.path.exists(proxy_path):
+                    with Image.open(proxy_path) as proxy:
+                        return proxy.convert("RGBA")
+            return self._build(path, fingerprint).get(level)
+        except Exception as e:
+            print(f"Proxy betöltése sikertelen ({os.path.basename(path)}): {e}")
+            return None
+
+    def _build(self, path, fingerprint):
+        """Egyetlen dekódolásból elkészíti és lemezre írja az összes szintet."""
+        with Image.open(path) as source:
+            src_size = source.size
+        largest = max(self.LEVELS)
+        ratio = largest / max(src_size)
+        source = decode_image_scaled(path, DecodedImageCache.pick_scale(src_size, (src_size[0] * ratio, src_size[1] * ratio)))
+        has_alpha = source.getchannel('A').getextrema()[0] < 255
+
+        levels = {}
+        current = source
+        for level in sorted(self.LEVELS, reverse=True):
+            if level >= max(src_size):
+                continue
+            level_ratio = level / max(src_size)
+            size = (max(1, round(src_size[0] * level_ratio)), max(1, round(src_size[1] * level_ratio)))
+            current = current.resize(size, Image.LANCZOS)
+            levels[level] = current
+            self._write(fingerprint, level, current, has_alpha)
+        return levels
+
+    def _write(self, fingerprint, level, image, has_alpha):
+        folder, jpg_path, png_path = self._level_paths(fingerprint, level)
+        target = png_path if has_alpha else jpg_path
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(folder, exist_ok=True)
+            if has_alpha:
+                image.save(tmp_path, "PNG")
+            else:
+                image.convert("RGB").save(tmp_path, "JPEG", quality=90)
+            os.replace(tmp_path, target)
+        except OSError as e:
+            # Írásvédett gyorsítótár esetén a proxykat csak a memóriában használjuk
+            print(f"Proxy mentése sikertelen: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# Az összes renderelési útvonal (szerkesztő, háttér, keretek, exportálás) ezt használja
+DECODED_IMAGE_CACHE = DecodedImageCache(max_bytes=768 * 1024 * 1024)
+PROXY_STORE = ProxyStore(os.path.join(os.path.expanduser("~"), ".lolaba-cache", "proxies"))
+
+
+class RenderResourceCache(ImageLRUCache):
+    """Tár a több oldalon ismétlődő renderelési erőforrásokhoz.
+
+    A hátterek, oldalkeretek és képkeretek minden (fájl, célméret) párosítását
+    csak egyszer mintavételezzük újra; a többi oldal és képhely ugyanazt a
+    példányt kapja. Exportáláskor minden futás saját példányt kap, amit a végén
+    eldobunk (a `report()` összefoglalja a hatékonyságát); a szerkesztő egy
+    kisebb, hosszabb életű példányt használ.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        super().__init__(max_bytes)
+        self.peak_bytes = 0
+        self.started_at = time.perf_counter()
+
+    def put(self, key, image):
+        image = super().put(key, image)
+        self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+        return image
+
+    def resized(self, path, size, use_proxy=False):
+        """A `path` kép LANCZOS-szal `size` méretre hozva. Megosztott példány, helyben nem módosítható."""
+        size = (int(size[0]), int(size[1]))
+        key = ('resized', DECODED_IMAGE_CACHE._key(path, 1), size, use_proxy)
+        return self.get_or_create(key, lambda: DECODED_IMAGE_CACHE.load_for_size(path, size, use_proxy=use_proxy).resize(size, Image.LANCZOS))
+
+    def frame(self, path, size):
+        """Keretkép (kép- vagy oldalkeret) `size` méretben, lásd `render_frame_asset`."""
+        size = (int(size[0]), int(size[1]))
+        key = ('frame', DECODED_IMAGE_CACHE._key(path, 1), size)
+        return self.get_or_create(key, lambda: render_frame_asset(path, size))
+
+    def report(self, page_count):
+        stats = self.stats()
+        elapsed = time.perf_counter() - self.started_at
+        return (f"{page_count} oldal {elapsed:.2f} mp alatt; erőforrások: {stats['misses']} előállítás, "
+                f"{stats['hits']} újrahasznosítás, csúcs {self.peak_bytes / (1024 * 1024):.1f} MiB")
+
+
+# --- KÉPKORREKCIÓ ---
+# Az 'L' konverzió ITU-R 601-2 súlyai, ahogy a PIL is számolja
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def _truncate_to_byte(value):
+    """Az `Image.blend` kerekítése: 0 és 255 közé vág, a törtrészt levágja."""
+    if value <= 0:
+        return 0
+    if value >= 255:
+        return 255
+    return int(value)
+
+
+def _brightness_lut(brightness):
+    return [_truncate_to_byte(brightness * value) for value in range(256)]
+
+
+def adjustment_mean(image, brightness=1.0):
+    """A kontraszt középértéke: a fényerő-korrigált kép szürke átlaga, ahogy az `ImageEnhance.Contrast` számolja.
+
+    Nagy képeknél egy dobozszűrővel kicsinyített mintán számolunk, ami az
+    átlagot gyakorlatilag nem változtatja meg.
+    """
+    sample = image
+    factor = int(math.sqrt(image.width * image.height / 1000000))
+    if factor > 1:
+        sample = image.reduce(factor)
+    if brightness != 1.0:
+        lut = _brightness_lut(brightness)
+        sample = sample.point(lut * len(sample.getbands()))
+    histogram = (sample if sample.mode == 'L' else sample.convert('L')).histogram()
+    total = sum(histogram)
+    if not total:
+        return 0
+    return int(sum(value * count for value, count in enumerate(histogram)) / total + 0.5)
+
+
+def photo_adjustments_active(props):
+    return (props.get('grayscale', False) or props.get('brightness', 1.0) != 1.0
+            or props.get('contrast', 1.0) != 1.0 or props.get('saturation', 1.0) != 1.0)
+
+
+def apply_photo_adjustments(image, brightness=1.0, contrast=1.0, saturation=1.0, grayscale=False, mean=None):
+    """Fekete-fehér, fényerő, kontraszt és telítettség összevont alkalmazása.
+
+    Az eredmény (legfeljebb 1-2 szintnyi eltéréssel) megegyezik a korábbi
+    `convert('L')` -> `Brightness` -> `Contrast` -> `Color` lánccal, de a fényerő
+    és a kontraszt egyetlen keresőtáblává (LUT) olvad, a telítettség pedig
+    egyetlen színmátrixos konverzió, így nem készül négy teljes képmásolat.
+    A `mean` a kontraszt középértéke; ha nincs megadva, a képből számoljuk.
+    Az `image` RGBA módú, és a függvény nem módosítja.
+    """
+    if grayscale:
+        image = image.convert('L')
+    if brightness == 1.0 and contrast == 1.0 and (grayscale or saturation == 1.0):
+        return image.convert('RGBA') if grayscale else image
+
+    lut = list(range(256))
+    if brightness != 1.0 or contrast != 1.0:
+        if contrast != 1.0 and mean is None:
+            mean = adjustment_mean(image, brightness)
+        lut = _brightness_lut(brightness) if brightness != 1.0 else lut
+        if contrast != 1.0:
+            lut = [_truncate_to_byte(mean + contrast * (value - mean)) for value in lut]
+
+    if grayscale:
+        # Szürke képen a telítettség hatástalan, ezért elég egy csatornán dolgozni
+        return image.point(lut).convert('RGBA')
+    if saturation == 1.0:
+        return image.point(lut * 3 + list(range(256)))
+
+    alpha = image.getchannel('A')
+    rgb = image.convert('RGB').point(lut * 3)
+    # A telítettség lineáris keverés a szürke és az eredeti szín között: egy 3x4-es mátrix.
+    # A -0.5 eltolás a mátrixkonverzió kerekítését a blend csonkolásához igazítja.
+    matrix = []
+    for channel in range(3):
+        matrix.extend((1.0 - saturation) * weight + (saturation if channel == column else 0.0)
+                      for column, weight in enumerate(LUMA_WEIGHTS))
+        matrix.append(-0.5)
+    adjusted = rgb.convert('RGB', tuple(matrix))
+    adjusted.putalpha(alpha)
+    return adjusted
+
+
+# --- KÉPKIVÁGÁS TERVEZÉSE ---
+def plan_photo_geometry(source_size, frame_size, fit_mode='fill', zoom=1.0, pan_x=0.5, pan_y=0.5):
+    """Kiszámolja egy képkeret geometriáját, mielőtt egyetlen pixelhez is hozzányúlnánk.
+
+    A `frame_size` az elrendezés szerinti keretméret; 'fit' módban ezt a kép
+    arányaihoz igazítjuk. A visszaadott szótár kulcsai:
+    - 'frame_size': a keret végleges mérete,
+    - 'zoomed_size': a teljes kép nagyított (virtuális) mérete,
+    - 'dest_box': a keret látható, képpel fedett része (keret-koordinátákban),
+    - 'source_box': ugyanez a terület a forráskép pixeleiben,
+    - 'origin': a nagyított kép bal felső sarka keret-koordinátákban (a pásztázás eredménye).
+    Ha a kép nem látszik, 'dest_box' és 'source_box' értéke None.
+    """
+    src_w, src_h = source_size
+    frame_w, frame_h = int(frame_size[0]), int(frame_size[1])
+    img_ratio = src_w / src_h
+
+    if fit_mode == 'fit':
+        frame_ratio = frame_w / frame_h if frame_h > 0 else 1
+        if img_ratio > frame_ratio: # A kép szélesebb, mint a keret
+            frame_h = int(frame_w / img_ratio)
+        else: # A kép magasabb, mint a keret
+            frame_w = int(frame_h * img_ratio)
+
+    plan = {'frame_size': (frame_w, frame_h), 'zoomed_size': None, 'dest_box': None, 'source_box': None, 'origin': None}
+    if frame_w <= 0 or frame_h <= 0:
+        return plan
+
+    if fit_mode == 'fill':
+        frame_ratio = frame_w / frame_h
+        if img_ratio > frame_ratio: new_h, new_w = int(frame_h * zoom), int(frame_h * zoom * img_ratio)
+        else: new_w, new_h = int(frame_w * zoom), int(frame_w * zoom / img_ratio)
+        if new_w < frame_w: new_w, new_h = frame_w, int(frame_w / img_ratio)
+        if new_h < frame_h: new_h, new_w = frame_h, int(frame_h * img_ratio)
+        extra_w, extra_h = max(0, new_w - frame_w), max(0, new_h - frame_h)
+        origin_x, origin_y = -int(extra_w * pan_x), -int(extra_h * pan_y)
+    else:
+        new_w, new_h = int(frame_w * zoom), int(frame_h * zoom)
+        if new_w < 1 or new_h < 1: new_w, new_h = 1, 1
+        extra_w, extra_h = max(0, new_w - frame_w), max(0, new_h - frame_h)
+        origin_x = (frame_w - new_w) // 2 - int(extra_w * (pan_x - 0.5))
+        origin_y = (frame_h - new_h) // 2 - int(extra_h * (pan_y - 0.5))
+    plan['zoomed_size'] = (new_w, new_h)
+    plan['origin'] = (origin_x, origin_y)
+
+    # A nagyított kép és a keret metszete: csak ezt a részt kell ténylegesen újramintavételezni
+    left, top = max(0, origin_x), max(0, origin_y)
+    right, bottom = min(frame_w, origin_x + new_w), min(frame_h, origin_y + new_h)
+    if right <= left or bottom <= top:
+        return plan
+    scale_x, scale_y = src_w / new_w, src_h / new_h
+    plan['dest_box'] = (left, top, right, bottom)
+    plan['source_box'] = ((left - origin_x) * scale_x, (top - origin_y) * scale_y,
+                          (right - origin_x) * scale_x, (bottom - origin_y) * scale_y)
+    return plan
+
+
+def render_planned_photo(image, plan, source_size, props=None, mean=None, resample=Image.LANCZOS, window=None):
+    """A terv alapján csak a látható területet mintavételezi újra, és utána korrigál.
+
+    Az `image` lehet az eredeti, egy kicsinyítve dekódolt példány vagy egy proxy;
+    a forrásdobozt a tényleges méretéhez igazítjuk. A korrekciók (fényerő stb.)
+    már a keretméretű eredményen futnak. A kontraszt középértékét (`mean`) a teljes
+    forrásképből kell megadni, hogy a kivágás ne befolyásolja.
+
+    `window` megadásakor (bal, felső, jobb, alsó, keret-koordinátákban) csak a
+    keretnek ezt a téglalapját készíti el, az eredmény is ekkora.
+    """
+    frame_w, frame_h = plan['frame_size']
+    window = window or (0, 0, frame_w, frame_h)
+    window_w, window_h = max(1, window[2] - window[0]), max(1, window[3] - window[1])
+    if plan['dest_box'] is None:
+        return Image.new('RGBA', (window_w, window_h), (0, 0, 0, 0))
+
+    dest_left, dest_top, dest_right, dest_bottom = plan['dest_box']
+    left, top = max(dest_left, window[0]), max(dest_top, window[1])
+    right, bottom = min(dest_right, window[2]), min(dest_bottom, window[3])
+    if right <= left or bottom <= top:
+        return Image.new('RGBA', (window_w, window_h), (0, 0, 0, 0))
+    scale_x, scale_y = image.width / source_size[0], image.height / source_size[1]
+    x0, y0, x1, y1 = plan['source_box']
+    if (left, top, right, bottom) != plan['dest_box']:
+        # A forrásdoboz a célterület lineáris képe, így a részablak forrása arányosan adódik
+        step_x, step_y = (x1 - x0) / (dest_right - dest_left), (y1 - y0) / (dest_bottom - dest_top)
+        x0, y0, x1, y1 = (x0 + (left - dest_left) * step_x, y0 + (top - dest_top) * step_y,
+                          x0 + (right - dest_left) * step_x, y0 + (bottom - dest_top) * step_y)
+    box = (x0 * scale_x, y0 * scale_y, min(image.width, x1 * scale_x), min(image.height, y1 * scale_y))
+    visible = image.resize((right - left, bottom - top), resample, box=box)
+
+    if props:
+        visible = apply_photo_adjustments(
+            visible, props.get('brightness', 1.0), props.get('contrast', 1.0),
+            props.get('saturation', 1.0), props.get('grayscale', False), mean=mean)
+
+    if (left, top, right, bottom) == window:
+        return visible
+    result = Image.new('RGBA', (window_w, window_h), (0, 0, 0, 0))
+    result.paste(visible, (left - window[0], top - window[1]))
+    return result
+
+
+def render_zoomed_photo(image, plan, source_size, props=None, mean=None, resample=Image.LANCZOS):
+    """A teljes nagyított kép (`zoomed_size`) újramintavételezve és korrigálva.
+
+    Ebből a köztes képből a pásztázás bármely állása egyszerű kivágással
+    (`crop_zoomed_photo`) előállítható; a szerkesztő a kijelölt képhez tartja meg.
+    """
+    zoomed_w, zoomed_h = plan['zoomed_size']
+    zoomed = image.resize((zoomed_w, zoomed_h), resample)
+    if props:
+        zoomed = apply_photo_adjustments(
+            zoomed, props.get('brightness', 1.0), props.get('contrast', 1.0),
+            props.get('saturation', 1.0), props.get('grayscale', False), mean=mean)
+    return zoomed
+
+
+def crop_zoomed_photo(zoomed, plan):
+    """A keret képe a nagyított köztes képből, újramintavételezés nélkül (lásd `render_zoomed_photo`)."""
+    frame_w, frame_h = plan['frame_size']
+    if plan['dest_box'] is None:
+        return Image.new('RGBA', (max(1, frame_w), max(1, frame_h)), (0, 0, 0, 0))
+    left, top, right, bottom = plan['dest_box']
+    origin_x, origin_y = plan['origin']
+    visible = zoomed.crop((left - origin_x, top - origin_y, right - origin_x, bottom - origin_y))
+    if (left, top, right, bottom) == (0, 0, frame_w, frame_h):
+        return visible
+    result = Image.new('RGBA', (frame_w, frame_h), (0, 0, 0, 0))
+    result.paste(visible, (left, top))
+    return result
+
+
+def source_adjustment_mean(path, props):
+    """A kontraszt középértéke a teljes forrásképre, a legkisebb proxy szintből számolva."""
+    if props.get('contrast', 1.0) == 1.0:
+        return None
+    sample = DECODED_IMAGE_CACHE.load_for_size(path, (128, 128), use_proxy=True)
+    if props.get('grayscale', False):
+        sample = sample.convert('L')
+    return adjustment_mean(sample, props.get('brightness', 1.0))
+
+
+# --- BEÉPÍTETT KERETEK ---
+PRESET_FRAME_COLORS = {'preset_black': (0, 0, 0, 200), 'preset_white': (255, 255, 255, 200), 'preset_gold': (212, 175, 55, 220)}
+PRESET_FRAME_CACHE = ImageLRUCache(max_bytes=128 * 1024 * 1024)
+
+
+def create_preset_frame(preset_name, size, thickness_ratio=0.05):
+    """Egyszínű, `thickness_ratio` vastagságú beépített keret, (név, méret, vastagság) szerint tárolva.
+
+    A keretet két művelettel állítjuk elő: egy teljesen kitöltött kép, amelynek
+    a belsejét átlátszóra cseréljük. A visszaadott kép megosztott, helyben nem módosítható.
+    """
+    width, height = int(size[0]), int(size[1])
+    frame_thickness = max(1, int(min(width, height) * thickness_ratio))
+    color = PRESET_FRAME_COLORS.get(preset_name, (0, 0, 0, 0))
+
+    def _build():
+        frame_image = Image.new('RGBA', (width, height), color)
+        if width - 2 * frame_thickness > 0 and height - 2 * frame_thickness > 0:
+            frame_image.paste((0, 0, 0, 0), (frame_thickness, frame_thickness, width - frame_thickness, height - frame_thickness))
+        return frame_image
+
+    return PRESET_FRAME_CACHE.get_or_create((preset_name, width, height, frame_thickness), _build)
+
+
+# --- KILENCSZELETES KERETEK ---
+class NineSliceStore:
+    """Keretképek kilencszeletes (nine-slice) méretezése.
+
+    A keret sarkait egységes léptékkel (torzítás nélkül) méretezzük, az éleket
+    csak a hosszuk mentén nyújtjuk, az átlátszó belsővel pedig nem foglalkozunk,
+    így egy keret ára a kerületével arányos, nem a területével.
+
+    A szeletelés határai (bal, felső, jobb, alsó beljebb húzás a forráskép
+    pixeleiben) a kép melletti azonos nevű `.json` fájlból jönnek, pl.
+    `{"left": 78, "top": 78, "right": 78, "bottom": 78}`; ha ilyen nincs, az
+    alfacsatornából ismerjük fel őket. Ha a keret belseje nem átlátszó, a
+    képet a régi módon, egészben nyújtjuk.
+    """
+
+    ALPHA_THRESHOLD = 32
+    CENTER_BAND = 0.05
+    EDGE_MARGIN = 0.005
+
+    def __init__(self, max_bytes):
+        self._pieces = ImageLRUCache(max_bytes)
+        self._insets = {}
+        self._lock = threading.RLock()
+
+    def insets(self, path):
+        """A (bal, felső, jobb, alsó) szeletelési határok, vagy None, ha a keret nem szeletelhető."""
+        key = DECODED_IMAGE_CACHE._key(path, 1)
+        with self._lock:
+            if key in self._insets:
+                return self._insets[key]
+        insets = self._read_sidecar(path)
+        if insets is None:
+            insets = self._detect_insets(DECODED_IMAGE_CACHE.load(path))
+        with self._lock:
+            self._insets[key] = insets
+        return insets
+
+    @staticmethod
+    def _read_sidecar(path):
+        sidecar_path = os.path.splitext(path)[0] + '.json'
+        if not os.path.exists(sidecar_path):
+            return None
+        try:
+            with open(sidecar_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return tuple(int(data[side]) for side in ('left', 'top', 'right', 'bottom'))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Figyelmeztetés: hibás keret-metaadat ({sidecar_path}): {e}")
+            return None
+
+    @classmethod
+    def _detect_insets(cls, image):
+        """A középvonalak mentén kifelé haladva megkeresi a keret belső szélét."""
+        width, height = image.size
+        mask = image.getchannel('A').point(lambda a: 255 if a > cls.ALPHA_THRESHOLD else 0)
+        cx, cy = width // 2, height // 2
+        dx, dy = max(1, int(width * cls.CENTER_BAND)), max(1, int(height * cls.CENTER_BAND))
+
+        left_box = mask.crop((0, cy - dy, cx, cy + dy)).getbbox()
+        right_box = mask.crop((cx, cy - dy, width, cy + dy)).getbbox()
+        top_box = mask.crop((cx - dx, 0, cx + dx, cy)).getbbox()
+        bottom_box = mask.crop((cx - dx, cy, cx + dx, height)).getbbox()
+        if not (left_box and right_box and top_box and bottom_box):
+            return None
+        # Kis ráhagyás, mert a kézzel rajzolt keretek belső széle ritkán pontosan egyenes
+        margin = max(2, round(min(width, height) * cls.EDGE_MARGIN))
+        insets = (left_box[2] + margin, top_box[3] + margin,
+                  width - cx - right_box[0] + margin, height - cy - bottom_box[1] + margin)
+        left, top, right, bottom = insets
+        if left + right >= width or top + bottom >= height:
+            return None
+        # Csak akkor szeletelünk, ha a belső rész tényleg átlátszó; különben elveszne a tartalma
+        if mask.crop((left, top, width - right, height - bottom)).getbbox() is not None:
+            return None
+        return insets
+
+    def render(self, path, size):
+        """A keret `size` méretben, vagy None, ha a kép nem szeletelhető. Megosztott darabokból áll össze."""
+        insets = self.insets(path)
+        if insets is None:
+            return None
+        target_w, target_h = int(size[0]), int(size[1])
+        source = DECODED_IMAGE_CACHE.load(path)
+        src_w, src_h = source.size
+        left, top, right, bottom = insets
+
+        # A sarkok léptéke egységes, így a keret vastagsága minden oldalon arányos marad
+        scale = min(target_w / src_w, target_h / src_h)
+        s_left, s_top = max(1, round(left * scale)), max(1, round(top * scale))
+        s_right, s_bottom = max(1, round(right * scale)), max(1, round(bottom * scale))
+        mid_w, mid_h = target_w - s_left - s_right, target_h - s_top - s_bottom
+        file_key = DECODED_IMAGE_CACHE._key(path, 1)
+
+        def piece(name, box, piece_size):
+            # Előbb kivágunk: az RGBA átméretezés a teljes forrást előszorzott alfára alakítaná
+            return self._pieces.get_or_create(
+                (file_key, name, piece_size), lambda: source.crop(box).resize(piece_size, Image.LANCZOS))
+
+        result = Image.new('RGBA', (target_w, target_h), (0, 0, 0, 0))
+        corners = (
+            ('tl', (0, 0, left, top), (s_left, s_top), (0, 0)),
+            ('tr', (src_w - right, 0, src_w, top), (s_right, s_top), (target_w - s_right, 0)),
+            ('bl', (0, src_h - bottom, left, src_h), (s_left, s_bottom), (0, target_h - s_bottom)),
+            ('br', (src_w - right, src_h - bottom, src_w, src_h), (s_right, s_bottom), (target_w - s_right, target_h - s_bottom)),
+        )
+        for name, box, piece_size, pos in corners:
+            result.paste(piece(name, box, piece_size), pos)
+        if mid_w > 0:
+            result.paste(piece('top', (left, 0, src_w - right, top), (mid_w, s_top)), (s_left, 0))
+            result.paste(piece('bottom', (left, src_h - bottom, src_w - right, src_h), (mid_w, s_bottom)), (s_left, target_h - s_bottom))
+        if mid_h > 0:
+            result.paste(piece('left', (0, top, left, src_h - bottom), (s_left, mid_h)), (0, s_top))
+            result.paste(piece('right', (src_w - right, top, src_w, src_h - bottom), (s_right, mid_h)), (target_w - s_right, s_top))
+        return result
+
+
+NINE_SLICE_STORE = NineSliceStore(max_bytes=96 * 1024 * 1024)
+
+
+def render_frame_asset(path, size):
+    """Egy keretkép `size` méretben: kilencszeletesen, ha lehet, különben egészben nyújtva."""
+    size = (max(1, int(size[0])), max(1, int(size[1])))
+    frame_image = NINE_SLICE_STORE.render(path, size)
+    if frame_image is None:
+        frame_image = DECODED_IMAGE_CACHE.load_for_size(path, size).resize(size, Image.LANCZOS)
+    return frame_image
+
+
+# --- OLDALRENDERELŐ ---
+# Az exportált oldalak tárának (`PageRenderCache`) kulcsaiba kerül; a renderelés kimenetét érintő változáskor növelni kell
+EXPORT_RENDER_VERSION = 2
+
+
+class PageRenderer:
+    """Tk-független oldalrenderelő: ugyanez a kód készíti a szerkesztő előnézetét és az exportot.
+
+    Minden elem relatív (0–1) koordinátákkal van elhelyezve, így egy oldal
+    tetszőleges célméretben kirajzolható: a szerkesztő a vászon méretében kéri,
+    az export az oldal teljes (300 DPI-s) pixelméretében. A betűméretek és a
+    keretek eltolásai a 600 px magas referencia-szerkesztőhöz mért értékek,
+    ezeket a célmagassággal arányosan skálázzuk.
+
+    A renderelő nem másolja a projekt adatait, csak hivatkozik rájuk; a
+    `photo_properties` és `z_order` szótárak kulcsai ugyanazok, mint a
+    szerkesztőben (`str((oldal, kép))`, illetve `str(oldal)`).
+    """
+
+    REFERENCE_EDITOR_HEIGHT = 600.0
+
+    def __init__(self, pages, photo_properties, z_order, default_background, default_size,
+                 resources=None, use_proxy=False, resample=Image.LANCZOS):
+        self.pages = pages
+        self.photo_properties = photo_properties
+        self.z_order = z_order
+        self.default_background = default_background
+        self.default_size = default_size
+        self.resources = resources if resources is not None else RenderResourceCache()
+        self.use_proxy = use_proxy
+        # A fényképek újramintavételezése; csúszkahúzás közben gyorsabb, durvább szűrő is lehet
+        self.resample = resample
+        # Azok az oldalak, amelyeken egy elem helyett hibajelzés készült (az exportálás ezeket nem tárolja el)
+        self.failed_pages = set()
+
+    def page_size(self, page_index):
+        """Az oldal nyomdai mérete pixelben."""
+        return tuple(self.pages[page_index].get('size', self.default_size))
+
+    def content_key(self, page_index):
+        """Az oldal tartalmának ujjlenyomata: minden, ami a renderelt képet befolyásolja.
+
+        A hivatkozott fájloknál az útvonal mellett a módosítási idő is bekerül, így egy
+        lemezen lecserélt kép is új kulcsot ad. Az előnézeti tárak ezzel azonosítják az oldalt.
+        """
+        page_data = self.pages[page_index]
+        photos = page_data.get('photos', [])
+        props = [self.photo_properties.get(str((page_index, i)), {}) for i in range(len(photos))]
+        background = page_data.get('background')
+        paths = [photo.get('path') for photo in photos] + [p.get('frame_path') for p in props]
+        paths += [page_data.get('page_frame_path'), background.get('path') if isinstance(background, dict) else None]
+        stamps = {path: os.stat(path).st_mtime_ns for path in paths if path and os.path.exists(path)}
+        payload = json.dumps([page_data, props, self.z_order.get(str(page_index), list(range(len(photos)))), self.default_background,
+                              list(self.default_size), stamps], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def render_key(self, page_index, variant):
+        """Az oldal exportált kimenetének tartalmi kulcsa a lemezes tárhoz (`PageRenderCache`).
+
+        A `content_key`-jel szemben a hivatkozott fájlokat (fotók, keretek, háttér és a
+        szövegek betűkészletei) a tartalmuk ujjlenyomata azonosítja, nem a módosítási
+        idejük, így egy visszamásolt vagy újra kicsomagolt fájl sem érvényteleníti a tárat.
+        A `variant` a kimenet fajtája (pl. 'PNG'); a renderelés változásakor az
+        `EXPORT_RENDER_VERSION` növelése az összes régi bejegyzést érvényteleníti.
+        """
+        page_data = self.pages[page_index]
+        photos = page_data.get('photos', [])
+        props = [self.photo_properties.get(str((page_index, i)), {}) for i in range(len(photos))]
+        background = page_data.get('background')
+        paths = [photo.get('path') for photo in photos] + [p.get('frame_path') for p in props]
+        paths += [page_data.get('page_frame_path'), background.get('path') if isinstance(background, dict) else None]
+        height_scale_factor = self.page_size(page_index)[1] / self.REFERENCE_EDITOR_HEIGHT
+        for text_data in page_data.get('texts', []):
+            font = load_text_font(text_data.get('font_family', 'Arial'), text_data.get('font_style', 'normal'),
+                                  int(text_data.get('font_size', 24) * height_scale_factor))
+            paths.append(getattr(font, 'path', None) if isinstance(getattr(font, 'path', None), str) else None)
+        fingerprints = {path: PROXY_STORE.fingerprint(path) for path in paths
+                        if path and not path.startswith('preset_') and os.path.exists(path)}
+        payload = json.dumps([EXPORT_RENDER_VERSION, variant, page_data, props,
+                              self.z_order.get(str(page_index), list(range(len(photos)))), self.default_background,
+                              list(self.default_size), fingerprints], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def render_page(self, page_index, size=None, region=None):
+        """Kirajzolja az oldalt `size` méretben (alapértelmezés: nyomdai méret), RGB képként.
+
+        `region` megadásakor (bal, felső, jobb, alsó, a célméret pixeleiben) csak
+        ezt a téglalapot készíti el; a téglalapba nem eső képekhez nem nyúl.
+        """
+        if page_index >= len(self.pages): return None
+        page_data = self.pages[page_index]
+        W, H = (int(size[0]), int(size[1])) if size else self.page_size(page_index)
+        if region is None: region = (0, 0, W, H)
+        region_x, region_y = region[0], region[1]
+        region_w, region_h = region[2] - region[0], region[3] - region[1]
+
+        full_page = region == (0, 0, W, H)
+        if full_page:
+            page_image = self.render_background(page_index, (W, H)).copy()
+        else:
+            page_image = self.render_background_region(page_index, (W, H), region)
+        draw = ImageDraw.Draw(page_image)
+
+        photos_data = page_data.get('photos', [])
+        for photo_idx in self.ordered_photo_indices(page_index):
+            frame_x, frame_y = int(photos_data[photo_idx]['relx'] * W), int(photos_data[photo_idx]['rely'] * H)
+            try:
+                if not full_page:
+                    # Részlet (csempe) esetén a képhelynek csak a régióba eső darabja készül el
+                    frame_w, frame_h = self.photo_plan(page_index, photo_idx, (W, H))['frame_size']
+                    if not self._intersects(region, (frame_x, frame_y, frame_x + frame_w, frame_y + frame_h)): continue
+                    window = (max(0, region[0] - frame_x), max(0, region[1] - frame_y),
+                              min(frame_w, region[2] - frame_x), min(frame_h, region[3] - frame_y))
+                    layer = self.photo_layer(page_index, photo_idx, (W, H), window=window)
+                    if layer is None: continue
+                    page_image.paste(layer, (frame_x + window[0] - region_x, frame_y + window[1] - region_y), layer)
+                    continue
+                layer = self.photo_layer(page_index, photo_idx, (W, H))
+                if layer is None: continue
+                if not self._intersects(region, (frame_x, frame_y) + tuple(map(sum, zip((frame_x, frame_y), layer.size)))): continue
+                page_image.paste(layer, (frame_x - region_x, frame_y - region_y), layer)
+            except Exception as e:
+                print(f"HIBA a(z) {page_index}. oldal, {photo_idx}. kép renderelésekor: {e}")
+                self.failed_pages.add(page_index)
+                frame_w, frame_h = self._slot_size(photos_data[photo_idx], (W, H))
+                box_x, box_y = frame_x - region_x, frame_y - region_y
+                draw.rectangle([box_x, box_y, box_x + frame_w, box_y + frame_h], outline="red", width=5)
+                draw.text((box_x + 10, box_y + 10), "Kép hiba", fill="red")
+
+        frame_layer = self.page_frame_layer(page_index, (W, H))
+        if frame_layer is not None:
+            frame_img, (paste_x, paste_y) = frame_layer
+            page_image.paste(frame_img, (paste_x - region_x, paste_y - region_y), frame_img)
+
+        self.draw_texts(draw, page_index, (W, H), origin=(region_x, region_y))
+
+        # ### JAVÍTÁS (Oldalkeretet): ###
+        # Ahelyett, hogy a végén RGB-re konvertálnánk (ami eldobja az átlátszóságot),
+        # egy fehér alapra másoljuk rá az RGBA (átlátszó) rétegeket tartalmazó képet.
+        # Így az átlátszó részek helyesen jelennek meg a fehér háttéren.
+        final_output_image = Image.new("RGB", (region_w, region_h), "white")
+        final_output_image.paste(page_image, (0, 0), page_image)
+        return final_output_image
+
+    @staticmethod
+    def _intersects(a, b):
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+    def ordered_photo_indices(self, page_index):
+        """A kitöltött képhelyek indexei rajzolási (z) sorrendben."""
+        photos_data = self.pages[page_index].get('photos', [])
+        ordered = self.z_order.get(str(page_index), list(range(len(photos_data))))
+        return [i for i in ordered if i < len(photos_data)
+                and photos_data[i].get('path') and os.path.exists(photos_data[i]['path'])]
+
+    def render_background(self, page_index, size):
+        """Az oldal háttere `size` méretben. Megosztott kép, rajzolás előtt másolni kell."""
+        W, H = int(size[0]), int(size[1])
+        bg_setting = self.pages[page_index].get('background')
+        if isinstance(bg_setting, dict) and bg_setting.get('type') == 'image':
+            img_path = bg_setting.get('path')
+            if img_path and os.path.exists(img_path):
+                return self.resources.resized(img_path, (W, H), use_proxy=self.use_proxy)
+        bg_color = bg_setting if isinstance(bg_setting, str) and bg_setting.startswith('#') else self.default_background
+        return self.resources.get_or_create(('color', bg_color, W, H), lambda: Image.new('RGBA', (W, H), bg_color))
+
+    def render_background_region(self, page_index, size, region):
+        """A háttér `region` téglalapja a `size` méretű oldalon, saját (módosítható) képként.
+
+        A háttérképet nem méretezzük át teljes oldalméretre: csak a régió forrásbeli
+        megfelelőjét mintavételezzük újra, a célmérethez elegendő dekódolási szintről.
+        """
+        W, H = int(size[0]), int(size[1])
+        region_w, region_h = region[2] - region[0], region[3] - region[1]
+        bg_setting = self.pages[page_index].get('background')
+        if isinstance(bg_setting, dict) and bg_setting.get('type') == 'image':
+            img_path = bg_setting.get('path')
+            if img_path and os.path.exists(img_path):
+                source = DECODED_IMAGE_CACHE.load_for_size(img_path, (W, H), use_proxy=self.use_proxy)
+                scale_x, scale_y = source.width / W, source.height / H
+                box = (region[0] * scale_x, region[1] * scale_y, region[2] * scale_x, region[3] * scale_y)
+                return source.resize((region_w, region_h), Image.LANCZOS, box=box)
+        bg_color = bg_setting if isinstance(bg_setting, str) and bg_setting.startswith('#') else self.default_background
+        return Image.new('RGBA', (region_w, region_h), bg_color)
+
+    @staticmethod
+    def _slot_size(photo_data, page_size):
+        master_rel_w = photo_data.get('layout_relwidth', photo_data['relwidth'])
+        master_rel_h = photo_data.get('layout_relheight', photo_data['relheight'])
+        return int(master_rel_w * page_size[0]), int(master_rel_h * page_size[1])
+
+    def photo_plan(self, page_index, photo_idx, page_size):
+        """A képhely geometriai terve (lásd `plan_photo_geometry`) az adott oldalméretnél."""
+        photo_data = self.pages[page_index]['photos'][photo_idx]
+        props = self.photo_properties.get(str((page_index, photo_idx)), {})
+        src_size = DECODED_IMAGE_CACHE.source_size(photo_data['path'])
+        return plan_photo_geometry(src_size, self._slot_size(photo_data, page_size), props.get('fit_mode', 'fill'),
+                                   props.get('zoom', 1.0), props.get('pan_x', 0.5), props.get('pan_y', 0.5))
+
+    def photo_layer(self, page_index, photo_idx, page_size, window=None):
+        """A képhely végleges képe (korrekciók, keret) a keret méretében, vagy None, ha nem látható.
+
+        `window` megadásakor csak a keret ezen téglalapja készül el (lásd `render_planned_photo`).
+        """
+        photo_data = self.pages[page_index]['photos'][photo_idx]
+        photo_path = photo_data.get('path')
+        if not photo_path or not os.path.exists(photo_path): return None
+        props = self.photo_properties.get(str((page_index, photo_idx)), {})
+
+        plan = self.photo_plan(page_index, photo_idx, page_size)
+        frame_w, frame_h = plan['frame_size']
+        if frame_w <= 0 or frame_h <= 0: return None
+        final_photo = self.photo_image(page_index, photo_idx, plan, window)
+        return self._apply_photo_frame(final_photo, props, page_size, plan['frame_size'], window)
+
+    def photo_image(self, page_index, photo_idx, plan, window=None):
+        """A képhely korrigált képe keret nélkül, a `plan` terv szerint (lásd `render_planned_photo`)."""
+        photo_path = self.pages[page_index]['photos'][photo_idx]['path']
+        props = self.photo_properties.get(str((page_index, photo_idx)), {})
+        src_size = DECODED_IMAGE_CACHE.source_size(photo_path)
+        # A forrást a nagyított célméret legközelebbi kettő-hatvány léptékében dekódoljuk,
+        # de csak a keretben látható részt mintavételezzük újra és korrigáljuk
+        original_img = DECODED_IMAGE_CACHE.load_for_size(photo_path, plan['zoomed_size'], use_proxy=self.use_proxy)
+        return render_planned_photo(original_img, plan, src_size, props, source_adjustment_mean(photo_path, props),
+                                    self.resample, window=window)
+
+    def zoomed_photo(self, page_index, photo_idx, page_size):
+        """A képhely teljes nagyított, korrigált köztes képe (keret nélkül), vagy None.
+
+        A szerkesztő ezt tartja meg a kijelölt képhez, hogy a pásztázást kivágással
+        szolgálja ki (`photo_layer_from_zoomed`). A pásztázás nem része.
+        """
+        photo_path = self.pages[page_index]['photos'][photo_idx].get('path')
+        if not photo_path or not os.path.exists(photo_path): return None
+        props = self.photo_properties.get(str((page_index, photo_idx)), {})
+        plan = self.photo_plan(page_index, photo_idx, page_size)
+        if plan['zoomed_size'] is None: return None
+        src_size = DECODED_IMAGE_CACHE.source_size(photo_path)
+        original_img = DECODED_IMAGE_CACHE.load_for_size(photo_path, plan['zoomed_size'], use_proxy=self.use_proxy)
+        return render_zoomed_photo(original_img, plan, src_size, props, source_adjustment_mean(photo_path, props), self.resample)
+
+    def photo_layer_from_zoomed(self, page_index, photo_idx, page_size, zoomed):
+        """Mint a `photo_layer`, de a képet a `zoomed_photo` köztes képéből vágja ki."""
+        plan = self.photo_plan(page_index, photo_idx, page_size)
+        if plan['frame_size'][0] <= 0 or plan['frame_size'][1] <= 0 or plan['zoomed_size'] != zoomed.size: return None
+        props = self.photo_properties.get(str((page_index, photo_idx)), {})
+        return self._apply_photo_frame(crop_zoomed_photo(zoomed, plan), props, page_size)
+
+    def _apply_photo_frame(self, final_photo, props, page_size, frame_size=None, window=None):
+        """A képkeret (ha van) ráhelyezése a képhely képére.
+
+        Ha a kép csak a keret `window` téglalapja, a `frame_size` méretű keretnek is csak ez a része kerül rá.
+        """
+        frame_path = props.get('frame_path')
+        if frame_path:
+            offset_scale = page_size[1] / self.REFERENCE_EDITOR_HEIGHT
+            frame_layer = self._frame_overlay(frame_path, frame_size or final_photo.size, props.get('frame_thickness', 0.05),
+                                              props.get('frame_scale', 1.0),
+                                              props.get('frame_offset_x', 0) * offset_scale,
+                                              props.get('frame_offset_y', 0) * offset_scale)
+            if frame_layer is not None:
+                frame_img, (paste_x, paste_y) = frame_layer
+                if window is not None:
+                    paste_x, paste_y = paste_x - window[0], paste_y - window[1]
+                final_photo.paste(frame_img, (paste_x, paste_y), frame_img)
+        return final_photo
+
+    def page_frame_layer(self, page_index, size):
+        """Az oldalkeret képe és bal felső sarka az oldal `size` méretéhez, vagy None."""
+        page_data = self.pages[page_index]
+        offset_scale = size[1] / self.REFERENCE_EDITOR_HEIGHT
+        return self._frame_overlay(page_data.get('page_frame_path'), (int(size[0]), int(size[1])),
+                                   page_data.get('page_frame_thickness', 0.05), page_data.get('page_frame_scale', 1.0),
+                                   page_data.get('page_frame_offset_x', 0) * offset_scale,
+                                   page_data.get('page_frame_offset_y', 0) * offset_scale)
+
+    def _frame_overlay(self, frame_path, size, thickness_ratio, f_scale, f_off_x, f_off_y):
+        """Egy (kép- vagy oldal-) keret a skálázott méretében, a középre igazított, eltolt pozícióval."""
+        if not frame_path or not (frame_path.startswith('preset_') or os.path.exists(frame_path)):
+            return None
+        geometry = self.frame_geometry(size, f_scale, f_off_x, f_off_y)
+        if geometry is None: return None
+        width, height = size
+        new_fw, new_fh, paste_x, paste_y = geometry
+
+        if frame_path.startswith('preset_'):
+            # A beépített keret vastagsága a keret eredeti méretéhez igazodik, csak utána skálázzuk
+            frame_img = create_preset_frame(frame_path, (width, height), thickness_ratio)
+            if (new_fw, new_fh) != (width, height):
+                frame_img = frame_img.resize((new_fw, new_fh), Image.LANCZOS)
+        else:
+            # A keretet közvetlenül a skálázott méretre szeleteljük, így a sarkok nem torzulnak
+            frame_img = self.resources.frame(frame_path, (new_fw, new_fh))
+        return frame_img, (paste_x, paste_y)
+
+    @staticmethod
+    def frame_geometry(size, f_scale, f_off_x, f_off_y):
+        """A `size` méretű helyre skálázott keret mérete és bal felső sarka: (szélesség, magasság, x, y), vagy None."""
+        width, height = size
+        new_fw, new_fh = int(width * f_scale), int(height * f_scale)
+        if new_fw <= 0 or new_fh <= 0: return None
+        return new_fw, new_fh, (width - new_fw) // 2 + int(round(f_off_x)), (height - new_fh) // 2 + int(round(f_off_y))
+
+    def draw_texts(self, draw, page_index, size, origin=(0, 0)):
+        """Kirajzolja az oldal szövegeit; a betűméret a célmagassággal arányos."""
+        W, H = size
+        height_scale_factor = H / self.REFERENCE_EDITOR_HEIGHT
+        for text_data in self.pages[page_index].get('texts', []):
+            try:
+                font_color = text_data.get('font_color', '#000000')
+                scaled_font_size = int(text_data.get('font_size', 24) * height_scale_factor)
+                font = load_text_font(text_data.get('font_family', 'Arial'), text_data.get('font_style', 'normal'), scaled_font_size)
+
+                text_x, text_y = int(text_data['relx'] * W) - origin[0], int(text_data['rely'] * H) - origin[1]
+                draw.text((text_x, text_y), text_data['text'], fill=font_color, font=font, anchor="mm")
+            
+            except Exception as e:
+                print(f"HIBA a szöveg renderelésekor: {e}")
+                traceback.print_exc()
+                self.failed_pages.add(page_index)
+
+
+@functools.lru_cache(maxsize=64)
+def load_text_font(font_family, font_style, size):
+    """A szöveg betűtípusa a rendszer TrueType fájljaiból, vagy a PIL alapértelmezett betűtípusa."""
+    font_variant = ""
+    if 'bold' in font_style and 'italic' in font_style: font_variant = "bi"
+    elif 'bold' in font_style: font_variant = "bd"
+    elif 'italic' in font_style: font_variant = "i"
+    font_name_base = font_family.lower().replace(' ', '')
+    
+    font_filenames_to_try = [f"{font_name_base}{font_variant}.ttf", f"{font_family}.ttf"]
+    if font_family == "Times New Roman": font_filenames_to_try.append("times.ttf")
+    if font_family == "Courier New": font_filenames_to_try.append("cour.ttf")
+
+    for name in font_filenames_to_try:
+        try:
+            return ImageFont.truetype(name, size=size)
+        except IOError:
+            continue 
+    
+    print(f"Figyelmeztetés: '{font_family}' betűtípus nem található, alapértelmezett betűtípus lesz használva.")
+    # A load_default nem fogadja el a size argumentumot, de a default font kicsi
+    return ImageFont.load_default()
+
+
+# --- PDF ÍRÁS ---
+# A PDF-be kerülő (nem változatlanul átvett) fotók és hátterek JPEG minősége
+PDF_JPEG_QUALITY = 85
+# Az eredeti JPEG akkor is átvehető, ha a vágás a forrásnak legalább ekkora részét meghagyja (a többit a PDF vágja le)
+PDF_PASSTHROUGH_MIN_VISIBLE = 0.75
+# ...és ha a felbontása legfeljebb ennyiszerese a nyomdai méretnek; a nagyobb képeket méretre kódoljuk, mert
+# egy 24 megapixeles eredeti egy kis képhelyen csak a fájlméretet növelné
+PDF_PASSTHROUGH_MAX_OVERSAMPLING = 1.5
+
+
+def encode_pdf_image(image, lossless=False, quality=None):
+    """Egy kép PDF képobjektumnak szánt kódolása (lásd `StreamingPdfWriter.add_image`).
+
+    A színadat JPEG (DCTDecode), `lossless=True` esetén tömörített nyers pixelek
+    (FlateDecode); az átlátszóság, ha van, külön szürkeárnyalatos maszkként (SMask)
+    kerül mellé. Az eredmény egyszerű szótár, így munkafolyamatból is visszaadható.
+    """
+    mask = None
+    if 'A' in image.getbands():
+        alpha = image.getchannel('A')
+        if alpha.getextrema()[0] < 255:
+            mask = zlib.compress(alpha.tobytes())
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('L' if image.mode in ('L', 'LA') else 'RGB')
+    if lossless:
+        data, pdf_filter = zlib.compress(image.tobytes()), 'FlateDecode'
+    else:
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=quality or PDF_JPEG_QUALITY)
+        data, pdf_filter = buffer.getvalue(), 'DCTDecode'
+    return {'size': image.size, 'gray': image.mode == 'L', 'filter': pdf_filter, 'data': data, 'mask': mask}
+
+
+def jpeg_passthrough_allowed(path, target_size):
+    """Igaz, ha a fájl olyan JPEG, amelynek a bájtjai újrakódolás nélkül a `target_size` méretű
+    (nyomdai pixelekben mért) helyre tehetők."""
+    try:
+        with Image.open(path) as source:
+            # A CMYK JPEG-ek egy része (Adobe) invertált színekkel van tárolva, ezeket inkább újrakódoljuk
+            if source.format != 'JPEG' or source.mode not in ('RGB', 'L'):
+                return False
+            return (source.width <= target_size[0] * PDF_PASSTHROUGH_MAX_OVERSAMPLING
+                    and source.height <= target_size[1] * PDF_PASSTHROUGH_MAX_OVERSAMPLING)
+    except OSError:
+        return False
+
+
+class StreamingPdfWriter:
+    """Oldalanként író PDF-készítő: minden oldal a hozzáadásakor a fájlba kerül.
+
+    A Pillow többoldalas PDF-mentése az összes oldalképet egyszerre igényli a
+    memóriában; itt egy oldal tartalma csak a kiírásáig él. Az objektumok a fájlba
+    íráskor kapják meg a helyüket, a lapfa (Pages) és a katalógus számát előre
+    lefoglaljuk, és csak a lezáráskor írjuk ki őket a kereszthivatkozási táblával
+    (xref) együtt. Más objektum száma is lefoglalható (`reserve`), ha a tartalma
+    csak később ismert. A fájl `.part` kiterjesztéssel készül, és csak a lezáráskor
+    kapja meg a végleges nevét; hiba esetén a félkész fájl törlődik, a korábbi kimenet megmarad.
+    """
+
+    def __init__(self, path, resolution=300.0, title=None):
+        self.path = path
+        self.resolution = resolution
+        self.title = title if title is not None else os.path.splitext(os.path.basename(path))[0]
+        self.page_count = 0
+        self._part_path = f"{path}.part"
+        self._file = open(self._part_path, 'wb')
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 1
+        self._catalog_id = self.reserve()
+        self._pages_id = self.reserve()
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            if os.path.exists(self._part_path):
+                os.remove(self._part_path)
+        return False
+
+    def reserve(self):
+        """Lefoglal egy objektumszámot; az objektumot a lezárás előtt ki kell írni (`write_object`)."""
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def write_object(self, obj_id, body, stream=None):
+        """Kiírja az `obj_id` objektumot; `stream` megadásakor a szótár után az adatfolyam következik."""
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode('ascii') + body.encode('latin-1'))
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def add_object(self, body, stream=None):
+        obj_id = self.reserve()
+        self.write_object(obj_id, body, stream)
+        return obj_id
+
+    def add_stream(self, data, entries=""):
+        """Flate-tel tömörített adatfolyam-objektum; az `entries` a szótár további bejegyzései."""
+        compressed = zlib.compress(data)
+        return self.add_object(f"<< /Length {len(compressed)} /Filter /FlateDecode{entries} >>", compressed)
+
+    def add_image(self, encoded):
+        """Képobjektum (XObject) egy `encode_pdf_image` eredményéből; a maszk külön objektumba kerül."""
+        width, height = encoded['size']
+        soft_mask = ""
+        if encoded['mask'] is not None:
+            mask_id = self.add_object(f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+                                      f"/BitsPerComponent 8 /Filter /FlateDecode /Length {len(encoded['mask'])} >>", encoded['mask'])
+            soft_mask = f" /SMask {mask_id} 0 R"
+        color_space = "/DeviceGray" if encoded['gray'] else "/DeviceRGB"
+        return self.add_object(f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace {color_space} "
+                               f"/BitsPerComponent 8 /Filter /{encoded['filter']}{soft_mask} /Length {len(encoded['data'])} >>",
+                               encoded['data'])
+
+    def add_jpeg_image(self, jpeg_data):
+        """Egy már JPEG-ként kódolt kép képobjektumként, újrakódolás nélkül (a méretet a fejlécből olvassuk)."""
+        with Image.open(io.BytesIO(jpeg_data)) as header:
+            (width, height), mode = header.size, header.mode
+        return self.add_image({'size': (width, height), 'gray': mode == 'L', 'filter': 'DCTDecode', 'data': jpeg_data, 'mask': None})
+
+    def add_page(self, size_pt, content_id, resources):
+        """Egy oldalobjektum a megadott tartalommal és erőforrás-szótárral (PDF szintaxisban)."""
+        page_id = self.add_object(f"<< /Type /Page /Parent {self._pages_id} 0 R /MediaBox [0 0 {size_pt[0]:.4f} {size_pt[1]:.4f}] "
+                                  f"/Resources {resources} /Contents {content_id} 0 R >>")
+        self._page_ids.append(page_id)
+        self.page_count += 1
+
+    @staticmethod
+    def text_string(text):
+        """PDF szöveg-karakterlánc (UTF-16BE, hexadecimálisan), így az ékezetes betűk is helyesek."""
+        return "<FEFF" + text.encode('utf-16-be').hex().upper() + ">"
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self.write_object(self._pages_id, f"<< /Type /Pages /Count {len(self._page_ids)} /Kids [{kids}] >>")
+        self.write_object(self._catalog_id, f"<< /Type /Catalog /Pages {self._pages_id} 0 R >>")
+        info_id = self.add_object(f"<< /Title {self.text_string(self.title)} "
+                                  f"/CreationDate ({time.strftime('D:%Y%m%d%H%M%SZ', time.gmtime())}) >>")
+        xref_offset = self._file.tell()
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        lines += [f"{self._offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, self._next_id)]
+        lines.append(f"trailer\n<< /Size {self._next_id} /Root {self._catalog_id} 0 R /Info {info_id} 0 R >>\n"
+                     f"startxref\n{xref_offset}\n%%EOF\n")
+        self._file.write("".join(lines).encode('ascii'))
+        self._file.close()
+        os.replace(self._part_path, self.path)
+
+
+class TrueTypeFontFile:
+    """Egy TrueType (glyf körvonalas) betűkészlet a PDF-be ágyazáshoz.
+
+    Csak a beágyazáshoz szükséges táblákat olvassuk: karakter → glifa
+    megfeleltetés (cmap), glifaszélességek (hmtx), metrikák (head, hhea, OS/2,
+    post) és a PostScript név. A `subset` a glifaszámokat megtartja, csak a nem
+    használt glifák körvonalait üríti ki, így a PDF-ben az azonos (Identity)
+    glifaszámozás marad érvényes. Más formátumnál (OpenType/CFF, gyűjtemény) ValueError.
+    """
+
+    REQUIRED_TABLES = ('head', 'hhea', 'hmtx', 'maxp', 'cmap', 'glyf', 'loca')
+
+    def __init__(self, data):
+        if data[:4] not in (b'\x00\x01\x00\x00', b'true'):
+            raise ValueError("nem TrueType (glyf) betűkészlet")
+        self.data = data
+        self.tables = {}
+        for i in range(struct.unpack_from('>H', data, 4)[0]):
+            tag, _, offset, length = struct.unpack_from('>4sIII', data, 12 + 16 * i)
+            self.tables[tag.decode('latin-1')] = (offset, length)
+        missing = [tag for tag in self.REQUIRED_TABLES if tag not in self.tables]
+        if missing:
+            raise ValueError(f"hiányzó táblák: {', '.join(missing)}")
+
+        head = self.tables['head'][0]
+        self.units_per_em = struct.unpack_from('>H', data, head + 18)[0]
+        self.bbox = struct.unpack_from('>4h', data, head + 36)
+        self.long_loca = struct.unpack_from('>h', data, head + 50)[0] == 1
+        hhea = self.tables['hhea'][0]
+        self.ascent, self.descent = struct.unpack_from('>2h', data, hhea + 4)
+        metric_count = struct.unpack_from('>H', data, hhea + 34)[0]
+        self.glyph_count = struct.unpack_from('>H', data, self.tables['maxp'][0] + 4)[0]
+        advances = struct.unpack_from('>' + 'Hh' * metric_count, data, self.tables['hmtx'][0])[0::2]
+        self.advances = list(advances) + [advances[-1]] * max(0, self.glyph_count - metric_count)
+
+        self.cap_height, self.embeddable = self.ascent, True
+        if 'OS/2' in self.tables:
+            os2, os2_length = self.tables['OS/2']
+            version, = struct.unpack_from('>H', data, os2)
+            # fsType: a "korlátozott licencű" betűkészlet nem ágyazható be
+            self.embeddable = struct.unpack_from('>H', data, os2 + 8)[0] & 0x000F != 0x0002
+            if version >= 2 and os2_length >= 90:
+                self.cap_height = struct.unpack_from('>h', data, os2 + 88)[0]
+        self.italic_angle, self.fixed_pitch = 0.0, False
+        if 'post' in self.tables:
+            post = self.tables['post'][0]
+            self.italic_angle = struct.unpack_from('>i', data, post + 4)[0] / 65536.0
+            self.fixed_pitch = struct.unpack_from('>I', data, post + 12)[0] != 0
+        self.cmap = self._read_cmap(self.tables['cmap'][0])
+        self.postscript_name = self._read_postscript_name() or "EmbeddedFont"
+
+    def _read_cmap(self, offset):
+        data = self.data
+        subtables = {}
+        for i in range(struct.unpack_from('>H', data, offset + 2)[0]):
+            platform, encoding, sub_offset = struct.unpack_from('>HHI', data, offset + 4 + 8 * i)
+            subtables[(platform, encoding)] = offset + sub_offset
+        for key in ((3, 10), (0, 4), (3, 1), (0, 3)):
+            start = subtables.get(key)
+            if start is None: continue
+            table_format, = struct.unpack_from('>H', data, start)
+            if table_format == 12:
+                cmap = {}
+                for i in range(struct.unpack_from('>I', data, start + 12)[0]):
+                    first, last, glyph = struct.unpack_from('>III', data, start + 16 + 12 * i)
+                    cmap.update(zip(range(first, last + 1), range(glyph, glyph + last - first + 1)))
+                return cmap
+            if table_format == 4:
+                return self._read_cmap_format4(start)
+        raise ValueError("nincs Unicode karaktertábla")
+
+    def _read_cmap_format4(self, start):
+        data = self.data
+        seg_count = struct.unpack_from('>H', data, start + 6)[0] // 2
+        ends = struct.unpack_from(f'>{seg_count}H', data, start + 14)
+        starts = struct.unpack_from(f'>{seg_count}H', data, start + 16 + 2 * seg_count)
+        deltas = struct.unpack_from(f'>{seg_count}h', data, start + 16 + 4 * seg_count)
+        range_base = start + 16 + 6 * seg_count
+        range_offsets = struct.unpack_from(f'>{seg_count}H', data, range_base)
+        cmap = {}
+        for i in range(seg_count):
+            for code in range(starts[i], min(ends[i], 0xFFFE) + 1):
+                if range_offsets[i] == 0:
+                    glyph = (code + deltas[i]) & 0xFFFF
+                else:
+                    glyph, = struct.unpack_from('>H', data, range_base + 2 * i + range_offsets[i] + 2 * (code - starts[i]))
+                    if glyph: glyph = (glyph + deltas[i]) & 0xFFFF
+                if glyph: cmap[code] = glyph
+        return cmap
+
+    def _read_postscript_name(self):
+        if 'name' not in self.tables: return None
+        offset = self.tables['name'][0]
+        count, strings = struct.unpack_from('>HH', self.data, offset + 2)
+        for i in range(count):
+            platform, _, _, name_id, length, string_offset = struct.unpack_from('>6H', self.data, offset + 6 + 12 * i)
+            if name_id != 6: continue
+            raw = self.data[offset + strings + string_offset:offset + strings + string_offset + length]
+            name = re.sub(r'[^A-Za-z0-9_-]', '', raw.decode('utf-16-be' if platform in (0, 3) else 'latin-1', errors='ignore'))
+            if name: return name
+        return None
+
+    def glyph_id(self, char):
+        return self.cmap.get(ord(char), 0)
+
+    def width(self, glyph):
+        """A glifa előretolása a PDF 1000 egységes glifaterében."""
+        return self.advances[glyph] * 1000.0 / self.units_per_em if glyph < len(self.advances) else 0.0
+
+    def scaled(self, value):
+        return value * 1000.0 / self.units_per_em
+
+    def _glyph_offsets(self):
+        loca = self.tables['loca'][0]
+        if self.long_loca:
+            return struct.unpack_from(f'>{self.glyph_count + 1}I', self.data, loca)
+        return [offset * 2 for offset in struct.unpack_from(f'>{self.glyph_count + 1}H', self.data, loca)]
+
+    def subset(self, glyph_ids):
+        """A betűkészlet fájlja, amelyben csak a `glyph_ids` glifák (és összetevőik) körvonalai maradnak meg."""
+        data = self.data
+        offsets = self._glyph_offsets()
+        glyf = self.tables['glyf'][0]
+        keep = set()
+        pending = [0] + [glyph for glyph in glyph_ids if glyph < self.glyph_count]
+        while pending:
+            glyph = pending.pop()
+            if glyph in keep: continue
+            keep.add(glyph)
+            start, end = glyf + offsets[glyph], glyf + offsets[glyph + 1]
+            if end - start < 10 or struct.unpack_from('>h', data, start)[0] >= 0: continue
+            # Összetett glifa: az összetevőket is meg kell tartani
+            position, more = start + 10, True
+            while more:
+                flags, component = struct.unpack_from('>HH', data, position)
+                position += 4 + (4 if flags & 0x0001 else 2)
+                position += 2 if flags & 0x0008 else 4 if flags & 0x0040 else 8 if flags & 0x0080 else 0
+                more = bool(flags & 0x0020)
+                if component not in keep: pending.append(component)
+
+        glyph_data, new_offsets = bytearray(), []
+        for glyph in range(self.glyph_count):
+            new_offsets.append(len(glyph_data))
+            if glyph in keep:
+                glyph_data += data[glyf + offsets[glyph]:glyf + offsets[glyph + 1]]
+                glyph_data += b'\0' * (-len(glyph_data) % 4)
+        new_offsets.append(len(glyph_data))
+
+        tables = {tag: data[offset:offset + length] for tag, (offset, length) in self.tables.items() if tag != 'DSIG'}
+        tables['glyf'] = bytes(glyph_data)
+        tables['loca'] = struct.pack(f'>{len(new_offsets)}I', *new_offsets)
+        head = bytearray(tables['head'])
+        head[8:12] = b'\0\0\0\0'
+        head[50:52] = struct.pack('>h', 1)
+        tables['head'] = bytes(head)
+        return self._build_font_file(tables)
+
+    @staticmethod
+    def _checksum(table):
+        padded = table + b'\0' * (-len(table) % 4)
+        return sum(struct.unpack(f'>{len(padded) // 4}I', padded)) & 0xFFFFFFFF
+
+    @classmethod
+    def _build_font_file(cls, tables):
+        tags = sorted(tables)
+        entry_selector = max(0, len(tags).bit_length() - 1)
+        search_range = (1 << entry_selector) * 16
+        header = struct.pack('>IHHHH', 0x00010000, len(tags), search_range, entry_selector, len(tags) * 16 - search_range)
+        offset = len(header) + 16 * len(tags)
+        directory, body = bytearray(), bytearray()
+        head_position = 0
+        for tag in tags:
+            table = tables[tag]
+            if tag == 'head': head_position = offset + len(body)
+            directory += struct.pack('>4sIII', tag.encode('latin-1'), cls._checksum(table), offset + len(body), len(table))
+            body += table + b'\0' * (-len(table) % 4)
+        font_file = bytearray(header + directory + body)
+        adjustment = (0xB1B0AFBA - cls._checksum(bytes(font_file))) & 0xFFFFFFFF
+        font_file[head_position + 8:head_position + 12] = struct.pack('>I', adjustment)
+        return bytes(font_file)
+
+
+class StructuredPdfComposer:
+    """Szerkezetes PDF-oldalak: minden elem saját PDF objektum, nem egyetlen oldalkép.
+
+    - A háttérszín kitöltött téglalap, a háttérkép közös képobjektum (XObject).
+    - Minden képhely saját képobjektum. A változatlan (korrekció nélküli,
+      legfeljebb enyhén vágott) JPEG fotók eredeti bájtjai kerülnek a fájlba,
+      a látható részre vágva; a többi fotó csak a látható részével, a képhely
+      nyomdai méretében, JPEG-ként kódolva (`pdf_page_photos` készíti el a
+      munkafolyamatokban).
+    - A beépített keretek vektoros téglalapok, a képkeretek közös képobjektumok
+      átlátszósági maszkkal; ugyanaz a keret ugyanabban a méretben egyszer kerül a fájlba.
+    - A szövegek valódi PDF szövegek a beágyazott (részhalmazra szűkített)
+      TrueType betűkészlettel; ha a betűkészlet nem ágyazható be, a szöveg képként kerül az oldalra.
+
+    A koordináták a renderelőével azonosak (oldalpixelek, `resolution` DPI),
+    a PDF pontjaira csak a tartalomfolyam írásakor váltunk át. A betűkészleteket
+    a `finish()` írja ki, ezt a fájl lezárása előtt kell meghívni.
+    """
+
+    def __init__(self, writer, snapshot):
+        self.writer = writer
+        self.renderer = create_snapshot_renderer(snapshot, RenderResourceCache())
+        self.scale = 72.0 / writer.resolution
+        self._shared_images = {}
+        self._fonts = {}
+        self.counts = {'passthrough': 0, 'encoded': 0, 'shared': 0, 'shared_reused': 0, 'raster_texts': 0}
+
+    # --- oldal tartalma ---
+    def add_page(self, page_index, photo_parts):
+        """Kiírja az oldalt; a `photo_parts` a `pdf_page_photos` eredménye ugyanerre az oldalra."""
+        page_data = self.renderer.pages[page_index]
+        W, H = self.renderer.page_size(page_index)
+        self._page_height = H
+        self._ops, self._xobjects, self._page_fonts, self._alphas = [], {}, {}, set()
+
+        self._draw_background(page_index, (W, H))
+        for part in photo_parts:
+            self._draw_photo(page_index, part, (W, H))
+        offset_scale = H / self.renderer.REFERENCE_EDITOR_HEIGHT
+        self._draw_frame(page_data.get('page_frame_path'), (0, 0, W, H), page_data.get('page_frame_thickness', 0.05),
+                         page_data.get('page_frame_scale', 1.0), page_data.get('page_frame_offset_x', 0) * offset_scale,
+                         page_data.get('page_frame_offset_y', 0) * offset_scale, clip=False)
+        for text_data in page_data.get('texts', []):
+            try:
+                self._draw_text(text_data, (W, H))
+            except Exception as e:
+                print(f"HIBA a szöveg PDF-be írásakor: {e}")
+                traceback.print_exc()
+
+        content_id = self.writer.add_stream("\n".join(self._ops).encode('latin-1'))
+        self.writer.add_page((W * self.scale, H * self.scale), content_id, self._resources())
+
+    def _resources(self):
+        entries = ["/ProcSet [/PDF /Text /ImageB /ImageC]"]
+        if self._xobjects:
+            entries.append("/XObject << " + " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in self._xobjects.items()) + " >>")
+        if self._page_fonts:
+            entries.append("/Font << " + " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in self._page_fonts.items()) + " >>")
+        if self._alphas:
+            entries.append("/ExtGState << " + " ".join(f"/GS{alpha} << /ca {alpha / 255:.4f} /CA {alpha / 255:.4f} >>"
+                                                      for alpha in sorted(self._alphas)) + " >>")
+        return "<< " + " ".join(entries) + " >>"
+
+    def _rect(self, box):
+        """Egy (x, y, szélesség, magasság) oldalpixeles téglalap a PDF `re` operátorához."""
+        x, y, w, h = box
+        return f"{x * self.scale:.3f} {(self._page_height - y - h) * self.scale:.3f} {w * self.scale:.3f} {h * self.scale:.3f} re"
+
+    def _set_fill(self, color):
+        """Kitöltőszín (és ha kell, átlátszóság) beállítása egy PIL színmegadásból."""
+        rgba = ImageColor.getrgb(color) if isinstance(color, str) else tuple(color)
+        self._ops.append(f"{rgba[0] / 255:.4f} {rgba[1] / 255:.4f} {rgba[2] / 255:.4f} rg")
+        if len(rgba) > 3 and rgba[3] < 255:
+            self._alphas.add(rgba[3])
+            self._ops.append(f"/GS{rgba[3]} gs")
+
+    def _place_image(self, obj_id, box, clip=None):
+        """A képobjektum a `box` téglalapba nyújtva, `clip` megadásakor arra a téglalapra vágva."""
+        name = f"Im{obj_id}"
+        self._xobjects[name] = obj_id
+        x, y, w, h = box
+        clip_ops = f"{self._rect(clip)} W n " if clip else ""
+        self._ops.append(f"q {clip_ops}{w * self.scale:.3f} 0 0 {h * self.scale:.3f} {x * self.scale:.3f} "
+                         f"{(self._page_height - y - h) * self.scale:.3f} cm /{name} Do Q")
+
+    def _shared_image(self, key, create):
+        """Közös képobjektum: a `create()` eredménye csak az első kéréskor kerül a fájlba."""
+        obj_id = self._shared_images.get(key)
+        if obj_id is None:
+            obj_id = self._shared_images[key] = create()
+            self.counts['shared'] += 1
+        else:
+            self.counts['shared_reused'] += 1
+        return obj_id
+
+    def _jpeg_file_image(self, path):
+        def create():
+            with open(path, 'rb') as f:
+                return self.writer.add_jpeg_image(f.read())
+        return self._shared_image(('jpeg', DECODED_IMAGE_CACHE._key(path, 1)), create)
+
+    def _draw_background(self, page_index, size):
+        W, H = size
+        bg_setting = self.renderer.pages[page_index].get('background')
+        if isinstance(bg_setting, dict) and bg_setting.get('type') == 'image':
+            img_path = bg_setting.get('path')
+            if img_path and os.path.exists(img_path):
+                if jpeg_passthrough_allowed(img_path, (W, H)):
+                    obj_id = self._jpeg_file_image(img_path)
+                else:
+                    obj_id = self._shared_image(('background', DECODED_IMAGE_CACHE._key(img_path, 1), W, H), lambda: self.writer.add_image(
+                        encode_pdf_image(self.renderer.resources.resized(img_path, (W, H)))))
+                self._place_image(obj_id, (0, 0, W, H))
+                return
+        bg_color = bg_setting if isinstance(bg_setting, str) and bg_setting.startswith('#') else self.renderer.default_background
+        self._ops.append("q")
+        self._set_fill(bg_color)
+        self._ops.append(f"{self._rect((0, 0, W, H))} f Q")
+
+    def _draw_photo(self, page_index, part, page_size):
+        frame_box = part['box']
+        if 'error' in part:
+            # Mint a renderelőben: piros, 5 px vastag, befelé rajzolt körvonal
+            x, y, w, h = frame_box
+            self._ops.append(f"q 1 0 0 RG {5 * self.scale:.3f} w {self._rect((x + 2.5, y + 2.5, w - 5, h - 5))} S Q")
+            return
+        if part.get('jpeg'):
+            # Az útvonal a pillanatképből jön, nem az eredményből (az a lemezes tárból is érkezhet)
+            photo_path = self.renderer.pages[page_index]['photos'][part['photo_idx']]['path']
+            self._place_image(self._jpeg_file_image(photo_path), part['placement'], clip=part['clip'])
+            self.counts['passthrough'] += 1
+        elif 'image' in part:
+            # Ugyanaz a fotó ugyanazzal a vágással (pl. ismétlődő oldalakon) csak egyszer kerül a fájlba
+            encoded = part['image']
+            key = ('photo', hashlib.sha1(encoded['data']).hexdigest(), encoded['mask'] is not None and hashlib.sha1(encoded['mask']).hexdigest())
+            self._place_image(self._shared_image(key, lambda: self.writer.add_image(encoded)), part['placement'])
+            self.counts['encoded'] += 1
+
+        props = self.renderer.photo_properties.get(str((page_index, part['photo_idx'])), {})
+        offset_scale = page_size[1] / self.renderer.REFERENCE_EDITOR_HEIGHT
+        self._draw_frame(props.get('frame_path'), frame_box, props.get('frame_thickness', 0.05), props.get('frame_scale', 1.0),
+                         props.get('frame_offset_x', 0) * offset_scale, props.get('frame_offset_y', 0) * offset_scale)
+
+    def _draw_frame(self, frame_path, box, thickness_ratio, f_scale, f_off_x, f_off_y, clip=True):
+        """Kép- vagy oldalkeret a `box` helyen, a `PageRenderer._frame_overlay` elhelyezésével."""
+        if not frame_path or not (frame_path.startswith('preset_') or os.path.exists(frame_path)):
+            return
+        x, y, width, height = box
+        geometry = self.renderer.frame_geometry((width, height), f_scale, f_off_x, f_off_y)
+        if geometry is None: return
+        new_fw, new_fh, paste_x, paste_y = geometry
+        placement = (x + paste_x, y + paste_y, new_fw, new_fh)
+        if frame_path.startswith('preset_'):
+            # A beépített keret két egymásba írt téglalap, páros-páratlan kitöltéssel
+            thickness = max(1, int(min(width, height) * thickness_ratio))
+            ops = ["q"]
+            if clip: ops.append(f"{self._rect(box)} W n")
+            self._ops.extend(ops)
+            self._set_fill(PRESET_FRAME_COLORS.get(frame_path, (0, 0, 0, 0)))
+            path = self._rect(placement)
+            if width - 2 * thickness > 0 and height - 2 * thickness > 0:
+                scale_x, scale_y = new_fw / width, new_fh / height
+                path += " " + self._rect((placement[0] + thickness * scale_x, placement[1] + thickness * scale_y,
+                                          new_fw - 2 * thickness * scale_x, new_fh - 2 * thickness * scale_y))
+            self._ops.append(f"{path} f* Q")
+            return
+        obj_id = self._shared_image(('frame', DECODED_IMAGE_CACHE._key(frame_path, 1), new_fw, new_fh), lambda: self.writer.add_image(
+            encode_pdf_image(self.renderer.resources.frame(frame_path, (new_fw, new_fh)))))
+        self._place_image(obj_id, placement, clip=box if clip else None)
+
+    def _draw_text(self, text_data, page_size):
+        W, H = page_size
+        scaled_font_size = int(text_data.get('font_size', 24) * H / self.renderer.REFERENCE_EDITOR_HEIGHT)
+        font = load_text_font(text_data.get('font_family', 'Arial'), text_data.get('font_style', 'normal'), scaled_font_size)
+        text_x, text_y = int(text_data['relx'] * W), int(text_data['rely'] * H)
+        color = text_data.get('font_color', '#000000')
+        embedded = self._embedded_font(font)
+        if embedded is None:
+            self._draw_text_image(text_data['text'], font, color, (text_x, text_y))
+            return
+
+        # A sorok elhelyezése a PIL "mm" horgonyát követi: a balra zárt sorok tömbje vízszintesen
+        # és függőlegesen is középre kerül, a PIL többsoros sorközével
+        lines = text_data['text'].split("\n")
+        ascent, descent = font.getmetrics()
+        line_spacing = font.getbbox("A")[3] + 4
+        left = text_x - max(font.getlength(line) for line in lines) / 2.0
+        self._ops.append("q")
+        self._set_fill(color)
+        self._ops.append(f"BT /{embedded['name']} {font.size * self.scale:.3f} Tf")
+        for line_index, line in enumerate(lines):
+            if not line: continue
+            baseline = text_y + (line_index - (len(lines) - 1) / 2.0) * line_spacing + (ascent - descent) / 2.0
+            glyphs = []
+            for char in line:
+                glyph = embedded['file'].glyph_id(char)
+                embedded['used'].setdefault(glyph, char)
+                glyphs.append(f"{glyph:04X}")
+            self._ops.append(f"1 0 0 1 {left * self.scale:.3f} {(self._page_height - baseline) * self.scale:.3f} Tm <{''.join(glyphs)}> Tj")
+        self._ops.append("ET Q")
+        self._page_fonts[embedded['name']] = embedded['id']
+
+    def _embedded_font(self, font):
+        """A PIL betűtípus beágyazási állapota, vagy None, ha vektoros szövegként nem írható ki."""
+        source = getattr(font, 'path', None)
+        key = source if isinstance(source, str) else id(source)
+        if key in self._fonts:
+            return self._fonts[key]
+        embedded = None
+        try:
+            if getattr(font, 'index', 0) == 0 and source is not None:
+                if isinstance(source, str):
+                    with open(source, 'rb') as f:
+                        data = f.read()
+                else:
+                    data = source.getvalue()
+                font_file = TrueTypeFontFile(data)
+                if font_file.embeddable:
+                    embedded = {'name': f"F{len(self._fonts) + 1}", 'id': self.writer.reserve(), 'file': font_file, 'used': {}}
+        except (OSError, ValueError, struct.error, AttributeError) as e:
+            print(f"Figyelmeztetés: a betűtípus nem ágyazható be, a szöveg képként kerül a PDF-be: {e}")
+        self._fonts[key] = embedded
+        return embedded
+
+    def _draw_text_image(self, text, font, color, center):
+        """Tartalék: a szöveg a renderelővel azonos módon képpé rajzolva, átlátszósági maszkkal."""
+        bbox = ImageDraw.Draw(Image.new('L', (1, 1))).textbbox(center, text, font=font, anchor="mm")
+        width, height = max(1, int(math.ceil(bbox[2] - bbox[0]))), max(1, int(math.ceil(bbox[3] - bbox[1])))
+        mask = Image.new('L', (width, height), 0)
+        ImageDraw.Draw(mask).text((center[0] - bbox[0], center[1] - bbox[1]), text, fill=255, font=font, anchor="mm")
+        text_image = Image.new('RGBA', (width, height), ImageColor.getrgb(color))
+        text_image.putalpha(mask)
+        self._place_image(self.writer.add_image(encode_pdf_image(text_image, lossless=True)), (bbox[0], bbox[1], width, height))
+        self.counts['raster_texts'] += 1
+
+    # --- betűkészletek ---
+    def finish(self):
+        """Kiírja a használt betűkészleteket (részhalmaz, szélességek, Unicode-megfeleltetés)."""
+        for embedded in self._fonts.values():
+            if embedded is not None:
+                self._write_font(embedded)
+
+    def _write_font(self, embedded):
+        font_file, used = embedded['file'], embedded['used']
+        glyphs = sorted(used)
+        font_data = font_file.subset(glyphs)
+        # A részhalmaz-előtag a használt glifákból képzett hat nagybetű
+        digest = hashlib.sha1(repr(glyphs).encode('ascii')).digest()
+        base_font = "".join(chr(ord('A') + byte % 26) for byte in digest[:6]) + "+" + font_file.postscript_name
+        font_file_id = self.writer.add_stream(font_data, f" /Length1 {len(font_data)}")
+
+        flags = 32 | (1 if font_file.fixed_pitch else 0) | (64 if font_file.italic_angle else 0)
+        bbox = " ".join(f"{font_file.scaled(value):.0f}" for value in font_file.bbox)
+        descriptor_id = self.writer.add_object(
+            f"<< /Type /FontDescriptor /FontName /{base_font} /Flags {flags} /FontBBox [{bbox}] "
+            f"/ItalicAngle {font_file.italic_angle:.2f} /Ascent {font_file.scaled(font_file.ascent):.0f} "
+            f"/Descent {font_file.scaled(font_file.descent):.0f} /CapHeight {font_file.scaled(font_file.cap_height):.0f} "
+            f"/StemV 80 /FontFile2 {font_file_id} 0 R >>")
+        widths = " ".join(f"{glyph} [{font_file.width(glyph):.0f}]" for glyph in glyphs)
+        cid_font_id = self.writer.add_object(
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base_font} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {descriptor_id} 0 R /DW 1000 /W [{widths}] /CIDToGIDMap /Identity >>")
+        to_unicode_id = self.writer.add_stream(self._to_unicode_cmap(used))
+        self.writer.write_object(embedded['id'], f"<< /Type /Font /Subtype /Type0 /BaseFont /{base_font} /Encoding /Identity-H "
+                                                 f"/DescendantFonts [{cid_font_id} 0 R] /ToUnicode {to_unicode_id} 0 R >>")
+
+    @staticmethod
+    def _to_unicode_cmap(used):
+        """A glifaszámok Unicode-megfeleltetése, hogy a PDF szövege kijelölhető és kereshető legyen."""
+        lines = ["/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+                 "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+                 "/CMapName /Adobe-Identity-UCS def", "/CMapType 2 def",
+                 "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange"]
+        # A hiányzó karakterek helyén álló .notdef glifának nincs Unicode megfelelője
+        entries = sorted((glyph, char) for glyph, char in used.items() if glyph)
+        for start in range(0, len(entries), 100):
+            chunk = entries[start:start + 100]
+            lines.append(f"{len(chunk)} beginbfchar")
+            lines += [f"<{glyph:04X}> <{char.encode('utf-16-be').hex().upper()}>" for glyph, char in chunk]
+            lines.append("endbfchar")
+        lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+        return "\n".join(lines).encode('ascii')
+
+    def report(self):
+        counts = self.counts
+        fonts = sum(1 for embedded in self._fonts.values() if embedded is not None)
+        return (f"{counts['passthrough']} fotó változatlan JPEG-ként, {counts['encoded']} újrakódolva; "
+                f"{counts['shared']} közös kép/keret ({counts['shared_reused']} újrahasznosítás), "
+                f"{fonts} beágyazott betűkészlet, {counts['raster_texts']} képként írt szöveg")
+
+
+def pdf_page_photos(renderer, page_index):
+    """Egy oldal képhelyeinek PDF-be szánt tartalma rajzolási sorrendben (lásd `StructuredPdfComposer`).
+
+    Minden elem szótár: 'photo_idx', 'box' (a képhely helye és mérete oldalpixelekben), továbbá
+    - 'jpeg': True, 'placement' (a teljes nagyított kép helye) és 'clip' (a látható rész), ha a
+      fotó újrakódolás nélkül átvehető (a fájlt a `StructuredPdfComposer` a saját adataiból keresi meg);
+    - egyébként 'image' (`encode_pdf_image` eredménye) és 'placement' (a látható rész helye);
+    - hibás képhelynél 'error'.
+    A munkafolyamatokban fut, ezért csak szerializálható (pickle) adatot ad vissza.
+    """
+    if page_index >= len(renderer.pages): return None
+    W, H = renderer.page_size(page_index)
+    photos_data = renderer.pages[page_index].get('photos', [])
+    parts = []
+    for photo_idx in renderer.ordered_photo_indices(page_index):
+        photo_data = photos_data[photo_idx]
+        frame_x, frame_y = int(photo_data['relx'] * W), int(photo_data['rely'] * H)
+        part = {'photo_idx': photo_idx, 'box': (frame_x, frame_y) + renderer._slot_size(photo_data, (W, H))}
+        try:
+            plan = renderer.photo_plan(page_index, photo_idx, (W, H))
+            frame_w, frame_h = plan['frame_size']
+            if frame_w <= 0 or frame_h <= 0: continue
+            part['box'] = (frame_x, frame_y, frame_w, frame_h)
+            if plan['dest_box'] is not None:
+                left, top, right, bottom = plan['dest_box']
+                visible_box = (frame_x + left, frame_y + top, right - left, bottom - top)
+                props = renderer.photo_properties.get(str((page_index, photo_idx)), {})
+                src_w, src_h = DECODED_IMAGE_CACHE.source_size(photo_data['path'])
+                x0, y0, x1, y1 = plan['source_box']
+                if (not photo_adjustments_active(props) and (x1 - x0) * (y1 - y0) >= PDF_PASSTHROUGH_MIN_VISIBLE * src_w * src_h
+                        and jpeg_passthrough_allowed(photo_data['path'], plan['zoomed_size'])):
+                    part.update(jpeg=True, clip=visible_box,
+                                placement=(frame_x + plan['origin'][0], frame_y + plan['origin'][1]) + tuple(plan['zoomed_size']))
+                else:
+                    visible = renderer.photo_image(page_index, photo_idx, plan, window=plan['dest_box'])
+                    part.update(image=encode_pdf_image(visible), placement=visible_box)
+        except Exception as e:
+            print(f"HIBA a(z) {page_index}. oldal, {photo_idx}. kép PDF-be készítésekor: {e}")
+            part['error'] = str(e)
+            renderer.failed_pages.add(page_index)
+        parts.append(part)
+    return parts
+
+
+def pack_pdf_page_parts(parts):
+    """A `pdf_page_photos` eredménye a lemezes tárhoz, csak adatként: 4 bájtos hossz, JSON fejléc,
+    majd a képek bájtjai egymás után. (Pickle-t nem használunk: a tár a projekt mellett van,
+    egy idegen projektmappa bejegyzése így nem futtathat kódot.)"""
+    blobs, offset = [], 0
+    header = []
+    for part in parts:
+        part = dict(part)
+        if 'image' in part:
+            image = dict(part['image'])
+            for field in ('data', 'mask'):
+                if image[field] is not None:
+                    blobs.append(image[field])
+                    image[field] = [offset, len(image[field])]
+                    offset += len(blobs[-1])
+            part['image'] = image
+        header.append(part)
+    header_bytes = json.dumps(header).encode('utf-8')
+    return struct.pack('>I', len(header_bytes)) + header_bytes + b''.join(blobs)
+
+
+def unpack_pdf_page_parts(data):
+    """A `pack_pdf_page_parts` párja; hibás vagy ismeretlen felépítésű adatnál ValueError."""
+    (header_length,) = struct.unpack_from('>I', data)
+    body_start = 4 + header_length
+    parts = json.loads(data[4:body_start].decode('utf-8'))
+    if not isinstance(parts, list):
+        raise ValueError("érvénytelen fejléc")
+
+    def box(value, length):
+        if not isinstance(value, list) or len(value) != length or not all(isinstance(v, (int, float)) for v in value):
+            raise ValueError("érvénytelen téglalap")
+        return tuple(value)
+
+    def blob(value):
+        if value is None:
+            return None
+        start, length = box(value, 2)
+        if not (isinstance(start, int) and isinstance(length, int) and 0 <= start and body_start + start + length <= len(data)):
+            raise ValueError("érvénytelen képadat")
+        return data[body_start + start:body_start + start + length]
+
+    for part in parts:
+        if not isinstance(part, dict) or not isinstance(part.get('photo_idx'), int):
+            raise ValueError("érvénytelen képhely")
+        part['box'] = box(part.get('box'), 4)
+        if 'placement' in part:
+            part['placement'] = box(part['placement'], 4)
+        if 'clip' in part:
+            part['clip'] = box(part['clip'], 4)
+        if 'image' in part:
+            image = part['image']
+            if not isinstance(image, dict) or image.get('filter') not in ('DCTDecode', 'FlateDecode'):
+                raise ValueError("érvénytelen kép")
+            image['size'] = box(image.get('size'), 2)
+            image['gray'] = bool(image.get('gray'))
+            image['data'] = blob(image.get('data'))
+            image['mask'] = blob(image.get('mask'))
+            if image['data'] is None:
+                raise ValueError("hiányzó képadat")
+    return parts
+
+
+# A lemezes tárba kerülő `page_task` eredmények adat alapú kódolása (becsomagolás, kicsomagolás);
+# a táblázatban nem szereplő feladatok eredménye nem kerül a tárba
+PAGE_TASK_CACHE_CODECS = {pdf_page_photos: (pack_pdf_page_parts, unpack_pdf_page_parts)}
+
+
+# --- PÁRHUZAMOS EXPORT ---
+def create_export_snapshot(pages, photo_properties, z_order, default_background, default_size):
+    """A projekt renderelési adatainak önálló, szerializálható (pickle) másolata az exportáláshoz.
+
+    A munkafolyamatok ezt kapják meg egyszer, induláskor; a szerkesztő közbeni
+    változásai így nem keveredhetnek bele egy futó exportálásba.
+    """
+    return copy.deepcopy({'pages': pages, 'photo_properties': photo_properties, 'z_order': z_order,
+                          'default_background': default_background, 'default_size': tuple(default_size)})
+
+
+def create_snapshot_renderer(snapshot, resources=None):
+    return PageRenderer(snapshot['pages'], snapshot['photo_properties'], snapshot['z_order'],
+                        snapshot['default_background'], snapshot['default_size'], resources=resources)
+
+
+def render_export_page(renderer, page_index, encode_format=None, page_task=None):
+    """Egy oldal nyomdai méretű képe; `encode_format` (pl. 'PNG') megadásakor már kódolt fájltartalomként.
+
+    `page_task` megadásakor az oldalkép helyett a `page_task(renderer, oldalindex)` eredménye
+    készül (pl. `pdf_page_photos`); ennek modulszintű függvénynek kell lennie, hogy a
+    munkafolyamatoknak név szerint átadható legyen.
+
+    Visszaadja az (oldalindex, eredmény, CPU-idő, hibás-e) négyest; az eredmény None, ha az oldal nem
+    készült el. Hibás az oldal, ha valamelyik eleme helyett hibajelzés került rá (lásd `PageRenderer.failed_pages`).
+    A szál CPU-idejét mérjük, mert a párhuzamos folyamatok falióra-ideje a versengés miatt torzítana.
+    """
+    started = time.thread_time()
+    renderer.failed_pages.discard(page_index)
+    if page_task is not None:
+        payload = page_task(renderer, page_index)
+    else:
+        payload = renderer.render_page(page_index)
+        if payload is not None and encode_format:
+            buffer = io.BytesIO()
+            payload.save(buffer, encode_format)
+            payload = buffer.getvalue()
+    return page_index, payload, time.thread_time() - started, page_index in renderer.failed_pages
+
+
+# A munkafolyamatok saját renderelője (a `_init_export_worker` hozza létre)
+_EXPORT_WORKER_STATE = {}
+
+
+def _init_export_worker(snapshot, cache_bytes):
+    # Folyamatonként külön tárak vannak, ezért a keretüket a munkafolyamatok számához igazítjuk
+    DECODED_IMAGE_CACHE.set_budget(cache_bytes)
+    _EXPORT_WORKER_STATE['renderer'] = create_snapshot_renderer(snapshot, RenderResourceCache(cache_bytes))
+
+
+def _render_export_page_in_worker(page_index, encode_format, page_task):
+    return render_export_page(_EXPORT_WORKER_STATE['renderer'], page_index, encode_format, page_task)
+
+
+class ParallelPageExporter:
+    """Az oldalak renderelése folyamatkészletben, a projekt pillanatképéből.
+
+    A Pillow renderelés nagy része Python-kód, ezért szálak helyett külön
+    folyamatok dolgoznak; mindegyik egyszer kapja meg a pillanatképet. Az
+    elkészült oldalakat az `on_page(index, eredmény)` visszahívás oldalsorrendben
+    kapja meg, amint a soron következő elkészült. Egyszerre legfeljebb
+    `IN_FLIGHT_PER_WORKER`-szer annyi oldal van úton, ahány munkafolyamat,
+    így a memóriahasználat a könyv hosszától független. Egy munkafolyamattal
+    minden a hívó folyamatban, sorosan fut.
+
+    `render_cache` (`PageRenderCache`) megadásakor a tárban már meglévő oldalak
+    renderelés nélkül, onnan kerülnek az `on_page`-hez, az újonnan elkészültek
+    pedig bekerülnek a tárba. Ez kódolt kimenetnél (`encode_format`) és azoknál a
+    `page_task`-oknál működik, amelyeknek van adat alapú kódolása
+    (`PAGE_TASK_CACHE_CODECS`). A hibával (vagy eredmény nélkül) elkészült oldalak
+    indexei a `failed_pages`-be kerülnek.
+
+    A `report()` a falióra szerinti időt a soros futás becsült idejével (az
+    oldalankénti renderelési CPU-idők összegével) veti össze.
+    """
+
+    IN_FLIGHT_PER_WORKER = 2
+    WORKER_CACHE_BYTES = 384 * 1024 * 1024
+
+    def __init__(self, snapshot, workers=None, encode_format=None, page_task=None, render_cache=None):
+        self.snapshot = snapshot
+        self.workers = max(1, workers or self.default_workers())
+        self.encode_format = encode_format
+        self.page_task = page_task
+        self._cache_codec = PAGE_TASK_CACHE_CODECS.get(page_task)
+        self.render_cache = render_cache if (encode_format or self._cache_codec) else None
+        self.page_seconds = []
+        self.reused_pages = 0
+        self.failed_pages = set()
+        self.wall_seconds = 0.0
+        self._local_renderer = None
+        self._page_keys = None
+
+    @staticmethod
+    def default_workers():
+        return max(1, min(8, os.cpu_count() or 1))
+
+    def page_keys(self):
+        """Az oldalak renderelési kulcsai a tárhoz (lásd `PageRenderer.render_key`), tár nélkül None-ok."""
+        if self._page_keys is None:
+            page_count = len(self.snapshot['pages'])
+            if self.render_cache is None:
+                self._page_keys = [None] * page_count
+            else:
+                renderer = create_snapshot_renderer(self.snapshot)
+                variant = self.page_task.__name__ if self.page_task is not None else self.encode_format
+                self._page_keys = [renderer.render_key(page_index, variant) for page_index in range(page_count)]
+        return self._page_keys
+
+    def run(self, on_page, skip_pages=()):
+        """Rendereli az összes oldalt, és sorrendben átadja őket az `on_page` függvénynek.
+
+        A `skip_pages` oldalai kimaradnak (pl. egy folytatott exportálásban már kiírt oldalak).
+        """
+        started = time.perf_counter()
+        page_count = len(self.snapshot['pages'])
+        self.page_seconds, self.reused_pages, self.failed_pages = [], 0, set()
+        keys = self.page_keys()
+        to_render = [page_index for page_index, key in enumerate(keys) if page_index not in skip_pages
+                     and (key is None or not self.render_cache.contains(key))]
+        render_set = set(to_render)
+        rendered = self._render_pages(to_render)
+        try:
+            for page_index in range(page_count):
+                if page_index in skip_pages:
+                    continue
+                if page_index in render_set:
+                    result = next(rendered)
+                else:
+                    payload = self._load_cached(keys[page_index])
+                    if payload is not None:
+                        self.reused_pages += 1
+                        on_page(page_index, payload)
+                        continue
+                    # A bejegyzés a kulcsok összegyűjtése óta eltűnt vagy sérült: helyben rendereljük
+                    result = render_export_page(self._renderer(), page_index, self.encode_format, self.page_task)
+                self._deliver(result, on_page, keys[page_index])
+        finally:
+            rendered.close()
+        if self.render_cache is not None:
+            self.render_cache.prune()
+        self.wall_seconds = time.perf_counter() - started
+
+    def _renderer(self):
+        if self._local_renderer is None:
+            self._local_renderer = create_snapshot_renderer(self.snapshot, RenderResourceCache())
+        return self._local_renderer
+
+    def _render_pages(self, page_indices):
+        """A `page_indices` oldalak renderelési eredményei ugyanebben a sorrendben."""
+        if self.workers == 1 or len(page_indices) <= 1:
+            for page_index in page_indices:
+                yield render_export_page(self._renderer(), page_index, self.encode_format, self.page_task)
+            return
+        # A 'spawn' indítás nem örökli a Tk és az előnézeti szálak állapotát
+        context = multiprocessing.get_context('spawn')
+        cache_bytes = max(64 * 1024 * 1024, self.WORKER_CACHE_BYTES // self.workers)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_export_worker,
+                                                    initargs=(self.snapshot, cache_bytes)) as pool:
+            futures = {}
+            next_to_submit = 0
+            try:
+                for position in range(len(page_indices)):
+                    while next_to_submit < len(page_indices) and len(futures) < self.workers * self.IN_FLIGHT_PER_WORKER:
+                        futures[next_to_submit] = pool.submit(_render_export_page_in_worker, page_indices[next_to_submit],
+                                                              self.encode_format, self.page_task)
+                        next_to_submit += 1
+                    yield futures.pop(position).result()
+            except BaseException:
+                # Hiba vagy a hívó leállása (a generátor bezárása) esetén a még el nem indult oldalakat elvetjük
+                for future in futures.values():
+                    future.cancel()
+                raise
+
+    def _deliver(self, result, on_page, key=None):
+        page_index, payload, seconds, failed = result
+        self.page_seconds.append(seconds)
+        if failed or payload is None:
+            self.failed_pages.add(page_index)
+        # A hibajelzéssel elkészült oldal nem kerül a tárba, a következő exportálás újra megpróbálja
+        if key is not None and payload is not None and not failed:
+            self.render_cache.put(key, self._cache_codec[0](payload) if self._cache_codec else payload)
+        on_page(page_index, payload)
+
+    def _load_cached(self, key):
+        data = self.render_cache.get(key)
+        if data is None or self._cache_codec is None:
+            return data
+        try:
+            return self._cache_codec[1](data)
+        except (ValueError, UnicodeDecodeError, struct.error) as e:
+            print(f"Sérült tárbejegyzés ({key[:12]}): {e}")
+            return None
+
+    def report(self):
+        serial_seconds = sum(self.page_seconds)
+        speedup = serial_seconds / self.wall_seconds if self.wall_seconds > 0 else 1.0
+        reused = f", {self.reused_pages} oldal a tárból" if self.render_cache is not None else ""
+        return (f"{len(self.page_seconds)} oldal, {self.workers} munkafolyamat: {self.wall_seconds:.2f} mp "
+                f"(soros becslés {serial_seconds:.2f} mp, gyorsulás {speedup:.1f}x){reused}")
+
+
+# --- EXPORTÁLT OLDALAK TÁRA ---
+class PageRenderCache:
+    """Lemezen tárolt, tartalom szerint címzett tár az exportált oldalakhoz.
+
+    A bejegyzéseket az oldal renderelési kulcsa (`PageRenderer.render_key`)
+    azonosítja, ami az oldal minden bemenetének ujjlenyomata; egy javított oldal
+    új kulcsot kap, így az újraexportálás csak a megváltozott oldalakat rendereli,
+    a többit innen másolja. A tár a projektfájl mellett van, a keret túllépésekor
+    a legrégebben használt bejegyzések törlődnek (`prune`).
+    """
+
+    MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes or self.MAX_BYTES
+
+    def _path(self, key):
+        folder = os.path.join(self.cache_dir, key[:2])
+        return folder, os.path.join(folder, f"{key}.page")
+
+    def contains(self, key):
+        return os.path.exists(self._path(key)[1])
+
+    def get(self, key):
+        """A bejegyzés tartalma, vagy None; a találat a használati idejét is frissíti."""
+        _, path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        folder, path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Írásvédett vagy betelt lemeznél az exportálás tár nélkül is elkészül
+            print(f"Oldal mentése a tárba sikertelen: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def prune(self):
+        """A legrégebben használt bejegyzések törlése, amíg a tár a keretbe nem fér."""
+        entries = []
+        for folder, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if not filename.endswith(".page"): continue
+                path = os.path.join(folder, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+# --- EXPORTÁLÁSI FELADAT ---
+class ExportCancelled(Exception):
+    """A felhasználó leállította az exportálást (lásd `ExportJob.cancel`)."""
+
+
+class ExportCheckpoint:
+    """Egy exportálás ellenőrzőpontja: JSON leírás (manifest) a kimeneti fájl mellett.
+
+    A képexport használja: rögzíti a kimenet fajtáját és minden hibátlanul kiírt
+    oldal renderelési kulcsát (`PageRenderer.render_key`). Megszakadt exportálás
+    után ugyanarra a helyre exportálva azok az oldalak számítanak késznek, amelyek
+    kulcsa azóta sem változott; ezeket ki sem rendereljük. Sikeres befejezéskor a
+    leírás törlődik. (A PDF-nek nincs ilyen leírása: a fájl csak egészben írható
+    meg, a kész oldalakat a lemezes tár, `PageRenderCache`, adja vissza.)
+    """
+
+    SUFFIX = ".lolaba-export.json"
+
+    def __init__(self, output_path, kind, page_keys):
+        self.path = output_path + self.SUFFIX
+        self.kind = kind
+        self.page_keys = list(page_keys)
+        self.completed = set()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('kind') == kind:
+                saved_keys = saved.get('completed', {})
+                self.completed = {index for index, key in enumerate(self.page_keys)
+                                  if key is not None and saved_keys.get(str(index)) == key}
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def mark(self, page_index):
+        """Rögzíti, hogy az oldal kiírása befejeződött."""
+        if self.page_keys[page_index] is None: return
+        self.completed.add(page_index)
+        data = {'kind': self.kind, 'page_count': len(self.page_keys),
+                'completed': {str(index): self.page_keys[index] for index in sorted(self.completed)}}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # Ellenőrzőpont nélkül az exportálás elkészül, csak megszakítás után nem folytatható
+            print(f"Ellenőrzőpont mentése sikertelen: {e}")
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ExportJob:
+    """Háttérszálon futó exportálás oldalankénti folyamatjelzéssel és együttműködő leállítással.
+
+    A `work(job)` függvény a háttérszálon fut. Az előkészítést (pl. a renderelési
+    kulcsok kiszámítását) a `job.report_status(szöveg)`-gel jelzi, majd az oldalak
+    előtt a `job.begin_pages(ellenőrzőpont, már_kész)`-et hívja, és minden
+    feldolgozott oldal után a `job.page_done(index)`-et: ez rögzíti az
+    ellenőrzőpontot, eseményt tesz a sorba, és itt ér véget a futás, ha közben
+    leállítást kértek (`ExportCancelled`). A felület a saját szálán, időzítővel
+    olvassa ki az eseményeket (`poll_events`), és csak ezekből dolgozik; a
+    háttérszál Tk-hívást nem végez. Események: ('status', szöveg), ('pages', már
+    kész, összes), ('page', index, kész, összes, hátralévő mp vagy None) és
+    ('finished', állapot), ahol az állapot 'done', 'cancelled' vagy 'failed'.
+    """
+
+    def __init__(self, total_pages, work):
+        self.total = total_pages
+        self.work = work
+        self.checkpoint = None
+        self.done = 0
+        self.resumed_pages = 0
+        self.state = 'pending'
+        self.result = None
+        self.error = None
+        self.error_details = None
+        self._events = queue.Queue()
+        self._cancel = threading.Event()
+        self._started_at = None
+        self._thread = None
+
+    def start(self):
+        self.state = 'running'
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="export", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Leállítást kér; a futás a folyamatban lévő oldal kiírása után áll meg."""
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise ExportCancelled()
+
+    def report_status(self, text):
+        self._events.put(('status', text))
+
+    def begin_pages(self, checkpoint=None, already_done=0):
+        """Az előkészítés vége: az `already_done` a korábbi, megszakadt futásban már elkészült (és most kihagyott) oldalak száma."""
+        self.checkpoint = checkpoint
+        self.done = self.resumed_pages = already_done
+        # A hátralévő idő becslésébe az előkészítés ideje nem számít bele
+        self._started_at = time.perf_counter()
+        self._events.put(('pages', already_done, self.total))
+        self.check_cancelled()
+
+    def page_done(self, page_index, completed=True):
+        """Egy oldal feldolgozva; a hibás oldal (`completed=False`) beszámít a haladásba, de az ellenőrzőpontba nem."""
+        if completed and self.checkpoint is not None:
+            self.checkpoint.mark(page_index)
+        self.done += 1
+        self._events.put(('page', page_index, self.done, self.total, self.eta_seconds()))
+        if self.done < self.total:
+            # Az utolsó oldal után már nincs mit megszakítani, a kimenet lezárása következik
+            self.check_cancelled()
+
+    def eta_seconds(self):
+        """A hátralévő idő becslése az ebben a futásban elkészült oldalak átlagos idejéből, vagy None."""
+        finished_here = self.done - self.resumed_pages
+        if not finished_here or self._started_at is None:
+            return None
+        return (time.perf_counter() - self._started_at) / finished_here * (self.total - self.done)
+
+    def poll_events(self):
+        """Az utolsó lekérdezés óta érkezett események, érkezési sorrendben (a felület szálán hívandó)."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _run(self):
+        try:
+            self.check_cancelled()
+            self.result = self.work(self)
+            if self.checkpoint is not None:
+                self.checkpoint.discard()
+            state = 'done'
+        except ExportCancelled:
+            state = 'cancelled'
+        except Exception as e:
+            self.error, self.error_details = e, traceback.format_exc()
+            state = 'failed'
+        self.state = state
+        self._events.put(('finished', state))
+
+
+# --- SZERKESZTŐ VÁLTOZÁSKÖVETÉS ---
+class EditorChangeTracker:
+    """Nyilvántartja, mi változott az aktuális oldalon a szerkesztő utolsó frissítése óta.
+
+    A módosító műveletek a `refresh_editor_view` hívása előtt megjelölik az
+    érintett elemeket (képhelyek, szövegek, rétegsorrend, háttér, oldalkeret), így a
+    frissítés csak ezeket rajzolja újra. Ha egy frissítés előtt semmit sem
+    jelöltek meg, az egész oldal újraépül; ez a biztonságos alapeset minden
+    olyan műveletnél, ami az oldal szerkezetét változtatja meg.
+    """
+
+    def __init__(self):
+        self.last_stats = None
+        self._clear()
+
+    def _clear(self):
+        self.photos = set()
+        self.texts = set()
+        self.z_order = False
+        self.background = False
+        self.page_frame = False
+        self.action = None
+
+    def mark_photos(self, *indices, action=None):
+        self.photos.update(indices)
+        self.action = self.action or action
+
+    def mark_texts(self, *indices, action=None):
+        self.texts.update(indices)
+        self.action = self.action or action
+
+    def mark_z_order(self, action=None):
+        self.z_order = True
+        self.action = self.action or action
+
+    def mark_background(self, action=None):
+        self.background = True
+        self.action = self.action or action
+
+    def mark_page_frame(self, action=None):
+        self.page_frame = True
+        self.action = self.action or action
+
+    def take(self):
+        """Visszaadja és törli a jelöléseket; None, ha semmi sem volt megjelölve (teljes frissítés)."""
+        if not (self.photos or self.texts or self.z_order or self.background or self.page_frame):
+            self._clear()
+            return None
+        changes = {'action': self.action, 'photos': self.photos, 'texts': self.texts, 'z_order': self.z_order,
+                   'background': self.background, 'page_frame': self.page_frame}
+        self._clear()
+        return changes
+
+    def record(self, action, elapsed, **counts):
+        """Eltárolja (és profilozáskor kiírja), hány elemet rajzolt újra egy frissítés."""
+        self.last_stats = dict(counts, action=action or 'teljes', elapsed_ms=round(elapsed * 1000, 1))
+        if PROFILE_RENDERING:
+            details = ", ".join(f"{name}: {value}" for name, value in counts.items())
+            print(f"Szerkesztő frissítés ({self.last_stats['action']}): {details}; {self.last_stats['elapsed_ms']} ms")
+
+
+# --- TÉRBELI INDEX ---
+class PageSpatialIndex:
+    """Egy oldal elemeinek (képhelyek, szövegek) térbeli indexe relatív (0–1) koordinátákban.
+
+    Két részből áll: egy egyenletes rácsból a pont- és téglalap-lekérdezésekhez
+    (ejtési cél, átfedések), valamint az élek és középvonalak rendezett
+    listáiból az illesztéshez (`snap`), ahol a legközelebbi vonalat bináris
+    kereséssel találjuk meg. Mozgatáskor és átméretezéskor csak a módosult elem
+    bejegyzései frissülnek (`insert` ugyanarra a kulcsra), így a sűrű, 50+
+    elemes kollázsoldalak is gyorsak maradnak.
+
+    A kulcsok pl. ('photo', 3) vagy ('text', 0). A `snap_only=True` elemek (pl.
+    maga az oldal) csak illesztési célként szerepelnek, lekérdezésben nem.
+    """
+
+    def __init__(self, cell_size=0.1):
+        self.cell_size = cell_size
+        self._boxes = {}
+        self._cells = {}
+        self._snap_only = set()
+        self._seqs = {}
+        self._next_seq = itertools.count()
+        self._x_lines = []
+        self._y_lines = []
+
+    def box(self, key):
+        return self._boxes.get(key)
+
+    def clear(self):
+        self._boxes.clear()
+        self._cells.clear()
+        self._snap_only.clear()
+        self._seqs.clear()
+        self._x_lines.clear()
+        self._y_lines.clear()
+
+    def _cells_of(self, box):
+        size = self.cell_size
+        for cell_x in range(math.floor(box[0] / size), math.floor(box[2] / size) + 1):
+            for cell_y in range(math.floor(box[1] / size), math.floor(box[3] / size) + 1):
+                yield cell_x, cell_y
+
+    @staticmethod
+    def _lines(box):
+        """A téglalap függőleges és vízszintes illesztővonalai: két él és a középvonal."""
+        x0, y0, x1, y1 = box
+        return (x0, (x0 + x1) / 2, x1), (y0, (y0 + y1) / 2, y1)
+
+    def insert(self, key, box, snap_only=False):
+        """Felveszi vagy (ha már szerepel) áthelyezi az elemet; a `box` (x0, y0, x1, y1)."""
+        self.remove(key)
+        box = tuple(float(value) for value in box)
+        seq = next(self._next_seq)
+        self._boxes[key] = box
+        self._seqs[key] = seq
+        if snap_only:
+            self._snap_only.add(key)
+        else:
+            for cell in self._cells_of(box):
+                self._cells.setdefault(cell, set()).add(key)
+        xs, ys = self._lines(box)
+        for value in xs:
+            bisect.insort(self._x_lines, (value, seq, key))
+        for value in ys:
+            bisect.insort(self._y_lines, (value, seq, key))
+
+    def remove(self, key):
+        box = self._boxes.pop(key, None)
+        if box is None: return
+        seq = self._seqs.pop(key)
+        if key in self._snap_only:
+            self._snap_only.discard(key)
+        else:
+            for cell in self._cells_of(box):
+                members = self._cells.get(cell)
+                if members is not None:
+                    members.discard(key)
+                    if not members:
+                        del self._cells[cell]
+        xs, ys = self._lines(box)
+        for lines, values in ((self._x_lines, xs), (self._y_lines, ys)):
+            for value in values:
+                position = bisect.bisect_left(lines, (value, seq))
+                if position < len(lines) and lines[position][1] == seq:
+                    del lines[position]
+
+    @staticmethod
+    def _intersection(a, b):
+        x0, y0, x1, y1 = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+        return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+    def query_point(self, x, y):
+        """Azok az elemek, amelyek téglalapja tartalmazza a pontot."""
+        size = self.cell_size
+        members = self._cells.get((math.floor(x / size), math.floor(y / size)), ())
+        return [key for key in members
+                if self._boxes[key][0] <= x <= self._boxes[key][2] and self._boxes[key][1] <= y <= self._boxes[key][3]]
+
+    def query_box(self, box):
+        """Azok az elemek, amelyek téglalapja átfed a megadottal."""
+        found = set()
+        for cell in self._cells_of(box):
+            found.update(self._cells.get(cell, ()))
+        return [key for key in found if self._intersection(self._boxes[key], box)]
+
+    def overlaps(self, key, box=None):
+        """A `key` elemmel (vagy annak `box` helyzetével) átfedő elemek és az átfedés téglalapja."""
+        box = box if box is not None else self._boxes[key]
+        return [(other, self._intersection(self._boxes[other], box)) for other in self.query_box(box) if other != key]
+
+    def snap(self, key, box, threshold_x, threshold_y):
+        """Illesztés a többi elem éleihez és középvonalaihoz.
+
+        Visszaadja a (dx, dy) eltolást és a két illesztővonal helyét (x, y); ahol
+        nincs `threshold` távolságon belüli vonal, az eltolás 0 és a vonal None.
+        """
+        xs, ys = self._lines(box)
+        dx, guide_x = self._nearest_line(self._x_lines, xs, key, threshold_x)
+        dy, guide_y = self._nearest_line(self._y_lines, ys, key, threshold_y)
+        return dx, dy, guide_x, guide_y
+
+    @staticmethod
+    def _nearest_line(lines, values, key, threshold):
+        best = None
+        for value in values:
+            position = bisect.bisect_left(lines, (value - threshold,))
+            while position < len(lines) and lines[position][0] <= value + threshold:
+                target, _, other = lines[position]
+                if other != key and (best is None or abs(target - value) < abs(best[0])):
+                    best = (target - value, target)
+                position += 1
+        return best if best is not None else (0.0, None)
+
+
+# --- CSÚSZKÁS ELŐNÉZET ---
+class CoalescedPreviewRenderer:
+    """Összevonja a csúszkák mozgatásából érkező újrarajzolási kéréseket.
+
+    Képhelyenként legfeljebb egy rajzolás várakozik: a kérés csak megjelöli a
+    képhelyet, a rajzolás a Tk üresjárati ciklusában fut, így a húzás közben
+    beérkező események sorozata egyetlen rajzolássá olvad össze. Húzás közben
+    gyors, piszkozat minőségű kép készül (NEAREST a proxyról); ha a csúszka
+    `settle_ms` ideig nem mozdul, a képhely teljes (LANCZOS) minőségben
+    újrarajzolódik.
+
+    A rajzolást a `render(index, draft)` visszahívás végzi. A kéréstől a kép
+    elkészültéig eltelt időt a `latencies` tárolja (ms); `PROFILE_RENDERING`
+    mellett minden piszkozat ideje kiírásra kerül.
+    """
+
+    SETTLE_MS = 180
+    FRAME_BUDGET_MS = 1000.0 / 60
+
+    def __init__(self, tk_root, render, settle_ms=None):
+        self.tk_root = tk_root
+        self.render = render
+        self.settle_ms = self.SETTLE_MS if settle_ms is None else settle_ms
+        self.pending = {}
+        self.drafted = set()
+        self.latencies = deque(maxlen=240)
+        self._idle_job = None
+        self._settle_job = None
+
+    def request(self, index):
+        """Megjelöli a képhelyet; a korábbi, még meg nem rajzolt kérés helyére lép."""
+        self.pending.setdefault(index, time.perf_counter())
+        if self._idle_job is None:
+            self._idle_job = self.tk_root.after_idle(self._flush_drafts)
+        if self._settle_job is not None:
+            self.tk_root.after_cancel(self._settle_job)
+        self._settle_job = self.tk_root.after(self.settle_ms, self._refine)
+
+    def _flush_drafts(self):
+        self._idle_job = None
+        pending, self.pending = self.pending, {}
+        for index, requested_at in pending.items():
+            self.render(index, True)
+            self.drafted.add(index)
+            latency = (time.perf_counter() - requested_at) * 1000
+            self.latencies.append(latency)
+            if PROFILE_RENDERING:
+                note = "" if latency <= self.FRAME_BUDGET_MS else " (egy képkockánál lassabb)"
+                print(f"[profil] csúszka -> kép: {latency:.1f} ms, {index}. kép, piszkozat{note}")
+
+    def _refine(self):
+        self._settle_job = None
+        if self.pending:
+            if self._idle_job is not None:
+                self.tk_root.after_cancel(self._idle_job)
+            self._flush_drafts()
+        drafted, self.drafted = self.drafted, set()
+        for index in sorted(drafted):
+            self.render(index, False)
+
+    def cancel(self):
+        """Eldobja a függő kéréseket, pl. amikor az egész oldal újraépül."""
+        for job in (self._idle_job, self._settle_job):
+            if job is not None:
+                self.tk_root.after_cancel(job)
+        self._idle_job = self._settle_job = None
+        self.pending.clear()
+        self.drafted.clear()
+
+    def stats(self):
+        """A mért késleltetések összefoglalója (ms), vagy None, ha még nem volt mérés."""
+        if not self.latencies: return None
+        ordered = sorted(self.latencies)
+        return {'count': len(ordered), 'median_ms': ordered[len(ordered) // 2], 'max_ms': ordered[-1],
+                'over_budget': sum(1 for value in ordered if value > self.FRAME_BUDGET_MS)}
+
+
+# --- ÁTMÉRETEZÉS ---
+class ResizeController:
+    """Az ablak átméretezésére érkező `<Configure>` események összevonása.
+
+    Élő átméretezés közben az események sűrűn jönnek: mindegyikre csak az olcsó
+    `interim(size)` fut (közelítő kép vagy elemeltolás), a drága, végleges
+    `settle(size)` pedig egyszer, amikor a méret `settle_ms` ideig nem változott.
+    Az első ismert méret azonnal véglegesül, így induláskor nem villan fel a
+    közelítő kép. A főmenü háttere és a szerkesztő vászna is ezt használja.
+    """
+
+    SETTLE_MS = 150
+
+    def __init__(self, tk_root, interim, settle, settle_ms=None):
+        self.tk_root = tk_root
+        self.interim = interim
+        self.settle = settle
+        self.settle_ms = self.SETTLE_MS if settle_ms is None else settle_ms
+        self.settled_size = None
+        self.pending_size = None
+        self.interim_count = 0
+        self.settle_count = 0
+        self._settle_job = None
+
+    def notify(self, size):
+        """Új méret érkezett (pl. `(event.width, event.height)`)."""
+        size = (int(size[0]), int(size[1]))
+        # Elkerüljük a hibát, ha az ablak 0 méretűre van kicsinyítve
+        if size[0] <= 1 or size[1] <= 1: return
+        if size == (self.pending_size or self.settled_size): return
+        if self.settled_size is None:
+            self.settled_size = size
+            self.settle_count += 1
+            self.settle(size)
+            return
+        self.pending_size = size
+        self.interim_count += 1
+        self.interim(size)
+        if self._settle_job is not None:
+            self.tk_root.after_cancel(self._settle_job)
+        self._settle_job = self.tk_root.after(self.settle_ms, self._settle)
+
+    def _settle(self):
+        self._settle_job = None
+        size, self.pending_size = self.pending_size, None
+        if size is None: return
+        self.settled_size = size
+        self.settle_count += 1
+        self.settle(size)
+
+    def reset(self):
+        """Elfelejti a méretet és a függő véglegesítést, pl. ha a figyelt widget újraépül."""
+        if self._settle_job is not None:
+            self.tk_root.after_cancel(self._settle_job)
+        self._settle_job = None
+        self.settled_size = self.pending_size = None
+
+
+# --- HÁTTÉRSZÁLAS ELŐNÉZET ---
+class PreviewRenderExecutor:
+    """Szálkészlet a szerkesztő előnézeti képeinek elkészítéséhez.
+
+    A feladatok kész PIL képet állítanak elő a háttérszálakon (a Pillow a
+    dekódolás és az átméretezés idejére elengedi a GIL-t, így a szálak valóban
+    párhuzamosan dolgoznak). Az eredményeket egy sor gyűjti, amit a Tk ciklus
+    `after`-rel kérdez le, így a visszahívások mindig a fő szálon futnak, ahol
+    `PhotoImage` készülhet és a vászon módosítható.
+
+    Minden feladatnak kulcsa van (pl. `('photo', 3)`). Ugyanarra a kulcsra
+    érkező újabb kérés elavulttá teszi az előzőt, a `cancel_all()` pedig
+    (oldalváltáskor) mindet; elavult eredményt nem adunk vissza, a még el sem
+    indult feladatokat pedig ki sem számoljuk.
+    """
+
+    POLL_MS = 15
+
+    def __init__(self, tk_root, max_workers=None):
+        self.tk_root = tk_root
+        self.max_workers = max_workers or max(2, min(4, os.cpu_count() or 2))
+        self._pool = None
+        self._results = queue.Queue()
+        self._latest = {}
+        self._tokens = itertools.count(1)
+        self._poll_job = None
+
+    def submit(self, key, job, on_done):
+        """A `job()` egy háttérszálon fut; az `on_done(image, error)` a fő szálon kapja az eredményt."""
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="lolaba-preview")
+        self.discard(key)
+        token = next(self._tokens)
+        # A tokent a beküldés előtt rögzítjük, különben egy gyorsan induló szál elavultnak látná a kérést
+        self._latest[key] = (token, None)
+        future = self._pool.submit(self._run, key, token, job, on_done)
+        if self._latest.get(key, (None, None))[0] == token:
+            self._latest[key] = (token, future)
+        if self._poll_job is None:
+            self._poll_job = self.tk_root.after(self.POLL_MS, self._poll)
+        return token
+
+    def _run(self, key, token, job, on_done):
+        # Ha a kérés időközben elavult, feleslegesen nem számolunk
+        if self._latest.get(key, (None, None))[0] != token:
+            return
+        try:
+            result, error = job(), None
+        except Exception as e:
+            print(f"HIBA az előnézet renderelésekor ({key}): {e}\n{traceback.format_exc()}")
+            result, error = None, e
+        self._results.put((key, token, result, error, on_done))
+
+    def _poll(self):
+        self._poll_job = None
+        while True:
+            try:
+                key, token, result, error, on_done = self._results.get_nowait()
+            except queue.Empty:
+                break
+            current = self._latest.get(key)
+            if current is None or current[0] != token:
+                continue
+            del self._latest[key]
+            on_done(result, error)
+        if self._latest:
+            self._poll_job = self.tk_root.after(self.POLL_MS, self._poll)
+
+    def is_pending(self, key):
+        return key in self._latest
+
+    def has_pending(self, kinds):
+        """Van-e még függő kérés a megadott fajtákból (a kulcs első eleme, pl. 'photo')."""
+        return any(key[0] in kinds for key in self._latest)
+
+    def discard(self, key):
+        """Elavulttá teszi a kulcs függő kérését (ha van)."""
+        previous = self._latest.pop(key, None)
+        if previous is not None and previous[1] is not None:
+            previous[1].cancel()
+
+    def cancel_all(self):
+        for _, future in self._latest.values():
+            if future is not None:
+                future.cancel()
+        self._latest.clear()
+
+    def shutdown(self):
+        self.cancel_all()
+        if self._poll_job is not None:
+            self.tk_root.after_cancel(self._poll_job)
+            self._poll_job = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
 
 class FotokonyvGUI:
     """A fotókönyv-szerkesztő alkalmazás fő grafikus felületét (GUI) kezelő osztály."""
@@ -25,6 +2669,23 @@ class FotokonyvGUI:
     }
     DEFAULT_BOOK_SIZE_NAME = "A4 Álló (21x29.7cm)"
     DEFAULT_BOOK_SIZE_PIXELS = BOOK_SIZES[DEFAULT_BOOK_SIZE_NAME]
+    # A kijelölt kép pásztázási köztes képének legnagyobb mérete (pixel); e felett a szokásos renderelés marad
+    PAN_BUFFER_MAX_PIXELS = 16 * 1024 * 1024
+    # Mozgatáskor ennyi pixelen belül illeszkedik az elem a többi elem éleihez és középvonalaihoz
+    SNAP_DISTANCE_PX = 6
+    # Az oldalsáv egy sorának és bélyegképének magassága (pixel)
+    PAGE_STRIP_ROW_HEIGHT = 130
+    PAGE_STRIP_THUMB_HEIGHT = 96
+    # A nagyított nézet csempéinek mérete (pixel) és a görgetésenkénti nagyítási lépés
+    VIEW_TILE_SIZE = 256
+    VIEW_ZOOM_STEP = 1.25
+    # Az oldalhoz kötött vászonelemek címkéi; az élő átméretezés ezeket tolja el (a "view_hud" a helyén marad)
+    PAGE_CANVAS_TAGS = ("background", "photo", "page_frame", "text", "selection", "snap_guide", "overlap_warning",
+                        "page_preview", "view_backdrop", "view_tile")
+    # Az exportálási folyamatjelző frissítési időköze (ms)
+    EXPORT_POLL_MS = 150
+    # A főmenü hátterének vázlatképe (az élő átméretezés közbeni megjelenítéshez) legfeljebb ekkora
+    MAIN_MENU_BG_DRAFT_SIZE = (640, 640)
 
 
     def __init__(self):
@@ -53,7 +2714,7 @@ class FotokonyvGUI:
         
         self.editor_ui_built = False
         self.main_editor_frame = None
-        self.left_panel_scroll = None
+        self.page_strip = None
         self.title_label = None
         self.original_bg_pil_image = None
         
@@ -61,8 +2722,32 @@ class FotokonyvGUI:
         self.canvas_bg_item = None
         self.canvas_page_frame_item = None
         self.bg_photo_image = None
+        self.bg_photo_key = None
         self.page_frame_photo_image = None
-        self.widget_to_canvas_item = {}
+        # Az árnyék- és háttérrétegek a szerkesztő méretében, hogy egy frissítés ne rajzolja újra őket
+        self.editor_layer_cache = ImageLRUCache(max_bytes=64 * 1024 * 1024)
+        # A szerkesztő előnézeti renderelőjének hátterei és keretei
+        self.preview_resources = RenderResourceCache(max_bytes=64 * 1024 * 1024)
+        # A csúszkák kéréseit összevonva, előbb gyors piszkozatként rajzolja újra
+        self.slider_preview = CoalescedPreviewRenderer(self.root, self._render_slider_preview)
+        # A teljes minőségű előnézetek háttérszálakon készülnek, a felület közben nem akad meg
+        self.preview_executor = PreviewRenderExecutor(self.root)
+        # Az oldalsáv bélyegképei egy külön, egyszálú készleten készülnek, hogy ne lassítsák a szerkesztőt
+        self.thumbnail_executor = PreviewRenderExecutor(self.root, max_workers=1)
+        self.thumbnail_cache = ImageLRUCache(max_bytes=32 * 1024 * 1024)
+        # Az exportálás munkafolyamatainak száma (az exportálási ablakban állítható; 1 = soros)
+        self.export_workers = ParallelPageExporter.default_workers()
+        # A futó exportálási feladat (`ExportJob`), vagy None
+        self.export_job = None
+        # Átméretezéskor azonnal egy olcsó köztes kép, a végleges renderelés csak a húzás végén
+        self.main_menu_resize = ResizeController(self.root, lambda size: self._show_main_menu_bg(size, False),
+                                                 lambda size: self._show_main_menu_bg(size, True))
+        self.canvas_resize = ResizeController(self.root, self._on_canvas_resize_interim, self._on_canvas_resize_settled)
+        # Kész, vászonméretű oldalképek (tartalomkulcs és rajzterület szerint); lapozáskor azonnal megjelennek
+        self.page_preview_cache = ImageLRUCache(max_bytes=96 * 1024 * 1024)
+        self.prefetch_job = None
+        # A nagyított nézet csempéi (tartalomkulcs, nagyított méret és csempehely szerint)
+        self.view_tile_cache = ImageLRUCache(max_bytes=64 * 1024 * 1024)
 
         self.frame_editor_window = None
         self.text_editor_window = None
@@ -81,16 +2766,33 @@ class FotokonyvGUI:
         self.pages = []
         self.current_page = 0
         self.z_order = {}
+        self.project_path = None
         self.uploaded_photos = []
         self.selected_photo_index = None
-        self.photo_frames = []
+        self.photo_items = []
+        self.photo_images = {}
         self.photo_properties = {}
-        self.text_widgets = []
+        self.text_items = []
         self.selected_text_index = None
         self.page_frame_editor_window = None
         self._drag_data = {}
         self.editor_ui_built = False
-        self.widget_to_canvas_item = {}
+        self.change_tracker = EditorChangeTracker()
+        self.slider_preview.cancel()
+        self.preview_executor.cancel_all()
+        self.pan_buffer = None
+        self.pan_buffer_key = None
+        self.spatial_index = PageSpatialIndex()
+        self.page_preview_image = None
+        self.view_zoom = 1.0
+        self.view_origin = (0, 0)
+        self.view_tiles = {}
+        self.view_backdrop_image = None
+        self.rendered_page_key = None
+        self.page_tiles = {}
+        self.page_tiles_parent = None
+        self.page_strip_focus = None
+        self.thumbnail_executor.cancel_all()
         
         if hasattr(self, 'selected_book_size_name'):
              self.selected_book_size_name.set(self.DEFAULT_BOOK_SIZE_NAME)
@@ -105,25 +2807,32 @@ class FotokonyvGUI:
   
 
     def _resize_main_menu_bg(self, event):
-        """Az ablak átméretezésekor frissíti a főmenü háttérképét, hogy arányosan kitöltse a teret."""
+        """Az ablak átméretezésekor frissíti a főmenü háttérképét, hogy arányosan kitöltse a teret.
+
+        Húzás közben csak a kicsinyített vázlatképet nagyítjuk (NEAREST); a végleges,
+        LANCZOS minőségű kép a `ResizeController` szerint egyszer, a húzás végén készül.
+        """
         # Ha a kép betöltése sikertelen volt, ne csináljon semmit
-        if not hasattr(self, 'original_bg_pil_image') or not self.original_bg_pil_image:
+        if not getattr(self, 'original_bg_pil_image', None):
             return
+        self.main_menu_resize.notify((event.width, event.height))
 
-        # Kérjük le a keret új méretét az eseményből
-        new_width = event.width
-        new_height = event.height
-    
-        # Elkerüljük a hibát, ha az ablak 0 méretűre van kicsinyítve
-        if new_width <= 0 or new_height <= 0:
+    def _show_main_menu_bg(self, size, final):
+        if not getattr(self, 'original_bg_pil_image', None) or not self.bg_label.winfo_exists():
             return
-
         try:
-            # Méretezzük át az eredeti PIL képet az új méretre
-            resized_pil_image = self.original_bg_pil_image.resize((new_width, new_height), Image.LANCZOS)
+            if final:
+                # A forrást előbb kettő-hatvány léptékben kicsinyítjük (olcsó), csak a maradékot LANCZOS-szal
+                source = self.original_bg_pil_image
+                scale = DecodedImageCache.pick_scale(source.size, size)
+                if scale > 1:
+                    source = source.reduce(scale)
+                resized_pil_image = source.resize(size, Image.LANCZOS)
+            else:
+                resized_pil_image = self.main_menu_bg_draft.resize(size, Image.NEAREST)
 
             # Hozzunk létre egy új CTkImage objektumot a frissített méretekkel
-            self.main_menu_bg_image = ctk.CTkImage(resized_pil_image, size=(new_width, new_height))
+            self.main_menu_bg_image = ctk.CTkImage(resized_pil_image, size=size)
         
             # Frissítsük a címkét az új képpel
             self.bg_label.configure(image=self.main_menu_bg_image)
@@ -158,11 +2867,10 @@ class FotokonyvGUI:
         self.selected_photo_index = photo_index
 
         if self.selected_photo_index is not None and self.selected_photo_index < len(self.pages[self.current_page]['photos']):
-            if self.selected_photo_index < len(self.photo_frames) and self.photo_frames[self.selected_photo_index]:
-                selected_frame = self.photo_frames[self.selected_photo_index]
-                selected_frame.configure(border_width=3, border_color=self.colors['selected_photo_border'])
-                if selected_frame in self.widget_to_canvas_item:
-                    self.canvas.tag_raise(self.widget_to_canvas_item[selected_frame])
+            if self.canvas.find_withtag(f"photo:{photo_index}"):
+                self.canvas.tag_raise(f"photo:{photo_index}")
+                self._raise_overlays()
+                self._draw_selection_outline()
                 
                 props_key = str((self.current_page, photo_index))
                 props = self.photo_properties.get(props_key, {})
@@ -195,20 +2903,35 @@ class FotokonyvGUI:
                 fit_mode = props.get('fit_mode', 'fill') 
                 self.fit_mode_button.set("Beleillesztés" if fit_mode == 'fit' else "Kitöltés")
 
+                # A pásztázáshoz előre elkészül a nagyított köztes kép
+                self._request_pan_buffer(photo_index)
+
                 if self.frame_editor_window and self.frame_editor_window.winfo_exists():
                     self.update_frame_editor_ui()
 
+    def _draw_selection_outline(self):
+        """A kijelölt képhely köré rajzolt keret; húzáskor a képpel együtt mozog."""
+        self.canvas.delete("selection")
+        if self.selected_photo_index is None: return
+        bbox = self.canvas.bbox(f"photo:{self.selected_photo_index}")
+        if bbox:
+            self.canvas.create_rectangle(*bbox, outline=self.colors['selected_photo_border'], width=3, tags="selection")
+
+    def _raise_overlays(self):
+        """Az oldalkeret, a szövegek és a kijelölés mindig a képek felett marad (az exporttal azonos sorrendben)."""
+        self.canvas.tag_raise("page_frame")
+        self.canvas.tag_raise("text")
+        self.canvas.tag_raise("selection")
+
     def _deselect_all(self):
-        if self.selected_photo_index is not None and self.selected_photo_index < len(self.photo_frames):
-            if self.photo_frames[self.selected_photo_index] and self.photo_frames[self.selected_photo_index].winfo_exists():
-                self.photo_frames[self.selected_photo_index].configure(border_width=0)
+        canvas_alive = self.canvas is not None and self.canvas.winfo_exists()
+        if canvas_alive:
+            self.canvas.delete("selection", "overlap_warning")
         self.selected_photo_index = None
         
-        if self.selected_text_index is not None and self.selected_text_index < len(self.text_widgets):
-            if self.text_widgets[self.selected_text_index].winfo_exists() and len(self.text_widgets[self.selected_text_index].winfo_children()) > 0:
-                text_label = self.text_widgets[self.selected_text_index].winfo_children()[0]
-                original_color = self.pages[self.current_page]['texts'][self.selected_text_index].get('font_color', '#000000')
-                text_label.configure(text_color=original_color)
+        if canvas_alive and self.selected_text_index is not None and self.selected_text_index < len(self.text_items):
+            original_color = self.pages[self.current_page]['texts'][self.selected_text_index].get('font_color', '#000000')
+            self.canvas.itemconfig(f"text:{self.selected_text_index}", fill=original_color)
         self.selected_text_index = None
 
         if hasattr(self, 'zoom_slider'):
@@ -227,11 +2950,9 @@ class FotokonyvGUI:
     def _select_text(self, text_index):
         self._deselect_all()
         self.selected_text_index = text_index
-        if self.selected_text_index is not None and self.selected_text_index < len(self.text_widgets):
-            text_widget_container = self.text_widgets[self.selected_text_index]
-            text_label = text_widget_container.winfo_children()[0]
-            text_label.configure(text_color=self.colors['selected_text_color'])
-            self.canvas.tag_raise(self.widget_to_canvas_item[text_widget_container])
+        if self.selected_text_index is not None and self.selected_text_index < len(self.text_items):
+            self.canvas.itemconfig(f"text:{text_index}", fill=self.colors['selected_text_color'])
+            self.canvas.tag_raise(f"text:{text_index}")
         if self.text_editor_window and self.text_editor_window.winfo_exists():
             self.update_text_editor_ui()
 
@@ -277,10 +2998,89 @@ class FotokonyvGUI:
             self.photo_properties[key]['frame_offset_y'] = int(self.frame_offset_y_slider.get())
             self.photo_properties[key]['frame_thickness'] = self.frame_thickness_slider.get()
         
-        if hasattr(self, 'photo_frames') and self.photo_frames and self.selected_photo_index < len(self.photo_frames):
-            frame = self.photo_frames[self.selected_photo_index]
-            photo_data = self.pages[self.current_page]['photos'][self.selected_photo_index]
-            self.display_photo_placeholder(frame, photo_data, self.selected_photo_index, is_update=True)
+        if self.selected_photo_index < len(self.photo_items):
+            self.slider_preview.request(self.selected_photo_index)
+
+    def _render_slider_preview(self, photo_index, draft):
+        """A `slider_preview` visszahívása: a még létező képhelyet rajzolja újra.
+
+        Ha a kijelölt kép nagyított köztes képe érvényes (csak a pásztázás vagy a
+        képkeret változott), a képhely kivágással, újramintavételezés nélkül frissül.
+        """
+        if self.canvas is None or not self.canvas.winfo_exists(): return
+        if photo_index < len(self.photo_items) and self.photo_items[photo_index]:
+            if self._show_from_pan_buffer(photo_index): return
+            self.display_photo_placeholder(photo_index, draft=draft)
+            if not draft and photo_index == self.selected_photo_index:
+                self._request_pan_buffer(photo_index)
+
+    def _pan_buffer_key(self, photo_index, page_size):
+        """A pásztázási köztes kép kulcsa: minden, ami a nagyított képet befolyásolja, a pásztázás kivételével."""
+        photo_data = self.pages[self.current_page]['photos'][photo_index]
+        photo_path = photo_data.get('path')
+        if not photo_path or not os.path.exists(photo_path): return None
+        props = self.photo_properties.get(str((self.current_page, photo_index)), {})
+        return (self.current_page, photo_index, tuple(page_size), DECODED_IMAGE_CACHE._key(photo_path, 1),
+                photo_data.get('layout_relwidth', photo_data['relwidth']), photo_data.get('layout_relheight', photo_data['relheight']),
+                props.get('fit_mode', 'fill'), props.get('zoom', 1.0), props.get('brightness', 1.0),
+                props.get('contrast', 1.0), props.get('saturation', 1.0), props.get('grayscale', False))
+
+    def _current_pan_buffer(self, photo_index):
+        """A kijelölt kép kész köztes képe, ha még a mostani beállításokhoz tartozik, különben None."""
+        if self.pan_buffer is None or photo_index != self.selected_photo_index: return None
+        _, _, draw_w, draw_h = self._get_page_draw_area()
+        if self.pan_buffer_key != self._pan_buffer_key(photo_index, (draw_w, draw_h)): return None
+        return self.pan_buffer
+
+    def _request_pan_buffer(self, photo_index):
+        """Háttérszálon elkészítteti a kép nagyított, korrigált köztes képét, ha még nincs meg.
+
+        Csak nagyításkor, illesztési mód-, méret- vagy korrekcióváltáskor készül új.
+        """
+        _, _, draw_w, draw_h = self._get_page_draw_area()
+        if draw_w <= 1 or draw_h <= 1: return
+        key = self._pan_buffer_key(photo_index, (draw_w, draw_h))
+        if key is None or key == self.pan_buffer_key: return
+        self.pan_buffer, self.pan_buffer_key = None, key
+
+        renderer = self._create_preview_snapshot_renderer(photo_index)
+        page_index = self.current_page
+        zoomed_size = renderer.photo_plan(page_index, photo_index, (draw_w, draw_h))['zoomed_size']
+        if zoomed_size is None or zoomed_size[0] * zoomed_size[1] > self.PAN_BUFFER_MAX_PIXELS: return
+
+        def store(zoomed, error):
+            if self.pan_buffer_key == key:
+                self.pan_buffer = zoomed
+        self.preview_executor.submit(('pan_buffer',), lambda: renderer.zoomed_photo(page_index, photo_index, (draw_w, draw_h)), store)
+
+    def _show_from_pan_buffer(self, photo_index):
+        zoomed = self._current_pan_buffer(photo_index)
+        if zoomed is None: return False
+        _, _, draw_w, draw_h = self._get_page_draw_area()
+        renderer = self._create_page_renderer(self.preview_resources, use_proxy=True)
+        final_image = renderer.photo_layer_from_zoomed(self.current_page, photo_index, (draw_w, draw_h), zoomed)
+        if final_image is None: return False
+        # A kivágás már végleges minőségű, a még futó teljes renderelés elavult
+        self.preview_executor.discard(('photo', photo_index))
+        self._place_photo_item(photo_index, final_image)
+        return True
+
+    def _pan_selected_photo(self, photo_index, dx, dy):
+        """Egérrel húzott pásztázás: a képet a kurzorral együtt mozgatja a kereten belül."""
+        _, _, draw_w, draw_h = self._get_page_draw_area()
+        plan = self._create_page_renderer(self.preview_resources, use_proxy=True).photo_plan(self.current_page, photo_index, (draw_w, draw_h))
+        if plan['zoomed_size'] is None: return
+        extra_w = plan['zoomed_size'][0] - plan['frame_size'][0]
+        extra_h = plan['zoomed_size'][1] - plan['frame_size'][1]
+        props = self.photo_properties.setdefault(str((self.current_page, photo_index)), {})
+        if extra_w > 0:
+            props['pan_x'] = min(1.0, max(0.0, props.get('pan_x', 0.5) - dx / extra_w))
+        if extra_h > 0:
+            props['pan_y'] = min(1.0, max(0.0, props.get('pan_y', 0.5) - dy / extra_h))
+        if hasattr(self, 'pan_x_slider'):
+            self.pan_x_slider.set(props.get('pan_x', 0.5))
+            self.pan_y_slider.set(props.get('pan_y', 0.5))
+        self.slider_preview.request(photo_index)
 
     
     
@@ -301,12 +3101,19 @@ class FotokonyvGUI:
             bg_image_path = os.path.join(self.assets_path, "backgrounds", "main_menu_bg.png")
             # 1. Töltsük be az eredeti, nagy felbontású képet és mentsük el
             self.original_bg_pil_image = Image.open(bg_image_path)
+            if self.original_bg_pil_image.mode == 'RGBA' and self.original_bg_pil_image.getchannel('A').getextrema()[0] == 255:
+                # Átlátszóság nélkül RGB-ben méretezünk: az RGBA átméretezés előbb az egész képet előszorozná
+                self.original_bg_pil_image = self.original_bg_pil_image.convert('RGB')
+            # Kicsinyített vázlatkép az élő átméretezés közbeni gyors megjelenítéshez
+            self.main_menu_bg_draft = self.original_bg_pil_image.copy()
+            self.main_menu_bg_draft.thumbnail(self.MAIN_MENU_BG_DRAFT_SIZE)
 
             # 2. Hozzuk létre a címkét, amiben a kép lesz, de még kép nélkül
             self.bg_label = ctk.CTkLabel(main_frame, text="")
             self.bg_label.place(relx=0, rely=0, relwidth=1, relheight=1)
 
             # 3. Kössük hozzá az átméretezést figyelő eseményt a kerethez
+            self.main_menu_resize.reset()
             main_frame.bind("<Configure>", self._resize_main_menu_bg)
 
         except Exception as e:
@@ -754,8 +3561,20 @@ class FotokonyvGUI:
         left_panel.pack(side="left", fill="y", padx=(0, 10))
         left_panel.pack_propagate(False)
         ctk.CTkLabel(left_panel, text="Oldalak", font=ctk.CTkFont(size=18, weight="bold"), text_color=self.colors['text_primary']).pack(pady=(20, 15))
-        self.left_panel_scroll = ctk.CTkScrollableFrame(left_panel, fg_color="transparent")
-        self.left_panel_scroll.pack(expand=True, fill="both", pady=10, padx=10)
+        # Virtualizált oldalsáv: csak a látható sorok kerülnek a vászonra, valódi oldalképekkel
+        strip_frame = ctk.CTkFrame(left_panel, fg_color="transparent")
+        strip_frame.pack(expand=True, fill="both", pady=10, padx=10)
+        strip_scrollbar = ctk.CTkScrollbar(strip_frame)
+        strip_scrollbar.pack(side="right", fill="y")
+        self.page_strip = Canvas(strip_frame, bg=self.colors['card_bg'], highlightthickness=0, yscrollincrement=30)
+        self.page_strip.pack(side="left", fill="both", expand=True)
+        strip_scrollbar.configure(command=self.page_strip.yview)
+        self.page_strip.configure(yscrollcommand=lambda first, last: (strip_scrollbar.set(first, last), self._draw_visible_tiles()))
+        self.page_strip.bind("<Configure>", lambda e: self._refresh_page_tiles())
+        self.page_strip.bind("<Button-1>", self._on_page_strip_click)
+        self.page_strip.bind("<MouseWheel>", lambda e: self.page_strip.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        self.page_strip.bind("<Button-4>", lambda e: self.page_strip.yview_scroll(-1, "units"))
+        self.page_strip.bind("<Button-5>", lambda e: self.page_strip.yview_scroll(1, "units"))
         ctk.CTkButton(left_panel, text="+ Új oldal", command=self.add_new_page_and_refresh, height=40, font=ctk.CTkFont(size=14, weight="bold"), corner_radius=15, fg_color=self.colors['accent'], hover_color='#8A9654').pack(pady=15, padx=10, fill="x")
         
         right_panel = ctk.CTkFrame(workspace, width=260, fg_color=self.colors['card_bg'], corner_radius=20)
@@ -765,6 +3584,17 @@ class FotokonyvGUI:
 
         self.canvas = Canvas(workspace, bg=self.colors['canvas_workspace_bg'], highlightthickness=0, relief='ridge')
         self.canvas.pack(side="left", fill="both", expand=True, padx=10)
+        # Egyetlen eseménykezelő a teljes vászonra; az elemeket a címkéik azonosítják
+        self.canvas.bind("<ButtonPress-1>", self._on_canvas_press)
+        self.canvas.bind("<B1-Motion>", self._on_widget_drag)
+        self.canvas.bind("<ButtonRelease-1>", self._on_widget_release)
+        self.canvas.bind("<Shift-ButtonPress-1>", self._on_canvas_pan_press)
+        self.canvas.bind("<MouseWheel>", self._on_canvas_wheel)
+        self.canvas_resize.reset()
+        self.canvas_size = None
+        self.canvas.bind("<Configure>", lambda e: self.canvas_resize.notify((e.width, e.height)))
+        self.canvas.bind("<Button-4>", lambda e: self._on_canvas_wheel(e, 1))
+        self.canvas.bind("<Button-5>", lambda e: self._on_canvas_wheel(e, -1))
 
     
     def _build_right_panel(self, right_panel):
@@ -804,6 +3634,7 @@ class FotokonyvGUI:
         ctk.CTkLabel(slider_frame, text="Függőleges pozíció", font=ctk.CTkFont(size=12), text_color="grey").pack()
         self.pan_y_slider = ctk.CTkSlider(slider_frame, from_=0.0, to=1.0, command=self._update_photo_properties)
         self.pan_y_slider.pack(fill="x", padx=5, pady=(0, 10))
+        ctk.CTkLabel(slider_frame, text="Shift + húzás: a kép mozgatása a keretben", font=ctk.CTkFont(size=11), text_color="grey").pack()
 
         ctk.CTkLabel(slider_frame, text="Keret mérete", font=ctk.CTkFont(size=12, weight="bold"), text_color="grey").pack()
         ctk.CTkLabel(slider_frame, text="Szélesség", font=ctk.CTkFont(size=12), text_color="grey").pack()
@@ -863,6 +3694,7 @@ class FotokonyvGUI:
         if self.selected_photo_index in order:
             order.remove(self.selected_photo_index)
         order.append(self.selected_photo_index) # A lista végére helyezzük, ami a legfelső réteg
+        self.change_tracker.mark_z_order(action='legelőre hozás')
         self.refresh_editor_view()
 
     def _send_photo_to_back(self):
@@ -879,6 +3711,7 @@ class FotokonyvGUI:
         if self.selected_photo_index in order:
             order.remove(self.selected_photo_index)
         order.insert(0, self.selected_photo_index) # A lista elejére helyezzük, ami a legalsó réteg
+        self.change_tracker.mark_z_order(action='leghátra küldés')
         self.refresh_editor_view()
 
 
@@ -886,39 +3719,485 @@ class FotokonyvGUI:
         if not self.editor_ui_built or not self.pages:
             return
 
+        started = time.perf_counter()
+        changes = self.change_tracker.take()
+        if self.view_zoom != 1.0:
+            # Minden frissítés (oldalváltás, szerkesztés) a teljes oldalas nézetbe tér vissza
+            self.view_zoom = 1.0
+            self.rendered_page_key = None
+
         current_page_data = self.pages[self.current_page]
         title_text = f"Fotókönyv szerkesztő - Oldal {self.current_page + 1} ({len(current_page_data.get('photos',[]))} képes)"
         self.title_label.configure(text=title_text)
 
-        for widget in self.left_panel_scroll.winfo_children():
-            widget.destroy()
-        
-        for i, page in enumerate(self.pages):
-            page_frame = ctk.CTkFrame(self.left_panel_scroll, height=90, fg_color=self.colors['accent'] if i == self.current_page else self.colors['bg_secondary'], corner_radius=15)
-            page_frame.pack(pady=5, fill="x"); page_frame.pack_propagate(False)
-            page_label = ctk.CTkLabel(page_frame, text=f"{i + 1}. oldal\n({len(page.get('photos',[]))} kép)", font=ctk.CTkFont(size=11), text_color="white")
-            page_label.pack(expand=True)
-            page_frame.bind("<Button-1>", lambda e, idx=i: self.select_page(idx)); page_label.bind("<Button-1>", lambda e, idx=i: self.select_page(idx))
+        tiles_updated = self._refresh_page_tiles()
         
         # A renderelés előtt a vászon frissítése biztosítja a helyes méreteket
         self.root.update_idletasks() 
-        self._render_page_content()
+
+        # Ha az oldal vagy a rajzterület megváltozott, vagy a művelet nem jelölte meg,
+        # mi változott, az egész oldalt újraépítjük; különben csak a megjelölt elemeket
+        render_key = (self.current_page, self._get_page_draw_area())
+        if changes is None or render_key != self.rendered_page_key:
+            self._render_page_content()
+            self.rendered_page_key = render_key
+            self._schedule_adjacent_prefetch()
+            counts = {'photos': sum(1 for item in self.photo_items if item), 'texts': len(self.text_items), 'background': 1, 'page_frame': 1}
+        else:
+            counts = self._apply_page_changes(changes)
         
         current_selection = self.selected_photo_index
+        current_text_selection = self.selected_text_index if changes is not None else None
         self._deselect_all()
         if current_selection is not None:
                  self._select_photo(current_selection)
+        elif current_text_selection is not None:
+            self._select_text(current_text_selection)
 
-    def _render_page_content(self):
+        self.change_tracker.record(changes and changes['action'], time.perf_counter() - started, tiles=tiles_updated, **counts)
+
+    def _refresh_page_tiles(self):
+        """Frissíti a virtualizált oldalsávot: görgetési tartomány, az aktuális oldal láthatósága, látható sorok.
+
+        Visszaadja a létrehozott vagy módosított sorok számát.
+        """
+        if self.page_tiles_parent is not self.page_strip:
+            self.page_strip_focus = None
+
+        row_h = self.PAGE_STRIP_ROW_HEIGHT
+        self.page_strip.configure(scrollregion=(0, 0, max(1, self.page_strip.winfo_width()), len(self.pages) * row_h))
+        if self.page_strip_focus != self.current_page:
+            # Oldalváltáskor az aktuális oldal sora a látható részbe kerül
+            self.page_strip_focus = self.current_page
+            if self.current_page not in self._visible_tile_rows() and self.pages:
+                self.page_strip.yview_moveto(self.current_page / len(self.pages))
+        return self._draw_visible_tiles()
+
+    def _visible_tile_rows(self):
+        row_h = self.PAGE_STRIP_ROW_HEIGHT
+        top = self.page_strip.canvasy(0)
+        first = max(0, int(top // row_h))
+        last = min(len(self.pages) - 1, int((top + self.page_strip.winfo_height()) // row_h))
+        return range(first, last + 1)
+
+    def _thumbnail_size(self, page_index, strip_width):
+        page_w, page_h = self.pages[page_index].get('size', self.DEFAULT_BOOK_SIZE_PIXELS)
+        scale = min((strip_width - 24) / page_w, self.PAGE_STRIP_THUMB_HEIGHT / page_h)
+        return max(1, int(page_w * scale)), max(1, int(page_h * scale))
+
+    def _draw_visible_tiles(self):
+        """Csak a látható sorokhoz tartoznak vászonelemek; a kigördült sorok elemei törlődnek.
+
+        A bélyegkép az oldal tartalomkulcsával tárolódik, így csak az oldal módosulása
+        után készül újra; addig, amíg a háttérszál el nem készíti, szürke hely látszik.
+        """
+        if self.page_strip is None or not self.page_strip.winfo_exists(): return 0
+        if self.page_tiles_parent is not self.page_strip:
+            # A szerkesztő újraépült, a korábbi sorok egy már nem létező vásznon voltak
+            self.page_tiles = {}
+            self.page_tiles_parent = self.page_strip
+        visible = self._visible_tile_rows()
+        for row in [row for row in self.page_tiles if row not in visible]:
+            self.page_strip.delete(f"tile:{row}")
+            self.thumbnail_executor.discard(('thumb', row))
+            del self.page_tiles[row]
+
+        row_h = self.PAGE_STRIP_ROW_HEIGHT
+        strip_w = self.page_strip.winfo_width()
+        if strip_w <= 24: strip_w = 180
+        renderer = self._create_page_renderer(self.preview_resources, use_proxy=True)
+        updated = 0
+        for row in visible:
+            thumb_size = self._thumbnail_size(row, strip_w)
+            thumb_key = (renderer.content_key(row), thumb_size)
+            thumbnail = self.thumbnail_cache.get(thumb_key)
+            state = (row == self.current_page, len(self.pages[row].get('photos', [])), thumb_key, thumbnail is not None, strip_w)
+            tile = self.page_tiles.get(row)
+            if tile is not None and tile['state'] == state: continue
+
+            self.page_strip.delete(f"tile:{row}")
+            tags = ("tile", f"tile:{row}")
+            top = row * row_h
+            self.page_strip.create_rectangle(2, top + 4, strip_w - 2, top + row_h - 4, outline="",
+                                             fill=self.colors['accent'] if state[0] else self.colors['bg_secondary'], tags=tags)
+            thumb_x, thumb_y = (strip_w - thumb_size[0]) // 2, top + 10
+            photo_image = None
+            if thumbnail is not None:
+                photo_image = ImageTk.PhotoImage(thumbnail)
+                self.page_strip.create_image(thumb_x, thumb_y, image=photo_image, anchor="nw", tags=tags)
+            else:
+                self.page_strip.create_rectangle(thumb_x, thumb_y, thumb_x + thumb_size[0], thumb_y + thumb_size[1],
+                                                 fill="#CCCCCC", outline="", tags=tags)
+                self._request_thumbnail(row, thumb_key)
+            self.page_strip.create_text(strip_w // 2, top + row_h - 14, text=f"{row + 1}. oldal ({state[1]} kép)",
+                                        font=("Arial", -11), fill="white", tags=tags)
+            self.page_tiles[row] = {'state': state, 'photo': photo_image}
+            updated += 1
+        return updated
+
+    def _request_thumbnail(self, page_index, thumb_key):
+        renderer = self._create_preview_snapshot_renderer(page_index=page_index)
+
+        def render_thumbnail():
+            thumbnail = renderer.render_page(page_index, size=thumb_key[1])
+            self.thumbnail_cache.put(thumb_key, thumbnail)
+            return thumbnail
+
+        def show_thumbnail(image, error):
+            # Hibánál a szürke hely marad; újra csak az oldal módosulása után próbálkozunk
+            if error is None:
+                self._draw_visible_tiles()
+
+        self.thumbnail_executor.submit(('thumb', page_index), render_thumbnail, show_thumbnail)
+
+    def _on_page_strip_click(self, event):
+        self.select_page(int(self.page_strip.canvasy(event.y) // self.PAGE_STRIP_ROW_HEIGHT))
+
+    def _apply_page_changes(self, changes):
+        """Csak a megjelölt elemeket rajzolja újra a vásznon; visszaadja az újrarajzolt elemek számát."""
+        photos_data = self.pages[self.current_page].get('photos', [])
+        if changes['background']:
+            self._render_background()
+            self.canvas.tag_lower("background")
+
+        photos_updated = 0
+        for index in sorted(changes['photos']):
+            if index < len(self.photo_items) and index < len(photos_data) and self.photo_items[index]:
+                self.display_photo_placeholder(index)
+                photos_updated += 1
+
+        texts_data = self.pages[self.current_page].get('texts', [])
+        offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
+        texts_updated = 0
+        for index in sorted(changes['texts']):
+            if index < len(self.text_items) and index < len(texts_data):
+                self.canvas.coords(f"text:{index}", offset_x + int(texts_data[index]['relx'] * draw_w),
+                                   offset_y + int(texts_data[index]['rely'] * draw_h))
+                texts_updated += 1
+
+        if changes['z_order']:
+            self._restack_canvas_items()
+        if changes['page_frame']:
+            self._render_page_frame()
+            self._raise_overlays()
+        return {'photos': photos_updated, 'texts': texts_updated, 'background': int(changes['background']), 'page_frame': int(changes['page_frame'])}
+
+    def _restack_canvas_items(self):
+        """A képhelyeket a rétegsorrend szerint rendezi, felettük az oldalkerettel és a szövegekkel."""
+        for index in self.z_order.get(str(self.current_page), []):
+            self.canvas.tag_raise(f"photo:{index}")
+        self._raise_overlays()
+
+    def _on_canvas_resize_interim(self, size):
+        """Élő átméretezés közben az oldal csak eltolódik, hogy középen maradjon; újrarajzolás nincs."""
+        if self.canvas_size is not None:
+            for tag in self.PAGE_CANVAS_TAGS:
+                self.canvas.move(tag, (size[0] - self.canvas_size[0]) / 2, (size[1] - self.canvas_size[1]) / 2)
+            if self.view_zoom != 1.0:
+                self.view_origin = (self.view_origin[0] + (size[0] - self.canvas_size[0]) / 2,
+                                    self.view_origin[1] + (size[1] - self.canvas_size[1]) / 2)
+        self.canvas_size = size
+
+    def _on_canvas_resize_settled(self, size):
+        """Az átméretezés végén az oldal az új rajzterülethez igazodva újraépül (nagyított nézetben a csempék)."""
+        self.canvas_size = size
+        if not self.editor_ui_built or not self.pages or self.canvas is None or not self.canvas.winfo_exists(): return
+        if self.view_zoom != 1.0:
+            self._draw_view_tiles()
+        elif self.rendered_page_key != (self.current_page, self._get_page_draw_area()):
+            self.refresh_editor_view()
+
+    def _clear_page_canvas(self):
+        """Leállítja a függő előnézeteket, és mindent töröl a vászonról."""
+        self.slider_preview.cancel()
+        self.preview_executor.cancel_all()
+        self.pan_buffer = None
+        self.pan_buffer_key = None
         self.canvas.delete("all")
-        self.widget_to_canvas_item.clear()
-        self.photo_frames.clear()
-        self.text_widgets.clear()
+        self.photo_items = []
+        self.photo_images.clear()
+        self.text_items = []
+        self.page_preview_image = None
+        self.view_tiles = {}
+        self.view_backdrop_image = None
+
+    def _render_page_content(self):
+        self._clear_page_canvas()
         
+        # Ugyanaz a rétegsorrend, mint az exportnál: háttér, képek, oldalkeret, szövegek
         self._render_background()
         self.create_photo_layout()
-        self._render_text_boxes()
         self._render_page_frame()
+        self._render_text_boxes()
+        self._rebuild_spatial_index()
+        self._show_cached_page_preview()
+
+    def _page_preview_key(self, page_index, draw_size):
+        return (self._create_page_renderer().content_key(page_index), int(draw_size[0]), int(draw_size[1]))
+
+    def _show_cached_page_preview(self):
+        """Ha az oldal kész képe már a tárban van (pl. előtöltésből), azonnal a vászon tetejére kerül.
+
+        Alatta a szokásos módon készülnek a szerkeszthető elemek; amint minden réteg
+        elkészült, vagy a felhasználó a vászonra kattint, az oldalkép eltűnik.
+        """
+        offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
+        if draw_w <= 1 or draw_h <= 1: return
+        preview = self.page_preview_cache.get(self._page_preview_key(self.current_page, (draw_w, draw_h)))
+        if preview is None or not self.preview_executor.has_pending(('photo', 'background')): return
+        self.page_preview_image = ImageTk.PhotoImage(preview)
+        self.canvas.create_image(offset_x, offset_y, image=self.page_preview_image, anchor="nw", tags="page_preview")
+
+    def _release_page_preview(self, force=False):
+        """Eltávolítja az azonnali oldalképet, ha már nincs függő réteg (vagy `force` esetén)."""
+        if self.page_preview_image is None: return
+        if force or not self.preview_executor.has_pending(('photo', 'background')):
+            self.canvas.delete("page_preview")
+            self.page_preview_image = None
+
+    def _schedule_adjacent_prefetch(self):
+        if self.prefetch_job is not None:
+            self.root.after_cancel(self.prefetch_job)
+        self.prefetch_job = self.root.after_idle(self._prefetch_adjacent_pages)
+
+    def _prefetch_adjacent_pages(self):
+        """Üresjáratban elkészíti az előző és a következő oldal vászonméretű képét.
+
+        A kérések az aktuális oldal rétegei mögé sorolódnak, oldalváltáskor pedig a
+        többi függő kéréssel együtt elavulnak. A renderelés a forrásképek dekódolt
+        példányait is a tárba tölti, így az oldal elemei is gyorsabban készülnek el.
+        """
+        self.prefetch_job = None
+        if not self.editor_ui_built or self.canvas is None or not self.canvas.winfo_exists(): return
+        _, _, draw_w, draw_h = self._get_page_draw_area()
+        if draw_w <= 1 or draw_h <= 1: return
+        for page_index in (self.current_page + 1, self.current_page - 1):
+            if not 0 <= page_index < len(self.pages): continue
+            key = self._page_preview_key(page_index, (draw_w, draw_h))
+            if self.page_preview_cache.get(key) is not None: continue
+            renderer = self._create_preview_snapshot_renderer(page_index=page_index)
+
+            def render_preview(renderer=renderer, page_index=page_index, key=key):
+                return self.page_preview_cache.put(key, renderer.render_page(page_index, size=key[1:]))
+
+            self.preview_executor.submit(('prefetch', page_index), render_preview, lambda image, error: None)
+
+    def _view_max_zoom(self):
+        """A legnagyobb nézetnagyítás: az oldal nyomdai (300 DPI-s) pixelei 1:1 arányban a vásznon."""
+        _, _, draw_w, _ = self._get_page_draw_area()
+        page_pixel_w = self.pages[self.current_page].get('size', self.DEFAULT_BOOK_SIZE_PIXELS)[0]
+        return max(1.0, page_pixel_w / draw_w) if draw_w > 1 else 1.0
+
+    def _on_canvas_wheel(self, event, direction=None):
+        """Egérgörgő a vásznon: a nézet nagyítása vagy kicsinyítése a kurzor alatti pont körül.
+
+        Nagyított nézetben az oldal csak megtekinthető (húzással mozgatható); a teljes
+        oldalas nézetbe visszakicsinyítve a szerkesztés a szokásos módon folytatódik.
+        """
+        if not self.pages or self.canvas is None: return
+        if direction is None:
+            direction = 1 if event.delta > 0 else -1
+        new_zoom = min(self._view_max_zoom(), self.view_zoom * self.VIEW_ZOOM_STEP ** direction)
+        if new_zoom < 1.0 + 1e-6:
+            new_zoom = 1.0
+        if new_zoom == self.view_zoom: return
+        if new_zoom == 1.0:
+            # A frissítés a nagyított nézetet is megszünteti
+            self.refresh_editor_view()
+            return
+        if self.view_zoom == 1.0:
+            self._deselect_all()
+            self._clear_page_canvas()
+            self.rendered_page_key = None
+            offset_x, offset_y, _, _ = self._get_page_draw_area()
+            self.view_origin = (offset_x, offset_y)
+        # A kurzor alatti oldalpont a helyén marad
+        ratio = new_zoom / self.view_zoom
+        self.view_origin = (event.x - (event.x - self.view_origin[0]) * ratio, event.y - (event.y - self.view_origin[1]) * ratio)
+        self.view_zoom = new_zoom
+        self._draw_view_tiles()
+
+    def _pan_view(self, dx, dy):
+        self.view_origin = (self.view_origin[0] + dx, self.view_origin[1] + dy)
+        self._draw_view_tiles()
+
+    def _clamped_view_origin(self, zoomed_w, zoomed_h):
+        """A nagyított oldal bal felső sarka úgy, hogy a vászonnál kisebb irányban középen legyen, különben kitöltse."""
+        canvas_w, canvas_h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        origin = []
+        for value, zoomed, visible in ((self.view_origin[0], zoomed_w, canvas_w), (self.view_origin[1], zoomed_h, canvas_h)):
+            if zoomed <= visible:
+                origin.append((visible - zoomed) / 2)
+            else:
+                origin.append(min(0, max(visible - zoomed, value)))
+        return tuple(origin)
+
+    def _draw_view_tiles(self):
+        """A nagyított nézet: csak a vászonra eső csempék kerülnek a vászonra.
+
+        A csempék a renderelő régiós útvonalán készülnek (a képeknek csak a csempébe
+        eső része, a nagyításhoz elegendő dekódolási szintről), háttérszálon, és a
+        tartalomkulcs, a nagyított méret és a csempe helye szerint tárolódnak, így
+        mozgatáskor és visszanagyításkor újrahasznosulnak. Amíg egy csempe készül,
+        alatta az oldal kis felbontású képe látszik felnagyítva.
+        """
+        _, _, draw_w, draw_h = self._get_page_draw_area()
+        if draw_w <= 1 or draw_h <= 1: return
+        zoomed_w, zoomed_h = int(round(draw_w * self.view_zoom)), int(round(draw_h * self.view_zoom))
+        self.view_origin = self._clamped_view_origin(zoomed_w, zoomed_h)
+        origin_x, origin_y = int(round(self.view_origin[0])), int(round(self.view_origin[1]))
+        canvas_w, canvas_h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        tile = self.VIEW_TILE_SIZE
+        page_index = self.current_page
+        content_key = self._create_page_renderer().content_key(page_index)
+
+        first_col, last_col = max(0, -origin_x // tile), min((zoomed_w - 1) // tile, (canvas_w - origin_x - 1) // tile)
+        first_row, last_row = max(0, -origin_y // tile), min((zoomed_h - 1) // tile, (canvas_h - origin_y - 1) // tile)
+        visible = {(col, row) for col in range(first_col, last_col + 1) for row in range(first_row, last_row + 1)}
+        for cell in list(self.view_tiles):
+            if cell not in visible or self.view_tiles[cell][0][:3] != (content_key, zoomed_w, zoomed_h):
+                _, item_id, _ = self.view_tiles.pop(cell)
+                if item_id is not None:
+                    self.canvas.delete(item_id)
+                self.preview_executor.discard(('tile',) + cell)
+
+        renderer = None
+        for col, row in sorted(visible, key=lambda cell: (cell[1], cell[0])):
+            key = (content_key, zoomed_w, zoomed_h, col, row)
+            x, y = origin_x + col * tile, origin_y + row * tile
+            entry = self.view_tiles.get((col, row))
+            if entry is not None:
+                if entry[1] is not None:
+                    self.canvas.coords(entry[1], x, y)
+                continue
+            cached = self.view_tile_cache.get(key)
+            if cached is not None:
+                self._place_view_tile((col, row), key, cached, x, y)
+                continue
+            if renderer is None:
+                renderer = self._create_preview_snapshot_renderer()
+            region = (col * tile, row * tile, min(zoomed_w, (col + 1) * tile), min(zoomed_h, (row + 1) * tile))
+            self.view_tiles[(col, row)] = (key, None, None)
+
+            def render_tile(renderer=renderer, region=region, key=key):
+                return self.view_tile_cache.put(key, renderer.render_page(page_index, size=key[1:3], region=region))
+
+            def show_tile(image, error, cell=(col, row), key=key):
+                if error is not None or self.view_tiles.get(cell, (None,))[0] != key: return
+                x, y = (int(round(v)) + c * self.VIEW_TILE_SIZE for v, c in zip(self.view_origin, cell))
+                self._place_view_tile(cell, key, image, x, y)
+                if all(entry[1] is not None for entry in self.view_tiles.values()):
+                    self.canvas.delete("view_backdrop")
+                    self.view_backdrop_image = None
+
+            self.preview_executor.submit(('tile', col, row), render_tile, show_tile)
+
+        pending = any(entry[1] is None for entry in self.view_tiles.values())
+        self._draw_view_backdrop((content_key, int(draw_w), int(draw_h)), (origin_x, origin_y, zoomed_w, zoomed_h), pending)
+        self.canvas.delete("view_hud")
+        page_pixel_w = self.pages[page_index].get('size', self.DEFAULT_BOOK_SIZE_PIXELS)[0]
+        self.canvas.create_text(10, 10, anchor="nw", tags="view_hud", fill=self.colors['text_primary'],
+                                text=f"{zoomed_w / page_pixel_w * 100:.0f}% (görgő: nagyítás, húzás: mozgatás)")
+
+    def _place_view_tile(self, cell, key, image, x, y):
+        photo_image = ImageTk.PhotoImage(image)
+        item_id = self.canvas.create_image(x, y, image=photo_image, anchor="nw", tags="view_tile")
+        self.view_tiles[cell] = (key, item_id, photo_image)
+        self.canvas.tag_raise("view_hud")
+
+    def _draw_view_backdrop(self, preview_key, view_box, pending):
+        """A még hiányzó csempék helyén az oldal vászonméretű képének felnagyított részlete látszik.
+
+        Mozgatás közben minden lépésnél újrakészül, ezért a legolcsóbb (NEAREST) nagyítással.
+        """
+        self.canvas.delete("view_backdrop")
+        self.view_backdrop_image = None
+        if not pending: return
+        preview = self.page_preview_cache.get(preview_key)
+        if preview is None:
+            if not self.preview_executor.is_pending(('view_backdrop',)):
+                renderer = self._create_preview_snapshot_renderer()
+                page_index = self.current_page
+
+                def render_preview():
+                    return self.page_preview_cache.put(preview_key, renderer.render_page(page_index, size=preview_key[1:]))
+
+                def show_preview(image, error):
+                    if error is None and self.view_zoom != 1.0 and page_index == self.current_page:
+                        self._draw_view_tiles()
+
+                self.preview_executor.submit(('view_backdrop',), render_preview, show_preview)
+            return
+        origin_x, origin_y, zoomed_w, zoomed_h = view_box
+        left, top = max(0, origin_x), max(0, origin_y)
+        right = min(self.canvas.winfo_width(), origin_x + zoomed_w)
+        bottom = min(self.canvas.winfo_height(), origin_y + zoomed_h)
+        if right <= left or bottom <= top: return
+        scale_x, scale_y = preview.width / zoomed_w, preview.height / zoomed_h
+        box = ((left - origin_x) * scale_x, (top - origin_y) * scale_y, (right - origin_x) * scale_x, (bottom - origin_y) * scale_y)
+        self.view_backdrop_image = ImageTk.PhotoImage(preview.resize((right - left, bottom - top), Image.NEAREST, box=box))
+        self.canvas.create_image(left, top, image=self.view_backdrop_image, anchor="nw", tags="view_backdrop")
+        self.canvas.tag_lower("view_backdrop")
+
+    def _rebuild_spatial_index(self):
+        """Az aktuális oldal képhelyei és szövegei (és illesztési célként maga az oldal) a térbeli indexben."""
+        self.spatial_index.clear()
+        self.spatial_index.insert(('page', 0), (0.0, 0.0, 1.0, 1.0), snap_only=True)
+        for index in range(len(self.pages[self.current_page].get('photos', []))):
+            self._update_spatial_index('photo', index)
+        for index in range(len(self.text_items)):
+            self._update_spatial_index('text', index)
+
+    def _element_box(self, item_type, index):
+        """Az elem téglalapja relatív koordinátákban; szövegnél a vászonon mért befoglaló téglalapból."""
+        if item_type == 'photo':
+            photo_data = self.pages[self.current_page]['photos'][index]
+            return (photo_data['relx'], photo_data['rely'],
+                    photo_data['relx'] + photo_data['relwidth'], photo_data['rely'] + photo_data['relheight'])
+        offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
+        bbox = self.canvas.bbox(f"text:{index}")
+        if not bbox or draw_w <= 1 or draw_h <= 1: return None
+        return ((bbox[0] - offset_x) / draw_w, (bbox[1] - offset_y) / draw_h,
+                (bbox[2] - offset_x) / draw_w, (bbox[3] - offset_y) / draw_h)
+
+    def _update_spatial_index(self, item_type, index):
+        box = self._element_box(item_type, index)
+        if box is None:
+            self.spatial_index.remove((item_type, index))
+        else:
+            self.spatial_index.insert((item_type, index), box)
+
+    def _show_overlap_warnings(self, item_type, index, box=None):
+        """Narancs szaggatott téglalap minden átfedésen, amit az elem (`box` helyzetben) más elemekkel alkot."""
+        box = box if box is not None else self.spatial_index.box((item_type, index))
+        self.canvas.delete("overlap_warning")
+        if box is None: return
+        offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
+        for _, overlap in self.spatial_index.overlaps((item_type, index), box):
+            self.canvas.create_rectangle(offset_x + overlap[0] * draw_w, offset_y + overlap[1] * draw_h,
+                                         offset_x + overlap[2] * draw_w, offset_y + overlap[3] * draw_h,
+                                         outline="#FF9800", width=2, dash=(3, 3), tags="overlap_warning")
+
+    def _show_drag_guides(self, item_type, index, box):
+        """Illesztővonalak és átfedés-jelzések a húzott (vagy átméretezett) elemhez.
+
+        Visszaadja az illesztés utáni téglalapot. A jelzések a "snap_guide" és az
+        "overlap_warning" címkét kapják, elengedéskor törlődnek.
+        """
+        offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
+        self.canvas.delete("snap_guide")
+        if draw_w <= 1 or draw_h <= 1: return box
+        dx, dy, guide_x, guide_y = self.spatial_index.snap((item_type, index), box,
+                                                           self.SNAP_DISTANCE_PX / draw_w, self.SNAP_DISTANCE_PX / draw_h)
+        box = (box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy)
+        if guide_x is not None:
+            line_x = offset_x + guide_x * draw_w
+            self.canvas.create_line(line_x, offset_y, line_x, offset_y + draw_h, fill=self.colors['accent'], dash=(4, 2), tags="snap_guide")
+        if guide_y is not None:
+            line_y = offset_y + guide_y * draw_h
+            self.canvas.create_line(offset_x, line_y, offset_x + draw_w, line_y, fill=self.colors['accent'], dash=(4, 2), tags="snap_guide")
+        self._show_overlap_warnings(item_type, index, box)
+        return box
 
     # --- CANVAS-ALAPÚ RENDERELŐ FÜGGVÉNYEK ---
 
@@ -962,54 +4241,83 @@ class FotokonyvGUI:
         if self.canvas_bg_item:
             self.canvas.delete(self.canvas_bg_item)
             self.canvas_bg_item = None
-            self.bg_photo_image = None
 
-        try:
-            # --- ÁRNYÉK ÉS HÁTTÉR LÉTREHOZÁSA KÉPKÉNT ---
-            shadow_blur = 15  # Az elmosás mértéke
-            shadow_color = '#282828' # Sötétszürke árnyék
-
-            # 1. Létrehozunk egy nagyobb, átlátszó vásznat az árnyéknak
-            shadow_canvas = Image.new('RGBA', (draw_w + shadow_blur*2, draw_h + shadow_blur*2), (0, 0, 0, 0))
-            shadow_draw = ImageDraw.Draw(shadow_canvas)
-
-            # 2. Rajzolunk egy fekete téglalapot a közepére (ez lesz az elmosott árnyék)
-            shadow_draw.rectangle(
-                (shadow_blur, shadow_blur, draw_w + shadow_blur, draw_h + shadow_blur),
-                fill=shadow_color
-            )
+        # --- ÁRNYÉK ÉS HÁTTÉR LÉTREHOZÁSA KÉPKÉNT ---
+        shadow_blur = 15  # Az elmosás mértéke
 
-            # 3. Alkalmazzuk az elmosás effektet
-            shadow_canvas = shadow_canvas.filter(ImageFilter.GaussianBlur(radius=shadow_blur / 2))
+        # Ha sem az oldal mérete, sem a háttér nem változott, a kész képet használjuk újra
+        bg_key = self._background_layer_key(bg_setting)
+        layer_key = (draw_w, draw_h, bg_key)
+        if self.bg_photo_image is not None and self.bg_photo_key == layer_key:
+            self.preview_executor.discard(('background',))
+            self._place_background_item(self.bg_photo_image, offset_x - shadow_blur, offset_y - shadow_blur)
+            return
 
-            # 4. Létrehozzuk a tényleges oldal hátterét
-            if isinstance(bg_setting, dict) and bg_setting.get('type') == 'image':
-                img_path = bg_setting.get('path')
-                if img_path and os.path.exists(img_path):
-                    page_bg_img = Image.open(img_path).convert("RGBA").resize((draw_w, draw_h), Image.LANCZOS)
-                else: # Ha a kép nem található, fehér lesz
-                    page_bg_img = Image.new('RGBA', (draw_w, draw_h), 'white')
+        # Amíg a háttérszál elkészíti a réteget, egy sima, háttérszínű lap látszik
+        placeholder_color = bg_setting if isinstance(bg_setting, str) and bg_setting.startswith('#') else self.colors['card_bg']
+        self.canvas_bg_item = self.canvas.create_rectangle(offset_x, offset_y, offset_x + draw_w, offset_y + draw_h,
+                                                           fill=placeholder_color, outline="", tags="background")
+
+        renderer = self._create_preview_snapshot_renderer()
+        page_index = self.current_page
+
+        def build_layer():
+            shadow_canvas = self.editor_layer_cache.get_or_create(
+                ('shadow', draw_w, draw_h), lambda: self._create_shadow_sprite(draw_w, draw_h, shadow_blur))
+            page_bg_img = self.editor_layer_cache.get_or_create(
+                ('background', bg_key, draw_w, draw_h), lambda: renderer.render_background(page_index, (draw_w, draw_h)))
+            # A kész oldal hátterét ráillesztjük az árnyék közepére (a tárolt réteg másolatára)
+            composed = shadow_canvas.copy()
+            composed.paste(page_bg_img, (shadow_blur, shadow_blur))
+            return composed
+
+        def show_layer(composed, error):
+            if error is not None:
+                # A helykitöltő pirosra vált, ahogy korábban a szinkron hibánál
+                if self.canvas_bg_item:
+                    self.canvas.itemconfig(self.canvas_bg_item, fill="red")
             else:
-                bg_color = bg_setting if isinstance(bg_setting, str) and bg_setting.startswith('#') else self.colors['card_bg']
-                page_bg_img = Image.new('RGBA', (draw_w, draw_h), bg_color)
-
-            # 5. A kész oldal hátterét ráillesztjük az árnyék közepére
-            shadow_canvas.paste(page_bg_img, (shadow_blur, shadow_blur))
-
-            # 6. A végső, árnyékkal ellátott képet jelenítjük meg
-            self.bg_photo_image = ImageTk.PhotoImage(shadow_canvas)
-            self.canvas_bg_item = self.canvas.create_image(
-                offset_x - shadow_blur,  # Az eltolást korrigáljuk az árnyék méretével
-                offset_y - shadow_blur, 
-                image=self.bg_photo_image, 
-                anchor="nw", 
-                tags="background"
-            )
+                self.bg_photo_image = ImageTk.PhotoImage(composed)
+                self.bg_photo_key = layer_key
+                self._place_background_item(self.bg_photo_image, offset_x - shadow_blur, offset_y - shadow_blur)
+            self._release_page_preview()
 
-        except Exception as e:
-            print(f"HIBA a háttér renderelésekor: {e}")
-            traceback.print_exc()
-            self.canvas.create_rectangle(offset_x, offset_y, offset_x + draw_w, offset_y + draw_h, fill="red", outline="")
+        self.preview_executor.submit(('background',), build_layer, show_layer)
+
+    def _place_background_item(self, photo_image, x, y):
+        """Az árnyékos háttérkép a vászon legalsó rétegeként (a helykitöltő helyére)."""
+        if self.canvas_bg_item:
+            self.canvas.delete(self.canvas_bg_item)
+        self.canvas_bg_item = self.canvas.create_image(x, y, image=photo_image, anchor="nw", tags="background")
+        self.canvas.tag_lower(self.canvas_bg_item)
+
+    def _background_layer_key(self, bg_setting):
+        """A háttér azonosítója a rétegtárhoz: képnél az útvonal és a módosítási idő, egyébként a szín."""
+        if isinstance(bg_setting, dict) and bg_setting.get('type') == 'image':
+            img_path = bg_setting.get('path')
+            if img_path and os.path.exists(img_path):
+                return ('image', os.path.abspath(img_path), os.stat(img_path).st_mtime_ns)
+            return ('color', 'white')
+        bg_color = bg_setting if isinstance(bg_setting, str) and bg_setting.startswith('#') else self.colors['card_bg']
+        return ('color', bg_color)
+
+    @staticmethod
+    def _create_shadow_sprite(draw_w, draw_h, shadow_blur):
+        """Az oldal alatti elmosott árnyék, `shadow_blur` szegéllyel minden oldalon."""
+        shadow_color = '#282828' # Sötétszürke árnyék
+
+        # 1. Létrehozunk egy nagyobb, átlátszó vásznat az árnyéknak
+        shadow_canvas = Image.new('RGBA', (draw_w + shadow_blur*2, draw_h + shadow_blur*2), (0, 0, 0, 0))
+        shadow_draw = ImageDraw.Draw(shadow_canvas)
+
+        # 2. Rajzolunk egy fekete téglalapot a közepére (ez lesz az elmosott árnyék)
+        shadow_draw.rectangle(
+            (shadow_blur, shadow_blur, draw_w + shadow_blur, draw_h + shadow_blur),
+            fill=shadow_color
+        )
+
+        # 3. Alkalmazzuk az elmosás effektet
+        return shadow_canvas.filter(ImageFilter.GaussianBlur(radius=shadow_blur / 2))
 
     def set_background_image(self):
         filename = filedialog.askopenfilename(
@@ -1018,6 +4326,7 @@ class FotokonyvGUI:
         )
         if filename:
             self.pages[self.current_page]['background'] = {'type': 'image', 'path': filename}
+            self.change_tracker.mark_background(action='háttérkép')
             self.refresh_editor_view()
     
     def set_background(self):
@@ -1035,6 +4344,7 @@ class FotokonyvGUI:
         def _apply_background(setting):
             self.pages[self.current_page]['background'] = setting
             color_picker.destroy()
+            self.change_tracker.mark_background(action='háttér')
             self.refresh_editor_view()
 
         def _upload_background_image():
@@ -1082,49 +4392,13 @@ class FotokonyvGUI:
         
         ctk.CTkButton(main_scroll_frame, text="Háttér eltávolítása", command=lambda: _apply_background(None)).pack(pady=15, padx=20, fill="x")
 
-    def _render_page_frame(self):
-        offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
-        if draw_w <= 1 or draw_h <= 1: return
-
-        current_page_data = self.pages[self.current_page]
-        page_frame_path = current_page_data.get('page_frame_path')
-        
-        if self.canvas_page_frame_item:
-            self.canvas.delete(self.canvas_page_frame_item)
-            self.canvas_page_frame_item = None
-            self.page_frame_photo_image = None
-
-        if page_frame_path:
-            thickness_ratio = current_page_data.get('page_frame_thickness', 0.05)
-            frame_img = None
-            if page_frame_path.startswith('preset_'): 
-                frame_img = self._create_preset_frame(page_frame_path, (draw_w, draw_h), thickness_ratio)
-            elif os.path.exists(page_frame_path): 
-                frame_img = Image.open(page_frame_path).convert("RGBA").resize((draw_w, draw_h), Image.LANCZOS)
-            
-            if frame_img:
-                self.page_frame_photo_image = ImageTk.PhotoImage(frame_img)
-                self.canvas_page_frame_item = self.canvas.create_image(offset_x, offset_y, image=self.page_frame_photo_image, anchor="nw", tags="page_frame")
-
-    def _create_preset_frame(self, preset_name, size, thickness_ratio=0.05):
-        width, height = size
-        frame_thickness = int(min(width, height) * thickness_ratio)
-        if frame_thickness < 1: frame_thickness = 1
-        color_map = {'preset_black': (0, 0, 0, 200), 'preset_white': (255, 255, 255, 200), 'preset_gold': (212, 175, 55, 220)}
-        color = color_map.get(preset_name, (0,0,0,0))
-        frame_image = Image.new('RGBA', size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(frame_image)
-        for i in range(frame_thickness):
-            draw.rectangle((i, i, width - 1 - i, height - 1 - i), outline=color, width=1)
-        return frame_image
-
     def create_photo_layout(self):
         if not hasattr(self.pages[self.current_page], 'get'): return
         photos_data = self.pages[self.current_page].get('photos', [])
         offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
         if draw_w <= 1 or draw_h <= 1: return
 
-        self.photo_frames = [None] * len(photos_data)
+        self.photo_items = [None] * len(photos_data)
         
         page_key = str(self.current_page)
         if page_key not in self.z_order or len(self.z_order[page_key]) != len(photos_data):
@@ -1133,135 +4407,108 @@ class FotokonyvGUI:
         ordered_indices = self.z_order[page_key]
         valid_indices = [i for i in ordered_indices if i < len(photos_data)]
 
+        # A rétegsorrendben rajzolt elemek maguktól a helyes sorrendben kerülnek a vászonra
         for i in valid_indices:
-            photo_data = photos_data[i]
-            photo_frame = ctk.CTkFrame(self.canvas, fg_color="#CCCCCC", corner_radius=10, border_width=0)
-            
-            self.photo_frames[i] = photo_frame
-            
-            frame_w = int(photo_data['relwidth'] * draw_w)
-            frame_h = int(photo_data['relheight'] * draw_h)
-            abs_x = offset_x + int(photo_data['relx'] * draw_w)
-            abs_y = offset_y + int(photo_data['rely'] * draw_h)
-            
-            canvas_item_id = self.canvas.create_window(abs_x, abs_y, window=photo_frame, width=frame_w, height=frame_h, anchor='nw', tags="photo")
-            self.widget_to_canvas_item[photo_frame] = canvas_item_id
-            
-            photo_frame.bind("<ButtonPress-1>", lambda e, index=i: self._on_widget_press(e, 'photo', index))
-            photo_frame.bind("<B1-Motion>", lambda e: self._on_widget_drag(e))
-            photo_frame.bind("<ButtonRelease-1>", lambda e: self._on_widget_release(e))
+            self.display_photo_placeholder(i)
 
-            self.display_photo_placeholder(photo_frame, photo_data, i, is_update=False)
+    def display_photo_placeholder(self, photo_index, draft=False):
+        """Kirajzolja (vagy újrarajzolja) a képhelyet natív vászonelemekkel.
 
-    def display_photo_placeholder(self, parent_frame, photo_data, photo_index, is_update=False):
-        if not is_update:
-            for widget in parent_frame.winfo_children(): widget.destroy()
-        
+        A teljes minőségű kép a `preview_executor` háttérszálán készül; amíg el nem
+        készül, a képhely korábbi képe (vagy egy szürke helykitöltő) látszik.
+        `draft=True` esetén (csúszkahúzás közben) a gyors piszkozat azonnal, a fő
+        szálon készül, és elavulttá teszi a még futó teljes minőségű kérést.
+        """
+        photo_data = self.pages[self.current_page]['photos'][photo_index]
+        _, _, draw_w, draw_h = self._get_page_draw_area()
+        if draw_w <= 1 or draw_h <= 1: return
+        if photo_index >= len(self.photo_items):
+            self.photo_items.extend([None] * (photo_index + 1 - len(self.photo_items)))
+
+        render_key = ('photo', photo_index)
         photo_path = photo_data.get('path')
         if not photo_path or not os.path.exists(photo_path):
-            add_btn = ctk.CTkButton(parent_frame, text="+", font=ctk.CTkFont(size=24), fg_color=self.colors['accent'], hover_color='#8A9654', command=lambda idx=photo_index: self.add_photo_to_slot(idx))
-            add_btn.place(relx=0.5, rely=0.5, anchor="center")
+            self.preview_executor.discard(render_key)
+            self._place_photo_item(photo_index)
             return
 
-        try:
-            key = str((self.current_page, photo_index))
-            props = self.photo_properties.get(key, {})
-            parent_frame.update_idletasks()
-
-            # --- ÚJ LOGIKA A KERET MÉRETÉNEK DINAMIKUS BEÁLLÍTÁSÁHOZ ---
-            fit_mode = props.get('fit_mode', 'fill')
-            _, _, draw_w, draw_h = self._get_page_draw_area()
-
-            # Először az elrendezésben definiált "mester" méretet használjuk
-            master_rel_w = photo_data.get('layout_relwidth', photo_data['relwidth'])
-            master_rel_h = photo_data.get('layout_relheight', photo_data['relheight'])
-            
-            frame_w = int(master_rel_w * draw_w)
-            frame_h = int(master_rel_h * draw_h)
-
-            original_img = Image.open(photo_path) # Csak az arányok miatt kell betölteni
-
-            # Ha "Beleillesztés" módban vagyunk, a keret méretét a kép arányaihoz igazítjuk
-            if fit_mode == 'fit':
-                img_ratio = original_img.width / original_img.height
-                frame_ratio = frame_w / frame_h if frame_h > 0 else 1
-                
-                if img_ratio > frame_ratio: # A kép szélesebb, mint a keret
-                    frame_h = int(frame_w / img_ratio)
-                else: # A kép magasabb, mint a keret
-                    frame_w = int(frame_h * img_ratio)
-            
-            # Frissítjük a widget méretét a vásznon
-            canvas_item_id = self.widget_to_canvas_item.get(parent_frame)
-            if canvas_item_id:
-                self.canvas.itemconfig(canvas_item_id, width=frame_w, height=frame_h)
-            parent_frame.update_idletasks() # Várakozás, hogy az új méret érvénybe lépjen
+        page_index = self.current_page
+        if draft:
+            self.preview_executor.discard(render_key)
+            renderer = self._create_page_renderer(self.preview_resources, use_proxy=True, resample=Image.NEAREST)
+            try:
+                final_image, render_error = renderer.photo_layer(page_index, photo_index, (draw_w, draw_h)), None
+            except Exception as e:
+                print(f"HIBA a kép megjelenítésekor: {e}\n{traceback.format_exc()}")
+                final_image, render_error = None, e
+            self._place_photo_item(photo_index, final_image, render_error)
+            return
 
-            # --- EDDIGI LOGIKA INNENTŐL FOLYTATÓDIK, DE MÁR A HELYES `frame_w` ÉS `frame_h` ÉRTÉKEKKEL ---
-            if frame_w <= 1 or frame_h <= 1: return
+        existing_item = self.photo_items[photo_index]
+        if not (existing_item and self.canvas.type(existing_item) == 'image'):
+            self._place_photo_item(photo_index, loading=True)
+        # A képhelyet ugyanaz a renderelő készíti, mint az exportot, csak a vászon méretében
+        renderer = self._create_preview_snapshot_renderer(photo_index)
+        self.preview_executor.submit(
+            render_key, lambda: renderer.photo_layer(page_index, photo_index, (draw_w, draw_h)),
+            lambda image, error: self._place_photo_item(photo_index, image, error))
+
+    def _place_photo_item(self, photo_index, final_image=None, render_error=None, loading=False):
+        """A képhely vászonelemeit a kész képre cseréli; kép nélkül üres képhelynél a "+"
+        jelet, betöltés közben szürke helykitöltőt, hibánál hibaüzenetet rajzol.
+
+        Ha a képhely már képként szerepel a vásznon, csak a képét cseréljük; egyébként
+        az új elemek a régiek helyére kerülnek a rétegsorrendben. Csak a fő szálon hívható.
+        """
+        photos_data = self.pages[self.current_page]['photos']
+        if photo_index >= len(photos_data) or photo_index >= len(self.photo_items): return
+        photo_data = photos_data[photo_index]
+        has_photo = bool(photo_data.get('path')) and os.path.exists(photo_data['path'])
+        if has_photo and final_image is None and render_error is None and not loading: return
+        if final_image is not None and (final_image.width <= 1 or final_image.height <= 1): return
 
-            original_img = original_img.convert("RGBA") # Újra konvertáljuk, ha kell
-            
-            if props.get('grayscale', False):
-                original_img = original_img.convert('L').convert('RGBA')
-            enhancer = ImageEnhance.Brightness(original_img); original_img = enhancer.enhance(props.get('brightness', 1.0))
-            enhancer = ImageEnhance.Contrast(original_img); original_img = enhancer.enhance(props.get('contrast', 1.0))
-            enhancer = ImageEnhance.Color(original_img); original_img = enhancer.enhance(props.get('saturation', 1.0))
+        offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
+        abs_x = offset_x + int(photo_data['relx'] * draw_w)
+        abs_y = offset_y + int(photo_data['rely'] * draw_h)
+        frame_w = int(photo_data['relwidth'] * draw_w)
+        frame_h = int(photo_data['relheight'] * draw_h)
+        slot_tag = f"photo:{photo_index}"
+        tags = ("photo", slot_tag)
+        existing_item = self.photo_items[photo_index]
+
+        if final_image is not None and existing_item and self.canvas.type(existing_item) == 'image':
+            self.photo_images[photo_index] = ImageTk.PhotoImage(final_image)
+            self.canvas.itemconfig(existing_item, image=self.photo_images[photo_index])
+            self.canvas.coords(existing_item, abs_x, abs_y)
+            if photo_index == self.selected_photo_index:
+                self._draw_selection_outline()
+            self._release_page_preview()
+            return
 
-            zoom, pan_x, pan_y = props.get('zoom', 1.0), props.get('pan_x', 0.5), props.get('pan_y', 0.5)
-            
-            if fit_mode == 'fill':
-                img_ratio = original_img.width / original_img.height; frame_ratio = frame_w / frame_h
-                if img_ratio > frame_ratio: new_h, new_w = int(frame_h * zoom), int(frame_h * zoom * img_ratio)
-                else: new_w, new_h = int(frame_w * zoom), int(frame_w * zoom / img_ratio)
-                if new_w < frame_w: new_w = frame_w; new_h = int(new_w / img_ratio)
-                if new_h < frame_h: new_h = frame_h; new_w = int(new_h * img_ratio)
-                zoomed_img = original_img.resize((new_w, new_h), Image.LANCZOS)
-                extra_w, extra_h = max(0, new_w - frame_w), max(0, new_h - frame_h)
-                crop_x, crop_y = int(extra_w * pan_x), int(extra_h * pan_y)
-                final_image = zoomed_img.crop((crop_x, crop_y, crop_x + frame_w, crop_y + frame_h))
-            else: # 'fit' mód
-                fit_w, fit_h = frame_w, frame_h # A keret már a helyes méretű
-                new_w, new_h = int(fit_w * zoom), int(fit_h * zoom)
-                if new_w < 1 or new_h < 1: new_w, new_h = 1, 1
-                resized_img = original_img.resize((new_w, new_h), Image.LANCZOS)
-                final_image = Image.new('RGBA', (frame_w, frame_h), (0, 0, 0, 0))
-                extra_w, extra_h = max(0, new_w - frame_w), max(0, new_h - frame_h)
-                paste_x = (frame_w - new_w) // 2 - int(extra_w * (pan_x - 0.5))
-                paste_y = (frame_h - new_h) // 2 - int(extra_h * (pan_y - 0.5))
-                final_image.paste(resized_img, (paste_x, paste_y), resized_img)
-
-            frame_path = props.get('frame_path')
-            if frame_path:
-                # ... (a keret logika változatlan) ...
-                thickness_ratio = props.get('frame_thickness', 0.05)
-                frame_img = None
-                if frame_path.startswith('preset_'): frame_img = self._create_preset_frame(frame_path, (frame_w, frame_h), thickness_ratio)
-                elif os.path.exists(frame_path): frame_img = Image.open(frame_path).convert("RGBA")
-                if frame_img:
-                    f_scale = props.get('frame_scale', 1.0); f_off_x = props.get('frame_offset_x', 0); f_off_y = props.get('frame_offset_y', 0)
-                    new_fw, new_fh = int(frame_w * f_scale), int(frame_h * f_scale)
-                    resized_frame = frame_img.resize((new_fw, new_fh), Image.LANCZOS)
-                    paste_x, paste_y = (frame_w - new_fw) // 2 + f_off_x, (frame_h - new_fh) // 2 + f_off_y
-                    final_image.paste(resized_frame, (paste_x, paste_y), resized_frame)
-            
-            final_ctk_image = ctk.CTkImage(light_image=final_image.convert("RGB"), dark_image=final_image.convert("RGB"), size=(frame_w, frame_h))
-            img_label = None
-            if is_update and len(parent_frame.winfo_children()) > 0 and isinstance(parent_frame.winfo_children()[0], ctk.CTkLabel):
-                img_label = parent_frame.winfo_children()[0]
-            
-            if img_label: img_label.configure(image=final_ctk_image)
-            else:
-                for widget in parent_frame.winfo_children(): widget.destroy()
-                img_label = ctk.CTkLabel(parent_frame, image=final_ctk_image, text="")
-                img_label.pack(fill="both", expand=True)
-                img_label.bind("<ButtonPress-1>", lambda e, idx=photo_index: self._on_widget_press(e, 'photo', idx))
-                img_label.bind("<B1-Motion>", lambda e: self._on_widget_drag(e))
-                img_label.bind("<ButtonRelease-1>", lambda e: self._on_widget_release(e))
+        old_items = self.canvas.find_withtag(slot_tag)
+        self.photo_images.pop(photo_index, None)
 
-        except Exception as e:
-            print(f"HIBA a kép megjelenítésekor: {e}\n{traceback.format_exc()}")
-            ctk.CTkLabel(parent_frame, text="Hiba a kép\nbetöltésekor", text_color="red").place(relx=0.5, rely=0.5, anchor="center")
+        if final_image is not None:
+            self.photo_images[photo_index] = ImageTk.PhotoImage(final_image)
+            item_id = self.canvas.create_image(abs_x, abs_y, image=self.photo_images[photo_index], anchor="nw", tags=tags)
+        else:
+            item_id = self.canvas.create_rectangle(abs_x, abs_y, abs_x + frame_w, abs_y + frame_h, fill="#CCCCCC", outline="", tags=tags)
+            center_x, center_y = abs_x + frame_w // 2, abs_y + frame_h // 2
+            if render_error is not None:
+                self.canvas.create_text(center_x, center_y, text="Hiba a kép\nbetöltésekor", fill="red", tags=tags)
+            elif not has_photo:
+                self.canvas.create_oval(center_x - 20, center_y - 20, center_x + 20, center_y + 20, fill=self.colors['accent'], outline="", tags=tags + ("add_photo",))
+                self.canvas.create_text(center_x, center_y, text="+", font=("Arial", -24), fill="white", tags=tags + ("add_photo",))
+
+        self.photo_items[photo_index] = item_id
+        if old_items:
+            new_items = [item for item in self.canvas.find_withtag(slot_tag) if item not in old_items]
+            for new_item in reversed(new_items):
+                self.canvas.tag_raise(new_item, old_items[-1])
+            self.canvas.delete(*old_items)
+        if photo_index == self.selected_photo_index:
+            self._draw_selection_outline()
+        self._release_page_preview()
 
     def add_photo_to_slot(self, photo_index):
         filename = filedialog.askopenfilename(title="Válassz fotót", filetypes=[("Képfájlok", "*.jpg *.jpeg *.png *.gif *.bmp")])
@@ -1271,9 +4518,7 @@ class FotokonyvGUI:
                 if filename not in self.uploaded_photos:
                     self.uploaded_photos.append(filename)
                 
-                frame_to_update = self.photo_frames[photo_index]
-                data_to_update = self.pages[self.current_page]['photos'][photo_index]
-                self.display_photo_placeholder(frame_to_update, data_to_update, photo_index, is_update=False)
+                self.display_photo_placeholder(photo_index)
             except IndexError:
                 messagebox.showerror("Hiba", "Belső hiba történt a fotó hozzáadásakor. Kérem próbálja újra.")
                 self.refresh_editor_view()
@@ -1302,9 +4547,6 @@ class FotokonyvGUI:
         if self.selected_photo_index is None: return
         
         photo_data = self.pages[self.current_page]['photos'][self.selected_photo_index]
-        photo_frame = self.photo_frames[self.selected_photo_index]
-        
-        _, _, draw_w, draw_h = self._get_page_draw_area()
         
         new_relwidth = self.width_slider.get()
         new_relheight = self.height_slider.get()
@@ -1315,11 +4557,10 @@ class FotokonyvGUI:
         photo_data['layout_relwidth'] = new_relwidth
         photo_data['layout_relheight'] = new_relheight
         
-        canvas_item_id = self.widget_to_canvas_item.get(photo_frame)
-        if canvas_item_id:
-            self.canvas.itemconfig(canvas_item_id, width=int(new_relwidth * draw_w), height=int(new_relheight * draw_h))
-            
-        self.display_photo_placeholder(photo_frame, photo_data, self.selected_photo_index, is_update=True)
+        # Az index azonnal követi az új méretet; az átfedések a kijelölés megszűnéséig látszanak
+        self._update_spatial_index('photo', self.selected_photo_index)
+        self._show_overlap_warnings('photo', self.selected_photo_index)
+        self.slider_preview.request(self.selected_photo_index)
 
     def _delete_photo_placeholder(self):
         """Törli a kiválasztott képkeretet és a hozzá tartozó tulajdonságokat,
@@ -1385,9 +4626,7 @@ class FotokonyvGUI:
         try:
             self.pages[self.current_page]['photos'][self.selected_photo_index]['path'] = filename
             
-            frame_to_update = self.photo_frames[self.selected_photo_index]
-            data_to_update = self.pages[self.current_page]['photos'][self.selected_photo_index]
-            self.display_photo_placeholder(frame_to_update, data_to_update, self.selected_photo_index, is_update=False)
+            self.display_photo_placeholder(self.selected_photo_index)
 
         except IndexError:
             messagebox.showerror("Hiba", "Belső hiba történt a fotó cseréjekor. Kérem próbálja újra.")
@@ -1414,6 +4653,7 @@ class FotokonyvGUI:
 
         if current_pos < len(order) - 1:
             order[current_pos], order[current_pos + 1] = order[current_pos + 1], order[current_pos]
+            self.change_tracker.mark_z_order(action='előrehozás')
             self.refresh_editor_view()
 
     def _send_photo_backward(self):
@@ -1435,6 +4675,7 @@ class FotokonyvGUI:
 
         if current_pos > 0:
             order[current_pos], order[current_pos - 1] = order[current_pos - 1], order[current_pos]
+            self.change_tracker.mark_z_order(action='hátraküldés')
             self.refresh_editor_view()
 
     def add_frame(self):
@@ -1626,6 +4867,7 @@ class FotokonyvGUI:
                 current_page_data.pop(key, None)
 
         self.update_page_frame_editor_ui()
+        self.change_tracker.mark_page_frame(action='oldalkeret')
         self.refresh_editor_view()
 
     def _update_page_frame_properties(self, value=None):
@@ -1639,6 +4881,7 @@ class FotokonyvGUI:
         current_page_data['page_frame_offset_x'] = int(self.page_frame_offset_x_slider.get())
         current_page_data['page_frame_offset_y'] = int(self.page_frame_offset_y_slider.get())
         
+        self.change_tracker.mark_page_frame(action='oldalkeret beállítás')
         self.refresh_editor_view()
     
     def update_page_frame_editor_ui(self):
@@ -1676,51 +4919,28 @@ class FotokonyvGUI:
         offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
         if draw_w <= 1 or draw_h <= 1: return
 
-        current_page_data = self.pages[self.current_page]
-        page_frame_path = current_page_data.get('page_frame_path')
-        
         if self.canvas_page_frame_item:
             self.canvas.delete(self.canvas_page_frame_item)
             self.canvas_page_frame_item = None
             self.page_frame_photo_image = None
 
-        if page_frame_path:
-            frame_img = None
-            if page_frame_path.startswith('preset_'):
-                thickness_ratio = current_page_data.get('page_frame_thickness', 0.05)
-                frame_img = self._create_preset_frame(page_frame_path, (draw_w, draw_h), thickness_ratio)
-            elif os.path.exists(page_frame_path):
-                frame_img = Image.open(page_frame_path).convert("RGBA")
+        # A keret méretezését és eltolását ugyanaz a renderelő számolja, mint az exportnál
+        frame_layer = self._create_page_renderer(self.preview_resources, use_proxy=True).page_frame_layer(self.current_page, (draw_w, draw_h))
+        if frame_layer is not None:
+            resized_frame, (paste_x, paste_y) = frame_layer
             
-            if frame_img:
-                # ÚJ RÉSZ: Méretezés és eltolás alkalmazása
-                f_scale = current_page_data.get('page_frame_scale', 1.0)
-                f_off_x = current_page_data.get('page_frame_offset_x', 0)
-                f_off_y = current_page_data.get('page_frame_offset_y', 0)
-
-                # Az új keret méretei a skálázás alapján
-                new_fw = int(draw_w * f_scale)
-                new_fh = int(draw_h * f_scale)
-                
-                # A keret átméretezése
-                resized_frame = frame_img.resize((new_fw, new_fh), Image.LANCZOS)
-                
-                # A beillesztés pozíciójának kiszámítása a középpontból és az eltolásból
-                paste_x = (draw_w - new_fw) // 2 + f_off_x
-                paste_y = (draw_h - new_fh) // 2 + f_off_y
-                
-                # Létrehozunk egy üres, átlátszó réteget, amire a keretet helyezzük,
-                # hogy a vászonra egyetlen képként kerüljön ki.
-                final_frame_layer = Image.new('RGBA', (draw_w, draw_h), (0, 0, 0, 0))
-                final_frame_layer.paste(resized_frame, (paste_x, paste_y), resized_frame)
-                
-                self.page_frame_photo_image = ImageTk.PhotoImage(final_frame_layer)
-                self.canvas_page_frame_item = self.canvas.create_image(
-                    offset_x, offset_y, 
-                    image=self.page_frame_photo_image, 
-                    anchor="nw", 
-                    tags="page_frame"
-                )
+            # Létrehozunk egy üres, átlátszó réteget, amire a keretet helyezzük,
+            # hogy a vászonra egyetlen képként kerüljön ki.
+            final_frame_layer = Image.new('RGBA', (draw_w, draw_h), (0, 0, 0, 0))
+            final_frame_layer.paste(resized_frame, (paste_x, paste_y), resized_frame)
+            
+            self.page_frame_photo_image = ImageTk.PhotoImage(final_frame_layer)
+            self.canvas_page_frame_item = self.canvas.create_image(
+                offset_x, offset_y, 
+                image=self.page_frame_photo_image, 
+                anchor="nw", 
+                tags="page_frame"
+            )
     
     def _upload_custom_frame_path(self):
         return filedialog.askopenfilename(title="Válassz egy keret képet", filetypes=[("Képfájlok", "*.jpg *.jpeg *.png *.bmp"), ("Minden fájl", "*.*")]) or None
@@ -1900,6 +5120,7 @@ class FotokonyvGUI:
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(project_data, f, ensure_ascii=False, indent=4)
+            self.project_path = filepath
             messagebox.showinfo("Mentés sikeres", f"A projekt sikeresen elmentve ide:\n{filepath}")
         except Exception as e:
             messagebox.showerror("Mentési hiba", f"Hiba történt a projekt mentése során:\n{e}")
@@ -1922,6 +5143,7 @@ class FotokonyvGUI:
 
             self.photo_properties = project_data.get("photo_properties", {})
             self.z_order = project_data.get("z_order", {})
+            self.project_path = filepath
             self.current_page = 0
             
             if not self.pages:
@@ -1947,9 +5169,15 @@ class FotokonyvGUI:
             messagebox.showerror("Hiba", "Nincs mit exportálni. Hozz létre legalább egy oldalt!")
             return
         export_window = ctk.CTkToplevel(self.root)
-        export_window.title("Exportálás"); export_window.geometry("300x200")
+        export_window.title("Exportálás"); export_window.geometry("300x290")
         export_window.transient(self.root); export_window.grab_set()
         ctk.CTkLabel(export_window, text="Válassz exportálási formátumot:", font=ctk.CTkFont(size=16)).pack(pady=20)
+        workers_frame = ctk.CTkFrame(export_window, fg_color="transparent")
+        workers_frame.pack(pady=(0, 10))
+        ctk.CTkLabel(workers_frame, text="Párhuzamos folyamatok:").pack(side="left", padx=(0, 8))
+        worker_choices = [str(n) for n in range(1, max(ParallelPageExporter.default_workers(), self.export_workers) + 1)]
+        ctk.CTkOptionMenu(workers_frame, values=worker_choices, width=70, variable=ctk.StringVar(value=str(self.export_workers)),
+                          command=lambda value: setattr(self, 'export_workers', int(value))).pack(side="left")
         btn_style = {'height': 40, 'width': 200}
         ctk.CTkButton(export_window, text="Exportálás Képként", command=lambda: [export_window.destroy(), self._export_as_images()], **btn_style).pack(pady=10)
         ctk.CTkButton(export_window, text="Exportálás PDF-ként", command=lambda: [export_window.destroy(), self._export_as_pdf()], **btn_style).pack(pady=10)
@@ -1960,245 +5188,216 @@ class FotokonyvGUI:
             defaultextension=".png",
             filetypes=[("PNG képfájl", "*.png"), ("JPEG képfájl", "*.jpg")]
         )
-        if not filepath:
+        if not filepath or not self._export_job_available():
             return
 
-        self._show_working_indicator()
-        try:
-            directory = os.path.dirname(filepath)
-            base_name, extension = os.path.splitext(os.path.basename(filepath))
-            save_format = "JPEG" if extension.lower() in ['.jpg', '.jpeg'] else "PNG"
-            num_pages = len(self.pages)
-            
-            for i in range(num_pages):
-                page_image = self._render_page_to_image(i)
-                if page_image:
-                    if num_pages > 1:
-                        current_filename = f"{base_name}_{i+1}{extension}"
-                        final_path = os.path.join(directory, current_filename)
-                    else:
-                        final_path = filepath
-                    page_image.save(final_path, save_format)
-            
-            messagebox.showinfo("Exportálás sikeres", f"Az oldalak sikeresen exportálva a következő mappába:\n{directory}")
-        
-        except Exception as e:
-            messagebox.showerror("Exportálási hiba", f"Hiba történt a képek exportálása során:\n{e}")
-        finally:
-            self._hide_working_indicator()
+        directory = os.path.dirname(filepath)
+        base_name, extension = os.path.splitext(os.path.basename(filepath))
+        save_format = "JPEG" if extension.lower() in ['.jpg', '.jpeg'] else "PNG"
+        num_pages = len(self.pages)
 
-    def _export_as_pdf(self):
-        filepath = filedialog.asksaveasfilename(title="PDF mentése másként", defaultextension=".pdf", filetypes=[("PDF Dokumentum", "*.pdf")])
-        if not filepath: return
-        
-        self._show_working_indicator()
-        try:
-            rendered_images = []
-            for i in range(len(self.pages)):
-                page_image = self._render_page_to_image(i)
-                if page_image:
-                    rendered_images.append(page_image)
-            
-            if not rendered_images:
-                messagebox.showerror("Hiba", "Nem sikerült egyetlen oldalt sem renderelni.")
-                return
+        def page_path(i):
+            return os.path.join(directory, f"{base_name}_{i+1}{extension}") if num_pages > 1 else filepath
 
-            if len(rendered_images) > 1:
-                rendered_images[0].save(
-                    filepath, "PDF", resolution=300.0, save_all=True, append_images=rendered_images[1:]
-                )
-            elif rendered_images:
-                rendered_images[0].save(filepath, "PDF", resolution=300.0)
+        exporter = self._create_page_exporter(encode_format=save_format)
 
-            messagebox.showinfo("Exportálás sikeres", f"A PDF sikeresen létrehozva:\n{filepath}")
-        except Exception as e:
-            messagebox.showerror("Exportálási hiba", f"Hiba történt a PDF létrehozása során:\n{e}\n{traceback.format_exc()}")
-        finally:
-            self._hide_working_indicator()
+        def work(job):
+            # A renderelési kulcsokhoz minden hivatkozott fájl ujjlenyomata kell, ezért ez is itt, a háttérszálon készül
+            job.report_status("Oldalak ellenőrzése...")
+            checkpoint = ExportCheckpoint(filepath, save_format, exporter.page_keys())
+            # Egy megszakadt exportálás változatlan, már kiírt oldalait nem készítjük el újra
+            done_pages = {i for i in checkpoint.completed if os.path.exists(page_path(i))}
+            job.begin_pages(checkpoint, already_done=len(done_pages))
 
-    
-    
-    
+            def write_page(i, encoded_page):
+                # A kódolás a munkafolyamatokban történt, itt már csak sorrendben kiírjuk
+                if encoded_page:
+                    part_path = f"{page_path(i)}.part"
+                    with open(part_path, 'wb') as f:
+                        f.write(encoded_page)
+                    os.replace(part_path, page_path(i))
+                # A hibásan renderelt oldal nem kerül az ellenőrzőpontba, a folytatás újra elkészíti
+                job.page_done(i, completed=bool(encoded_page) and i not in exporter.failed_pages)
 
-    def _render_page_to_image(self, page_index):
-        if page_index >= len(self.pages): return None
+            exporter.run(write_page, skip_pages=done_pages)
+            print(f"Képexport: {exporter.report()}")
 
-        page_data = self.pages[page_index]
-        W, H = page_data.get('size', self.DEFAULT_BOOK_SIZE_PIXELS)
-        
-        REFERENCE_EDITOR_HEIGHT = 600.0 
-        height_scale_factor = H / REFERENCE_EDITOR_HEIGHT
+        def on_success(job):
+            messagebox.showinfo("Exportálás sikeres", f"Az oldalak sikeresen exportálva a következő mappába:\n{directory}"
+                                                      f"{self._reused_pages_note(exporter, job)}")
 
-        bg_setting = page_data.get('background')
-        if isinstance(bg_setting, dict) and bg_setting.get('type') == 'image' and os.path.exists(bg_setting.get('path')):
-            bg_img = Image.open(bg_setting['path']).convert("RGBA")
-            page_image = bg_img.resize((W,H), Image.LANCZOS)
-        else:
-            bg_color = bg_setting if isinstance(bg_setting, str) and bg_setting.startswith('#') else self.colors['card_bg']
-            page_image = Image.new('RGBA', (W, H), bg_color)
-        
-        draw = ImageDraw.Draw(page_image)
-        
-        photos_data = page_data.get('photos', [])
-        page_key = str(page_index)
-        ordered_indices = self.z_order.get(page_key, list(range(len(photos_data))))
-
-        for photo_idx in ordered_indices:
-            if photo_idx >= len(photos_data): continue
-            photo_data = photos_data[photo_idx]
-            photo_path = photo_data.get('path')
-            if not photo_path or not os.path.exists(photo_path): continue
-            
-            try:
-                key = str((page_index, photo_idx))
-                props = self.photo_properties.get(key, {})
-                fit_mode = props.get('fit_mode', 'fill')
-
-                master_rel_w = photo_data.get('layout_relwidth', photo_data['relwidth'])
-                master_rel_h = photo_data.get('layout_relheight', photo_data['relheight'])
-                frame_w, frame_h = int(master_rel_w * W), int(master_rel_h * H)
-
-                if fit_mode == 'fit':
-                    with Image.open(photo_path) as temp_img:
-                        img_ratio = temp_img.width / temp_img.height
-                        frame_ratio = frame_w / frame_h if frame_h > 0 else 1
-                        if img_ratio > frame_ratio: frame_h = int(frame_w / img_ratio)
-                        else: frame_w = int(frame_h * img_ratio)
-
-                frame_x, frame_y = int(photo_data['relx'] * W), int(photo_data['rely'] * H)
-                if frame_w <= 0 or frame_h <= 0: continue
-
-                original_img = Image.open(photo_path).convert("RGBA")
-                if props.get('grayscale', False): original_img = original_img.convert('L').convert('RGBA')
-                enhancer = ImageEnhance.Brightness(original_img); original_img = enhancer.enhance(props.get('brightness', 1.0))
-                enhancer = ImageEnhance.Contrast(original_img); original_img = enhancer.enhance(props.get('contrast', 1.0))
-                enhancer = ImageEnhance.Color(original_img); original_img = enhancer.enhance(props.get('saturation', 1.0))
-
-                zoom, pan_x, pan_y = props.get('zoom', 1.0), props.get('pan_x', 0.5), props.get('pan_y', 0.5)
-
-                if fit_mode == 'fill':
-                    img_ratio = original_img.width / original_img.height; frame_ratio = frame_w / frame_h if frame_h > 0 else 1
-                    if img_ratio > frame_ratio: new_h, new_w = int(frame_h * zoom), int(frame_h * zoom * img_ratio)
-                    else: new_w, new_h = int(frame_w * zoom), int(frame_w * zoom / img_ratio)
-                    if new_w < frame_w: new_w, new_h = frame_w, int(frame_w / img_ratio)
-                    if new_h < frame_h: new_h, new_w = frame_h, int(frame_h * img_ratio)
-                    zoomed_img = original_img.resize((new_w, new_h), Image.LANCZOS)
-                    extra_w, extra_h = max(0, new_w - frame_w), max(0, new_h - frame_h)
-                    crop_x, crop_y = int(extra_w * pan_x), int(extra_h * pan_y)
-                    final_photo = zoomed_img.crop((crop_x, crop_y, crop_x + frame_w, crop_y + frame_h))
-                else:
-                    fit_w, fit_h = frame_w, frame_h
-                    new_w, new_h = int(fit_w * zoom), int(fit_h * zoom)
-                    if new_w < 1 or new_h < 1: new_w, new_h = 1, 1
-                    resized_img = original_img.resize((new_w, new_h), Image.LANCZOS)
-                    final_photo = Image.new('RGBA', (frame_w, frame_h), (0, 0, 0, 0))
-                    extra_w, extra_h = max(0, new_w - frame_w), max(0, new_h - frame_h)
-                    paste_x = (frame_w - new_w) // 2 - int(extra_w * (pan_x - 0.5))
-                    paste_y = (frame_h - new_h) // 2 - int(extra_h * (pan_y - 0.5))
-                    final_photo.paste(resized_img, (paste_x, paste_y), resized_img)
-
-                photo_frame_path = props.get('frame_path')
-                if photo_frame_path:
-                    thickness_ratio_photo = props.get('frame_thickness', 0.05)
-                    photo_frame_img = None
-                    if photo_frame_path.startswith('preset_'): photo_frame_img = self._create_preset_frame(photo_frame_path, (frame_w, frame_h), thickness_ratio_photo)
-                    elif os.path.exists(photo_frame_path): photo_frame_img = Image.open(photo_frame_path).convert("RGBA")
-                    
-                    if photo_frame_img:
-                        # ### JAVÍTÁS (Képkeret): ###
-                        # A torzítás elkerülése érdekében a keretet először a célméretre
-                        # méretezzük, és csak utána alkalmazzuk a felhasználói skálázást.
-                        base_resized_frame = photo_frame_img.resize((frame_w, frame_h), Image.LANCZOS)
-
-                        f_scale = props.get('frame_scale', 1.0)
-                        f_off_x = props.get('frame_offset_x', 0)
-                        f_off_y = props.get('frame_offset_y', 0)
-                        
-                        scaled_fw = int(frame_w * f_scale)
-                        scaled_fh = int(frame_h * f_scale)
-                        
-                        final_frame_img = base_resized_frame
-                        if (scaled_fw, scaled_fh) != (frame_w, frame_h) and scaled_fw > 0 and scaled_fh > 0:
-                             final_frame_img = base_resized_frame.resize((scaled_fw, scaled_fh), Image.LANCZOS)
+        job = ExportJob(num_pages, work)
+        self._start_export_job("Képek exportálása", job, on_success, "Hiba történt a képek exportálása során:")
 
-                        paste_x = (frame_w - scaled_fw) // 2 + f_off_x
-                        paste_y = (frame_h - scaled_fh) // 2 + f_off_y
-                        final_photo.paste(final_frame_img, (paste_x, paste_y), final_frame_img)
-                
-                page_image.paste(final_photo, (frame_x, frame_y), final_photo)
+    def _export_as_pdf(self):
+        filepath = filedialog.asksaveasfilename(title="PDF mentése másként", defaultextension=".pdf", filetypes=[("PDF Dokumentum", "*.pdf")])
+        if not filepath or not self._export_job_available(): return
+
+        # A munkafolyamatok csak a fotókat készítik el (vagy jelzik, hogy az eredeti JPEG átvehető);
+        # a háttér, a keretek és a szövegek itt kerülnek a fájlba, közös objektumokként és valódi szövegként.
+        # Minden oldal azonnal kiíródik, így a memóriahasználat a könyv hosszától független. Egy megszakadt
+        # exportálás kész oldalai a lemezes tárból érkeznek, így a PDF újraírása csak a hiányzókat rendereli.
+        exporter = self._create_page_exporter(page_task=pdf_page_photos)
+
+        def work(job):
+            job.report_status("Oldalak ellenőrzése...")
+            exporter.page_keys()
+            job.begin_pages()
+            with StreamingPdfWriter(filepath, resolution=300.0) as pdf:
+                composer = StructuredPdfComposer(pdf, exporter.snapshot)
+
+                def write_page(i, photo_parts):
+                    if photo_parts is not None:
+                        composer.add_page(i, photo_parts)
+                    job.page_done(i)
+
+                exporter.run(write_page)
+                composer.finish()
+            if not pdf.page_count:
+                os.remove(filepath)
+                return 0
+            print(f"PDF export: {exporter.report()}; {composer.report()}")
+            return pdf.page_count
+
+        def on_success(job):
+            if not job.result:
+                messagebox.showerror("Hiba", "Nem sikerült egyetlen oldalt sem renderelni.")
+                return
+            messagebox.showinfo("Exportálás sikeres", f"A PDF sikeresen létrehozva:\n{filepath}{self._reused_pages_note(exporter, job)}")
 
-            except Exception as e:
-                print(f"HIBA a(z) {page_index}. oldal, {photo_idx}. kép renderelésekor: {e}")
-                draw.rectangle([frame_x, frame_y, frame_x + frame_w, frame_y + frame_h], outline="red", width=5)
-                draw.text((frame_x + 10, frame_y + 10), "Kép hiba", fill="red")
-        
-        page_frame_path = page_data.get('page_frame_path')
-        if page_frame_path:
-            frame_img = None
-            if page_frame_path.startswith('preset_'):
-                thickness_ratio = page_data.get('page_frame_thickness', 0.05)
-                frame_img = self._create_preset_frame(page_frame_path, (W, H), thickness_ratio)
-            elif os.path.exists(page_frame_path):
-                frame_img = Image.open(page_frame_path).convert("RGBA")
-            
-            if frame_img:
-                f_scale = page_data.get('page_frame_scale', 1.0)
-                f_off_x = page_data.get('page_frame_offset_x', 0)
-                f_off_y = page_data.get('page_frame_offset_y', 0)
-                new_fw = int(W * f_scale); new_fh = int(H * f_scale)
-                if new_fw > 0 and new_fh > 0:
-                    resized_frame = frame_img.resize((new_fw, new_fh), Image.LANCZOS)
-                    paste_x = (W - new_fw) // 2 + f_off_x
-                    paste_y = (H - new_fh) // 2 + f_off_y
-                    page_image.paste(resized_frame, (paste_x, paste_y), resized_frame)
-                        
-        for text_data in page_data.get('texts', []):
-            try:
-                font_family = text_data.get('font_family', 'Arial')
-                font_style = text_data.get('font_style', 'normal')
-                font_color = text_data.get('font_color', '#000000')
-                
-                original_font_size = text_data.get('font_size', 24)
-                scaled_font_size = int(original_font_size * height_scale_factor)
-                
-                font_variant = ""
-                if 'bold' in font_style and 'italic' in font_style: font_variant = "bi"
-                elif 'bold' in font_style: font_variant = "bd"
-                elif 'italic' in font_style: font_variant = "i"
-                font_name_base = font_family.lower().replace(' ', '')
-                
-                font_filenames_to_try = [f"{font_name_base}{font_variant}.ttf", f"{font_family}.ttf"]
-                if font_family == "Times New Roman": font_filenames_to_try.append("times.ttf")
-                if font_family == "Courier New": font_filenames_to_try.append("cour.ttf")
-
-                font = None
-                for name in font_filenames_to_try:
-                    try:
-                        font = ImageFont.truetype(name, size=scaled_font_size)
-                        break 
-                    except IOError:
-                        continue 
-                
-                if font is None:
-                    print(f"Figyelmeztetés: '{font_family}' betűtípus nem található, alapértelmezett betűtípus lesz használva.")
-                    # A load_default nem fogadja el a size argumentumot, de a default font kicsi
-                    font = ImageFont.load_default()
+        job = ExportJob(len(self.pages), work)
+        self._start_export_job("PDF exportálása", job, on_success, "Hiba történt a PDF létrehozása során:")
 
+    def _export_job_available(self):
+        if self.export_job is not None:
+            messagebox.showwarning("Exportálás folyamatban", "Egy exportálás már fut. Várd meg a végét, vagy szakítsd meg.")
+            return False
+        return True
 
-                text_x, text_y = int(text_data['relx'] * W), int(text_data['rely'] * H)
-                draw.text((text_x, text_y), text_data['text'], fill=font_color, font=font, anchor="mm")
-            
-            except Exception as e:
-                print(f"HIBA a szöveg renderelésekor: {e}")
-                traceback.print_exc()
+    def _start_export_job(self, title, job, on_success, error_message):
+        """Elindítja az exportálási feladatot egy folyamatjelző ablakkal (haladás, hátralévő idő, megszakítás).
 
-        # ### JAVÍTÁS (Oldalkeretet): ###
-        # Ahelyett, hogy a végén RGB-re konvertálnánk (ami eldobja az átlátszóságot),
-        # egy fehér alapra másoljuk rá az RGBA (átlátszó) rétegeket tartalmazó képet.
-        # Így az átlátszó részek helyesen jelennek meg a fehér háttéren.
-        final_output_image = Image.new("RGB", (W, H), "white")
-        final_output_image.paste(page_image, (0, 0), page_image)
-        return final_output_image
+        Az ablak kizárólag a feladat eseményeiből (`ExportJob.poll_events`) frissül.
+        """
+        self.export_job = job
+        progress_window = ctk.CTkToplevel(self.root)
+        progress_window.title(title); progress_window.geometry("380x170")
+        progress_window.transient(self.root)
+        status_label = ctk.CTkLabel(progress_window, text="Exportálás előkészítése...")
+        status_label.pack(pady=(20, 10), padx=20)
+        progress_bar = ctk.CTkProgressBar(progress_window, width=320)
+        progress_bar.set(0)
+        progress_bar.pack(pady=5, padx=20)
+        pages_done = 0
+
+        def request_cancel():
+            job.cancel()
+            cancel_button.configure(state="disabled")
+            status_label.configure(text="Leállítás az aktuális oldal befejezése után...")
+
+        cancel_button = ctk.CTkButton(progress_window, text="Megszakítás", command=request_cancel)
+        cancel_button.pack(pady=15)
+        progress_window.protocol("WM_DELETE_WINDOW", request_cancel)
+
+        def show_result(state):
+            progress_window.destroy()
+            self.export_job = None
+            # Ellenőrzőpont nélkül (PDF) a kész oldalakat a lemezes tár adja vissza
+            resume_note = ("Ugyanide exportálva a munka innen folytatódik." if job.checkpoint is not None
+                           else "A kész oldalakat a következő exportálás a tárból veszi át.")
+            if state == 'done':
+                on_success(job)
+            elif state == 'cancelled':
+                messagebox.showinfo("Exportálás megszakítva", f"{pages_done} / {job.total} oldal készült el.\n{resume_note}")
+            else:
+                print(job.error_details)
+                messagebox.showerror("Exportálási hiba", f"{error_message}\n{job.error}\n\n{resume_note}")
+
+        def poll():
+            nonlocal pages_done
+            for event in job.poll_events():
+                if event[0] == 'finished':
+                    show_result(event[1])
+                    return
+                if event[0] == 'status':
+                    text = event[1]
+                elif event[0] == 'pages':
+                    _, pages_done, total = event
+                    text = (f"Megszakadt exportálás folytatása ({pages_done} oldal már kész)..." if pages_done
+                            else f"0 / {total} oldal kész, hátralévő idő számítása...")
+                else:
+                    _, _, pages_done, total, eta = event
+                    eta_text = f"hátralévő idő: {self._format_duration(eta)}" if eta is not None else "hátralévő idő számítása..."
+                    text = f"{pages_done} / {total} oldal kész, {eta_text}"
+                if event[0] != 'status' and total:
+                    progress_bar.set(pages_done / total)
+                if not job.cancel_requested:
+                    status_label.configure(text=text)
+            self.root.after(self.EXPORT_POLL_MS, poll)
+
+        job.start()
+        self.root.after(self.EXPORT_POLL_MS, poll)
+
+    @staticmethod
+    def _format_duration(seconds):
+        seconds = int(round(seconds))
+        if seconds < 60:
+            return f"{seconds} mp"
+        minutes, seconds = divmod(seconds, 60)
+        if minutes < 60:
+            return f"{minutes} perc {seconds} mp"
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours} óra {minutes} perc"
+
+
+    def _create_page_renderer(self, resources=None, use_proxy=False, resample=Image.LANCZOS):
+        return PageRenderer(self.pages, self.photo_properties, self.z_order, self.colors['card_bg'],
+                            self.DEFAULT_BOOK_SIZE_PIXELS, resources=resources, use_proxy=use_proxy, resample=resample)
+
+    def _create_preview_snapshot_renderer(self, photo_index=None, page_index=None):
+        """Háttérszálas előnézethez: a renderelő az oldal (alapértelmezés: az aktuális, és
+        `photo_index` megadásakor az adott képhely) adatainak másolatát kapja, így a fő szálon
+        közben folytatódó szerkesztés nem keveredik bele a készülő képbe. A másolat sekély,
+        csak a renderelés által olvasott szótárakat kettőzzük meg."""
+        page_index = self.current_page if page_index is None else page_index
+        page_copy = dict(self.pages[page_index])
+        if isinstance(page_copy.get('background'), dict):
+            page_copy['background'] = dict(page_copy['background'])
+        page_copy['photos'] = list(page_copy.get('photos', []))
+        photo_properties = dict(self.photo_properties)
+        if photo_index is not None:
+            page_copy['photos'][photo_index] = dict(page_copy['photos'][photo_index])
+            props_key = str((page_index, photo_index))
+            if props_key in photo_properties:
+                photo_properties[props_key] = dict(photo_properties[props_key])
+        else:
+            page_copy['photos'] = [dict(photo) for photo in page_copy['photos']]
+            for index in range(len(page_copy['photos'])):
+                props_key = str((page_index, index))
+                if props_key in photo_properties:
+                    photo_properties[props_key] = dict(photo_properties[props_key])
+        pages = list(self.pages)
+        pages[page_index] = page_copy
+        return PageRenderer(pages, photo_properties, dict(self.z_order), self.colors['card_bg'],
+                            self.DEFAULT_BOOK_SIZE_PIXELS, resources=self.preview_resources, use_proxy=True)
+
+    def _create_page_exporter(self, encode_format=None, page_task=None):
+        snapshot = create_export_snapshot(self.pages, self.photo_properties, self.z_order,
+                                          self.colors['card_bg'], self.DEFAULT_BOOK_SIZE_PIXELS)
+        return ParallelPageExporter(snapshot, workers=self.export_workers, encode_format=encode_format, page_task=page_task,
+                                    render_cache=PageRenderCache(self._render_cache_dir()))
+
+    def _render_cache_dir(self):
+        """Az exportált oldalak tára a projektfájl mellett; mentetlen projektnél a felhasználói gyorsítótárban."""
+        base_dir = os.path.dirname(os.path.abspath(self.project_path)) if self.project_path else os.path.expanduser("~")
+        return os.path.join(base_dir, ".lolaba-cache", "renders")
+
+    @staticmethod
+    def _reused_pages_note(exporter, job):
+        reused = exporter.reused_pages + job.resumed_pages
+        if not reused:
+            return ""
+        return f"\n\n{reused} / {job.total} oldal változatlan volt, ezek a korábbi exportálásból kerültek át."
 
     # --- SZÖVEGSZERKESZTŐ METÓDUSOK ---
     def add_text(self):
@@ -2264,42 +5463,27 @@ class FotokonyvGUI:
         if draw_w <= 1 or draw_h <= 1: return
         
         for i, text_data in enumerate(self.pages[self.current_page]['texts']):
-            style_string = text_data.get('font_style', 'normal')
-            font_obj = ctk.CTkFont(family=text_data.get('font_family', 'Arial'), size=text_data.get('font_size', 12), weight="bold" if "bold" in style_string else "normal", slant="italic" if "italic" in style_string else "roman")
-            container = ctk.CTkFrame(self.canvas, fg_color="transparent")
-            label = ctk.CTkLabel(container, text=text_data['text'], font=font_obj, text_color=text_data.get('font_color', '#000000'), fg_color="transparent")
-            label.pack(padx=2, pady=2)
-            
             abs_x = offset_x + int(text_data['relx'] * draw_w)
             abs_y = offset_y + int(text_data['rely'] * draw_h)
 
-            canvas_item_id = self.canvas.create_window(abs_x, abs_y, window=container, anchor="center", tags="text")
-            self.widget_to_canvas_item[container] = canvas_item_id
-            
-            container.bind("<ButtonPress-1>", lambda e, index=i: self._on_widget_press(e, 'text', index))
-            container.bind("<B1-Motion>", lambda e: self._on_widget_drag(e))
-            container.bind("<ButtonRelease-1>", lambda e: self._on_widget_release(e))
-            label.bind("<ButtonPress-1>", lambda e, index=i: self._on_widget_press(e, 'text', index))
-            label.bind("<B1-Motion>", lambda e: self._on_widget_drag(e))
-            label.bind("<ButtonRelease-1>", lambda e: self._on_widget_release(e))
-            self.text_widgets.append(container)
+            canvas_item_id = self.canvas.create_text(abs_x, abs_y, text=text_data['text'], font=self._canvas_text_font(text_data), fill=text_data.get('font_color', '#000000'), anchor="center", tags=("text", f"text:{i}"))
+            self.text_items.append(canvas_item_id)
+
+    @staticmethod
+    def _canvas_text_font(text_data):
+        """Tk betűtípus-leíró a szöveghez; a negatív méret pixelben értendő, mint a CTkFont-nál."""
+        style_string = text_data.get('font_style', 'normal')
+        styles = [style for style in ("bold", "italic") if style in style_string]
+        return (text_data.get('font_family', 'Arial'), -int(text_data.get('font_size', 12)), " ".join(styles) or "normal")
 
     def _update_selected_text_widget(self):
         if self.selected_text_index is None: return
 
         try:
             text_data = self.pages[self.current_page]['texts'][self.selected_text_index]
-            text_widget_container = self.text_widgets[self.selected_text_index]
-            text_label = text_widget_container.winfo_children()[0]
-
-            font_obj = ctk.CTkFont(
-                family=text_data.get('font_family', 'Arial'),
-                size=text_data.get('font_size', 12),
-                weight="bold" if "bold" in text_data.get('font_style', 'normal') else "normal",
-                slant="italic" if "italic" in text_data.get('font_style', 'normal') else "roman"
-            )
-            
-            text_label.configure(text=text_data['text'], font=font_obj)
+            if self.selected_text_index >= len(self.text_items): raise IndexError(self.selected_text_index)
+            self.canvas.itemconfig(f"text:{self.selected_text_index}", text=text_data['text'], font=self._canvas_text_font(text_data))
+            self._update_spatial_index('text', self.selected_text_index)
         except (IndexError, AttributeError) as e:
             print(f"Hiba a szöveg widget frissítésekor: {e}")
 
@@ -2347,71 +5531,143 @@ class FotokonyvGUI:
             self.pages[self.current_page]['texts'][self.selected_text_index]['font_color'] = color_code[1]
 
     # --- MOZGATÁS METÓDUSAI ---
+    def _canvas_item_target(self, item_id):
+        """Az elem címkéiből megállapítja, melyik képhelyhez vagy szöveghez tartozik: ('photo', 2), ('text', 0) vagy None."""
+        for tag in self.canvas.gettags(item_id):
+            item_type, _, index = tag.partition(':')
+            if item_type in ('photo', 'text') and index.isdigit():
+                return item_type, int(index)
+        return None
+
+    def _on_canvas_press(self, event):
+        """A vászon egyetlen kattintáskezelője: a kurzor alatti legfelső képhelyet vagy szöveget választja ki.
+
+        A háttér, az oldalkeret és a kijelölés kerete nem kap kattintást, ezért ezeket átugorjuk.
+        """
+        self._release_page_preview(force=True)
+        if self.view_zoom != 1.0:
+            self._drag_data = {"item_type": 'view', "offset_x": event.x, "offset_y": event.y}
+            return
+        for item_id in reversed(self.canvas.find_overlapping(event.x, event.y, event.x, event.y)):
+            target = self._canvas_item_target(item_id)
+            if target is None: continue
+            item_type, index = target
+            if item_type == 'photo' and "add_photo" in self.canvas.gettags(item_id):
+                self.add_photo_to_slot(index)
+                return
+            self._on_widget_press(event, item_type, index)
+            return
+        self._drag_data = {}
+
+    def _on_canvas_pan_press(self, event):
+        """Shift + kattintás egy képen: a húzás a képet a keretén belül mozgatja (pásztázás)."""
+        self._release_page_preview(force=True)
+        if self.view_zoom != 1.0:
+            self._on_canvas_press(event)
+            return
+        for item_id in reversed(self.canvas.find_overlapping(event.x, event.y, event.x, event.y)):
+            target = self._canvas_item_target(item_id)
+            if target is None or target[0] != 'photo': continue
+            index = target[1]
+            if self._pan_buffer_key(index, self._get_page_draw_area()[2:]) is None: break
+            if index != self.selected_photo_index:
+                self._select_photo(index)
+            self._drag_data = {"item_type": 'pan', "index": index, "offset_x": event.x, "offset_y": event.y}
+            return
+        self._drag_data = {}
+
     def _on_widget_press(self, event, item_type, index):
-        widget_to_drag = None
         if item_type == 'photo':
-            if index < len(self.photo_frames):
+            if index < len(self.photo_items) and self.photo_items[index]:
                 self._select_photo(index)
-                widget_to_drag = self.photo_frames[index]
+                canvas_item_id = self.photo_items[index]
             else: return
         elif item_type == 'text':
-            if index < len(self.text_widgets):
+            if index < len(self.text_items):
                 self._select_text(index)
-                widget_to_drag = self.text_widgets[index]
+                canvas_item_id = self.text_items[index]
             else: return
         else: return
         
-        canvas_item_id = self.widget_to_canvas_item.get(widget_to_drag)
-        if canvas_item_id:
-            self.canvas.tag_raise(canvas_item_id)
-            # Elmentjük a kezdő pozíciót is
-            x, y = self.canvas.coords(canvas_item_id)
-            self._drag_data = {
-                "widget": widget_to_drag, 
-                "item_id": canvas_item_id, 
-                "item_type": item_type, 
-                "index": index, 
-                "offset_x": event.x_root, 
-                "offset_y": event.y_root,
-                "start_pos": (x, y) # ÚJ: Kezdő pozíció elmentése
-            }
+        item_tag = f"{item_type}:{index}"
+        self.canvas.tag_raise(item_tag)
+        self.canvas.tag_raise("selection")
+        # Elmentjük a kezdő pozíciót is
+        x, y = self.canvas.coords(canvas_item_id)[:2]
+        self._drag_data = {
+            "item_tag": item_tag,
+            "item_id": canvas_item_id, 
+            "item_type": item_type, 
+            "index": index, 
+            "offset_x": event.x, 
+            "offset_y": event.y,
+            "start_pos": (x, y),
+            "raw_pos": (x, y)
+        }
 
     def _on_widget_drag(self, event):
         if not self._drag_data: return
         
-        item_id = self._drag_data["item_id"]
+        dx = event.x - self._drag_data["offset_x"]
+        dy = event.y - self._drag_data["offset_y"]
+        self._drag_data["offset_x"] = event.x
+        self._drag_data["offset_y"] = event.y
         
-        dx = event.x_root - self._drag_data["offset_x"]
-        dy = event.y_root - self._drag_data["offset_y"]
+        if self._drag_data["item_type"] == 'pan':
+            self._pan_selected_photo(self._drag_data["index"], dx, dy)
+            return
+        if self._drag_data["item_type"] == 'view':
+            self._pan_view(dx, dy)
+            return
         
-        self.canvas.move(item_id, dx, dy)
+        # A kurzor szerinti (illesztés nélküli) helyzetből számoljuk az illesztett helyzetet
+        raw_x, raw_y = self._drag_data["raw_pos"][0] + dx, self._drag_data["raw_pos"][1] + dy
+        self._drag_data["raw_pos"] = (raw_x, raw_y)
+        target_x, target_y = self._snapped_drag_position(raw_x, raw_y)
+        current_x, current_y = self.canvas.coords(self._drag_data["item_id"])[:2]
         
-        self._drag_data["offset_x"] = event.x_root
-        self._drag_data["offset_y"] = event.y_root
+        # A képhely minden eleme (és a kijelölés kerete) együtt mozog
+        self.canvas.move(self._drag_data["item_tag"], target_x - current_x, target_y - current_y)
+        if self._drag_data["item_type"] == 'photo':
+            self.canvas.move("selection", target_x - current_x, target_y - current_y)
+
+    def _snapped_drag_position(self, raw_x, raw_y):
+        """A húzott elem horgonypontja (kép: bal felső sarok, szöveg: közép) illesztés után, vászonpixelben."""
+        offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
+        item_type, index = self._drag_data["item_type"], self._drag_data["index"]
+        box = self.spatial_index.box((item_type, index))
+        if box is None or draw_w <= 1 or draw_h <= 1: return raw_x, raw_y
+        width, height = box[2] - box[0], box[3] - box[1]
+        left, top = (raw_x - offset_x) / draw_w, (raw_y - offset_y) / draw_h
+        if item_type == 'text':
+            left, top = left - width / 2, top - height / 2
+        snapped = self._show_drag_guides(item_type, index, (left, top, left + width, top + height))
+        dx, dy = (snapped[0] - left) * draw_w, (snapped[1] - top) * draw_h
+        return raw_x + dx, raw_y + dy
 
     def _on_widget_release(self, event):
         if not self._drag_data: return
         
+        if self._drag_data["item_type"] in ('pan', 'view'):
+            self._drag_data = {}
+            return
+
         dragged_index = self._drag_data["index"]
         dragged_type = self._drag_data["item_type"]
         dragged_id = self._drag_data["item_id"]
+        self.canvas.delete("snap_guide", "overlap_warning")
         
         # Csak fotók cseréjét kezeljük
         if dragged_type == 'photo':
-            # Megkeressük az elemet az egér kurzor alatt
-            x, y = event.x_root - self.canvas.winfo_rootx(), event.y_root - self.canvas.winfo_rooty()
-            overlapping_items = self.canvas.find_overlapping(x, y, x, y)
-            
+            # A kurzor alatti legfelső másik képhelyet a térbeli index adja meg
             target_index = None
-            for item_id in overlapping_items:
-                # Keressük azt a widgetet, amihez az item_id tartozik
-                for i, frame in enumerate(self.photo_frames):
-                    if frame and self.widget_to_canvas_item.get(frame) == item_id:
-                        if i != dragged_index: # Nem a saját magára dobta
-                            target_index = i
-                            break
-                if target_index is not None:
-                    break
+            offset_x, offset_y, draw_w, draw_h = self._get_page_draw_area()
+            if draw_w > 1 and draw_h > 1:
+                hits = [key[1] for key in self.spatial_index.query_point((event.x - offset_x) / draw_w, (event.y - offset_y) / draw_h)
+                        if key[0] == 'photo' and key[1] != dragged_index] # Nem a saját magára dobta
+                if hits:
+                    stacking = {photo_index: position for position, photo_index in enumerate(self.z_order.get(str(self.current_page), []))}
+                    target_index = max(hits, key=lambda photo_index: stacking.get(photo_index, -1))
 
             # --- KÉPCSERE LOGIKA ---
             if target_index is not None:
@@ -2430,6 +5686,8 @@ class FotokonyvGUI:
                 self.photo_properties[dragged_key] = target_props
                 self.photo_properties[target_key] = dragged_props
                 
+                # Csak a két érintett képhely rajzolódik újra, a húzott elem is az eredeti helyén
+                self.change_tracker.mark_photos(dragged_index, target_index, action='képcsere')
                 self.refresh_editor_view()
                 self._drag_data = {}
                 return # Befejeztük a cserét
@@ -2440,7 +5698,7 @@ class FotokonyvGUI:
             self._drag_data = {}
             return
             
-        x, y = self.canvas.coords(dragged_id)
+        x, y = self.canvas.coords(dragged_id)[:2]
 
         if dragged_type == 'photo':
             data_list = self.pages[self.current_page]['photos']
@@ -2450,8 +5708,15 @@ class FotokonyvGUI:
             data_list = self.pages[self.current_page]['texts']
             data_list[dragged_index]['relx'] = (x - offset_x) / draw_w
             data_list[dragged_index]['rely'] = (y - offset_y) / draw_h
-            
+        self._update_spatial_index(dragged_type, dragged_index)
         self._drag_data = {}
+
+        # Az oldal tartalma megváltozott: a bélyegkép és az előnézetek is az új elrendezést mutassák
+        if dragged_type == 'photo':
+            self.change_tracker.mark_photos(dragged_index, action='mozgatás')
+        else:
+            self.change_tracker.mark_texts(dragged_index, action='szövegmozgatás')
+        self.refresh_editor_view()
     
     # --- VARÁZSLÓ FUNKCIÓK ---
     def run_basic_wizard(self):
@@ -2527,13 +5792,12 @@ class FotokonyvGUI:
                 
                 path = os.path.join(dirpath, filename)
                 try:
-                    with Image.open(path) as img:
-                        w, h = img.size
-                        ratio = w / h if h > 0 else 1
-                        orientation = 'square'
-                        if ratio > 1.1: orientation = 'landscape'
-                        elif ratio < 0.9: orientation = 'portrait'
-                        analyzed_in_folder.append({'path': path, 'orientation': orientation})
+                    w, h = DECODED_IMAGE_CACHE.source_size(path)
+                    ratio = w / h if h > 0 else 1
+                    orientation = 'square'
+                    if ratio > 1.1: orientation = 'landscape'
+                    elif ratio < 0.9: orientation = 'portrait'
+                    analyzed_in_folder.append({'path': path, 'orientation': orientation})
                 except Exception as e:
                     print(f"Hiba a kép elemzésekor ({os.path.basename(path)}): {e}")
             
@@ -2555,13 +5819,12 @@ class FotokonyvGUI:
 
         for path in image_files:
             try:
-                with Image.open(path) as img:
-                    w, h = img.size
-                    ratio = w / h if h > 0 else 1
-                    orientation = 'square'
-                    if ratio > 1.1: orientation = 'landscape'
-                    elif ratio < 0.9: orientation = 'portrait'
-                    analyzed.append({'path': path, 'orientation': orientation})
+                w, h = DECODED_IMAGE_CACHE.source_size(path)
+                ratio = w / h if h > 0 else 1
+                orientation = 'square'
+                if ratio > 1.1: orientation = 'landscape'
+                elif ratio < 0.9: orientation = 'portrait'
+                analyzed.append({'path': path, 'orientation': orientation})
             except Exception as e:
                 print(f"Hiba a kép elemzésekor ({os.path.basename(path)}): {e}")
         return analyzed
@@ -2733,13 +5996,13 @@ class FotokonyvGUI:
         
         for image_info in image_info_list[:5]:
             try:
-                with Image.open(image_info['path']) as img:
-                    img = img.resize((50, 50))
-                    for pixel in list(img.getdata()):
-                        if len(pixel) < 3: continue
-                        category = get_color_category(pixel[0], pixel[1], pixel[2])
-                        if category in category_counts:
-                            category_counts[category] += 1
+                # A színelemzéshez a legkisebb proxy szint is bőven elég
+                img = DECODED_IMAGE_CACHE.load_for_size(image_info['path'], (50, 50), use_proxy=True).resize((50, 50))
+                for pixel in list(img.getdata()):
+                    if len(pixel) < 3: continue
+                    category = get_color_category(pixel[0], pixel[1], pixel[2])
+                    if category in category_counts:
+                        category_counts[category] += 1
             except Exception:
                 continue
         
@@ -2872,6 +6135,8 @@ class FotokonyvGUI:
 
     def run(self):
         self.root.mainloop()
+        self.preview_executor.shutdown()
+        self.thumbnail_executor.shutdown()
 
 
 def main():
@@ -2879,4 +6144,6 @@ def main():
     app.run()
 
 if __name__ == "__main__":
+    # A párhuzamos exportálás munkafolyamatai miatt (csomagolt, fagyasztott futtatható állománynál is)
+    multiprocessing.freeze_support()
     main()